@@ -20,9 +20,10 @@ import json
 # Automation imports
 from automation.post_to_facebook import save_session, manual_login_and_save_session
 from automation.session_converter import auto_convert_session, is_browser_format
+from automation.operation_queue import operation_queue, QueueFullError
 from automation.sequential_browser_manager import (
+    sequential_manager,
     post_to_marketplace_sequential,
-    renew_listings_sequential,
     get_user_automation_status,
     get_all_automation_status
 )
@@ -31,6 +32,7 @@ from automation.sequential_browser_manager import (
 from .serializers import UserSerializer, RegisterSerializer, FacebookAccountSerializer
 from .models import CustomUser, FacebookAccount
 from postings.models import MarketplacePost
+from postings.api_views import queue_full_response
 
 
 def validate_password_strength(password):
@@ -351,6 +353,7 @@ def add_facebook_account_with_login(request):
             success = save_session(email, account.get_password())
             if success:
                 print(f"✅ Session saved successfully for {email}")
+                operation_queue.unpark_account(email)
             else:
                 print(f"❌ Login failed for {email}")
         except Exception as e:
@@ -407,6 +410,7 @@ def add_facebook_account_manual_login(request):
             success = manual_login_and_save_session(email)
             if success:
                 print(f"✅ Manual login completed successfully for {email}")
+                operation_queue.unpark_account(email)
             else:
                 print(f"❌ Manual login failed for {email}")
                 # Optionally delete the account if login failed
@@ -519,6 +523,7 @@ def bulk_upload_accounts_with_login(request):
                         success = save_session(email, account.get_password())
                         if success:
                             print(f"✅ Session saved for {email}")
+                            operation_queue.unpark_account(email)
                         else:
                             print(f"❌ Login failed for {email}")
                     except Exception as e:
@@ -569,6 +574,8 @@ def update_account_session(request, pk):
                 if success:
                     print(
                         f"✅ Session updated successfully for {account.email}")
+                    # Posting work parked on the expired session runs again
+                    operation_queue.unpark_account(account.email)
                 else:
                     print(f"❌ Session update failed for {account.email}")
             except Exception as e:
@@ -896,6 +903,9 @@ def import_session(request):
         account.set_password('imported_session_no_password')
         account.save()
 
+        # Work parked for this email (e.g. before the account was re-added)
+        operation_queue.unpark_account(email)
+
         created = True
 
         # Prepare response
@@ -959,28 +969,30 @@ def renew_listings(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    results = []
-
-    for account in accounts:
-        # ✅ USE SEQUENTIAL QUEUE SYSTEM for proper browser management
-        result = renew_listings_sequential(
-            email=account.email,
-            renewal_count=renewal_count
-        )
+    # All renewals are queued together, or refused while the RENEW queue /
+    # the user's backlog is full
+    try:
+        operations = sequential_manager.add_renewing_operations(
+            [account.email for account in accounts], renewal_count, user=request.user)
+    except QueueFullError as e:
+        return queue_full_response(e)
 
-        # Add account info to result
-        result['account_id'] = account.id
-        result['email'] = account.email
-        results.append(result)
+    results = []
 
-    # Calculate totals
-    total_renewed = sum(r['renewed_count'] for r in results)
-    successful_accounts = sum(1 for r in results if r['success'])
+    for account, operation in zip(accounts, operations):
+        results.append({
+            'status': 'queued',
+            'message': f'Renewing operation added to queue for {account.email}',
+            'operation_id': operation.id,
+            'account_id': account.id,
+            'email': account.email,
+        })
 
+    # Renewals run in the background - the counts come from the status endpoints
     return Response({
         'success': True,
-        'total_renewed': total_renewed,
-        'successful_accounts': successful_accounts,
-        'total_accounts': len(accounts),
+        'queued_accounts': len(results),
+        'total_accounts': len(results),
+        'user_status': sequential_manager.get_user_status(accounts[0].email),
         'results': results
     })
@@ -1,3 +1,4 @@
+from django.db.models import QuerySet
 from rest_framework import serializers
 from .models import CustomUser, FacebookAccount
 
@@ -40,12 +41,13 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class FacebookAccountSerializer(serializers.ModelSerializer):
     session_exists = serializers.SerializerMethodField()
+    circuit_breaker = serializers.SerializerMethodField()
     # Accept plain password in API
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = FacebookAccount
-        fields = ['id', 'email', 'password', 'session_exists', 'created_at']
+        fields = ['id', 'email', 'password', 'session_exists', 'circuit_breaker', 'created_at']
         extra_kwargs = {
             'password': {'write_only': True}
         }
@@ -55,6 +57,28 @@ class FacebookAccountSerializer(serializers.ModelSerializer):
         session_file = f"sessions/{obj.email.replace('@', '_').replace('.', '_')}.json"
         return os.path.exists(session_file)
 
+    def _page_emails(self):
+        """Emails of every account the root serializer renders (a page of accounts / posts)"""
+        instance = self.root.instance
+        items = instance if isinstance(instance, (list, tuple, QuerySet)) else [instance]
+        for item in items:
+            account = item if isinstance(item, FacebookAccount) else getattr(item, 'account', None)
+            if account is not None:
+                yield account.email
+
+    def get_circuit_breaker(self, obj):
+        """Breaker state (closed / open / half_open) and why it tripped"""
+        from automation.circuit_breaker import circuit_breaker
+
+        # Loaded once for the whole page and kept in the (shared) serializer context
+        states = self.context.get('circuit_breakers')
+        if states is None:
+            states = circuit_breaker.get_states(self._page_emails())
+            self.context['circuit_breakers'] = states
+        if obj.email not in states:
+            states[obj.email] = circuit_breaker.get_state(obj.email)
+        return states[obj.email]
+
     def create(self, validated_data):
         """Override create to encrypt password"""
         password = validated_data.pop('password')
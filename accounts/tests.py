@@ -1,3 +1,246 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from automation import session_probe
+from automation.models import AccountCircuitBreaker, AutomationOperation
+from automation.operation_queue import operation_queue
+from . import api_views
+from .models import FacebookAccount
+from .serializers import FacebookAccountSerializer
+
+DAY = 86400
+
+
+def cookie_jar(days_left=30, names=('c_user', 'xs', 'datr'), xs='alive'):
+    """storage_state with Facebook auth cookies expiring in `days_left` days"""
+    expires = time.time() + days_left * DAY
+    return {'cookies': [
+        {'name': name, 'value': xs if name == 'xs' else '1', 'domain': '.facebook.com',
+         'path': '/', 'expires': expires}
+        for name in names
+    ], 'origins': []}
+
+
+class FacebookStandIn(BaseHTTPRequestHandler):
+    """/me/ answers like Facebook: profile redirect when logged in, login otherwise"""
+
+    requests = []
+
+    def do_GET(self):
+        cookie = self.headers.get('Cookie', '')
+        FacebookStandIn.requests.append((self.path, cookie))
+        if 'xs=alive' in cookie:
+            location = '/profile.php?id=1'
+        elif 'xs=form' in cookie:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'<form id="loginform"></form>')
+            return
+        else:
+            location = '/login/?next=%2Fme%2F'
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SessionProbeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FacebookStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FacebookStandIn.requests = []
+        session_probe.clear_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_session(self, state, name='session.json'):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            json.dump(state, f)
+        return path
+
+    def validate(self, path, **kwargs):
+        return session_probe.validate_session(path, probe=True, base_url=self.base_url, **kwargs)
+
+    def test_cookie_expiry_classification(self):
+        self.assertEqual(session_probe.inspect_cookies(cookie_jar(30))['status'], 'valid')
+        self.assertEqual(session_probe.inspect_cookies(cookie_jar(1))['status'], 'expiring_soon')
+        self.assertEqual(session_probe.inspect_cookies(cookie_jar(-1))['status'], 'expired')
+        self.assertEqual(session_probe.inspect_cookies(
+            cookie_jar(30, names=('c_user', 'datr')))['status'], 'expired')
+        self.assertEqual(session_probe.inspect_cookies(
+            cookie_jar(30, names=('c_user', 'xs')))['status'], 'expiring_soon')
+
+    def test_valid_session_is_probed(self):
+        result = self.validate(self.write_session(cookie_jar(30)))
+
+        self.assertEqual(result['status'], 'valid')
+        self.assertEqual(result['http_check'], 'valid')
+        self.assertTrue(result['valid'])
+        path, cookie = FacebookStandIn.requests[0]
+        self.assertEqual(path, '/me/')
+        self.assertIn('c_user=1', cookie)
+
+    def test_expiring_session_stays_usable(self):
+        result = self.validate(self.write_session(cookie_jar(1)))
+
+        self.assertEqual(result['status'], 'expiring_soon')
+        self.assertEqual(result['http_check'], 'valid')
+        self.assertTrue(result['valid'])
+
+    def test_expired_cookies_skip_the_probe(self):
+        result = self.validate(self.write_session(cookie_jar(-1)))
+
+        self.assertEqual(result['status'], 'expired')
+        self.assertEqual(result['http_check'], 'skipped')
+        self.assertEqual(FacebookStandIn.requests, [])
+
+    def test_redirect_to_login_expires_the_session(self):
+        result = self.validate(self.write_session(cookie_jar(30, xs='dead')))
+
+        self.assertEqual(result['status'], 'expired')
+        self.assertEqual(result['http_check'], 'expired')
+        self.assertFalse(result['valid'])
+
+    def test_login_form_expires_the_session(self):
+        result = self.validate(self.write_session(cookie_jar(30, xs='form')))
+
+        self.assertEqual(result['status'], 'expired')
+
+    def test_unreachable_probe_is_inconclusive(self):
+        result = session_probe.validate_session(
+            self.write_session(cookie_jar(30)), probe=True, base_url='http://127.0.0.1:9')
+
+        self.assertEqual(result['status'], 'valid')
+        self.assertEqual(result['http_check'], 'inconclusive')
+
+    def test_missing_and_corrupted_files(self):
+        self.assertEqual(self.validate(os.path.join(self.tmp.name, 'nope.json'))['status'],
+                         'missing')
+        path = os.path.join(self.tmp.name, 'broken.json')
+        with open(path, 'w') as f:
+            f.write('{not json')
+        self.assertEqual(self.validate(path)['status'], 'invalid')
+
+    def test_cache_is_dropped_when_the_file_changes(self):
+        path = self.write_session(cookie_jar(30))
+
+        first = self.validate(path)
+        second = self.validate(path)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(len(FacebookStandIn.requests), 1)
+
+        # Re-saved session (new mtime): probed again with the new cookies
+        with open(path, 'w') as f:
+            json.dump(cookie_jar(30, xs='dead'), f)
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+
+        third = self.validate(path)
+        self.assertFalse(third['cached'])
+        self.assertEqual(third['status'], 'expired')
+        self.assertEqual(len(FacebookStandIn.requests), 2)
+
+    def test_cache_can_be_bypassed(self):
+        path = self.write_session(cookie_jar(30))
+        self.validate(path)
+        self.validate(path, use_cache=False)
+
+        self.assertEqual(len(FacebookStandIn.requests), 2)
+
+
+class FacebookAccountSerializerTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create(username='owner')
+        for i in range(4):
+            FacebookAccount.objects.create(email=f'acct{i}@example.com', user=user)
+        AccountCircuitBreaker.objects.create(
+            account_email='acct1@example.com', state='open', consecutive_failures=3,
+            last_error_type='captcha')
+
+    def test_breakers_are_loaded_once_per_page(self):
+        accounts = FacebookAccount.objects.order_by('email')
+
+        with CaptureQueriesContext(connection) as queries:
+            data = FacebookAccountSerializer(accounts, many=True).data
+
+        breaker_queries = [q for q in queries.captured_queries
+                           if 'accountcircuitbreaker' in q['sql']]
+        self.assertEqual(len(breaker_queries), 1)
+        states = {row['email']: row['circuit_breaker']['state'] for row in data}
+        self.assertEqual(states, {'acct0@example.com': 'closed', 'acct1@example.com': 'open',
+                                  'acct2@example.com': 'closed', 'acct3@example.com': 'closed'})
+
+    def test_single_account(self):
+        account = FacebookAccount.objects.get(email='acct1@example.com')
+
+        data = FacebookAccountSerializer(account).data
+
+        self.assertEqual(data['circuit_breaker']['state'], 'open')
+        self.assertEqual(data['circuit_breaker']['last_error_type'], 'captcha')
+
+
+class RenewListingsViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='owner')
+        self.accounts = [FacebookAccount.objects.create(email=f'acct{i}@example.com', user=self.user)
+                         for i in range(3)]
+        # No workers in tests
+        patcher = mock.patch.object(api_views.sequential_manager, '_wake_workers')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def renew(self):
+        request = APIRequestFactory().post('/api/accounts/renew/', {
+            'account_ids': [account.id for account in self.accounts],
+            'renewal_count': 5,
+        }, format='json')
+        force_authenticate(request, user=self.user)
+        return api_views.renew_listings(request)
+
+    def test_accounts_are_admitted_once_and_queued(self):
+        with mock.patch.object(operation_queue, 'admit', wraps=operation_queue.admit) as admit:
+            response = self.renew()
+
+        self.assertEqual(response.status_code, 200)
+        admit.assert_called_once()
+        self.assertEqual(admit.call_args.args[2], 3)
+        self.assertEqual(response.data['queued_accounts'], 3)
+        self.assertEqual(AutomationOperation.objects.filter(operation_type='renew').count(), 3)
+
+    def test_full_queue_refuses_all_accounts(self):
+        AutomationOperation.objects.create(
+            operation_type='renew', account_email='acct0@example.com', user=self.user, cost=2)
+
+        # Room for 2 more renewals, 3 submitted
+        with mock.patch.object(operation_queue, 'max_user_backlog', 4):
+            response = self.renew()
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(AutomationOperation.objects.count(), 1)
@@ -0,0 +1,200 @@
+"""
+Threaded Account Runner for Facebook Marketplace Bot
+====================================================
+
+Runs posting / renewal for many accounts at the same time. The runner only
+orchestrates: every account runs the regular sync flow (post_batch /
+renew_listings) on one of `concurrency` worker threads and the caller
+waits for all of them. There is a single copy of the create-listing and
+renewal flows - the runner never drives a page itself.
+
+Playwright's sync API is bound to the thread that started it, so the
+accounts run on threads (one browser_pool slot each); run_post_batches()
+and run_renewals() block until every account is done.
+
+- At most AUTOMATION_ACCOUNT_CONCURRENCY accounts run at once
+- Each worker thread keeps its browser_pool slot warm across the accounts
+  it runs and releases it when the runner stops
+- Every account gets a fresh BrowserContext with the NetworkFilter profile
+  (browser_pool.account_context)
+- Listings of the same account still run one after another (same session);
+  with AUTOMATION_PIPELINED_POSTING the next one is staged on a second
+  page while the current one publishes
+- on_result callbacks are serialized, so callers may use shared state and
+  the Django ORM without extra locking
+
+USAGE (from sync code, e.g. a management command):
+    runner = ThreadedAccountRunner(concurrency=4)
+    runner.run_post_batches({email: [post_dict, ...]}, on_result=callback)
+    runner.run_renewals({email: 20})
+"""
+
+import queue
+import threading
+import traceback
+from concurrent.futures import Future, wait
+from django.conf import settings
+from django.db import connections
+
+from .browser_pool import browser_pool
+from .post_to_facebook import _new_listing_result, post_batch
+from .renew_posts import renew_listings
+
+
+class ThreadedAccountRunner:
+    """
+    Runs the sync automation flow for many accounts on worker threads
+
+    Each account is one job; `concurrency` worker threads take jobs from a
+    shared queue and the calling thread waits for their results.
+    """
+
+    def __init__(self, concurrency=None, headless=None, pipelined=None, pool=None):
+        self.concurrency = concurrency or getattr(
+            settings, 'AUTOMATION_ACCOUNT_CONCURRENCY', 3)
+        self.headless = headless if headless is not None else getattr(
+            settings, 'AUTOMATION_HEADLESS_MODE', True)
+        self.pipelined = pipelined if pipelined is not None else getattr(
+            settings, 'AUTOMATION_PIPELINED_POSTING', False)
+        self.pool = pool or browser_pool
+
+        # Serializes on_result callbacks across worker threads
+        self.callback_lock = threading.Lock()
+
+    def _worker(self, jobs):
+        """Run jobs until the stop marker, then release this thread's browsers"""
+        try:
+            while True:
+                job = jobs.get()
+                if job is None:
+                    return
+                future, func, args = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            self.pool.release()
+            # Worker threads open their own database connections
+            connections.close_all()
+
+    def _run_jobs(self, calls):
+        """
+        Run (func, args) calls on the worker threads
+
+        Returns:
+            list: Result (or raised exception) of each call, in order
+        """
+        jobs = queue.Queue()
+        futures = []
+        for func, args in calls:
+            future = Future()
+            futures.append(future)
+            jobs.put((future, func, args))
+
+        count = min(self.concurrency, len(calls))
+        mode = "HEADLESS" if self.headless else "VISIBLE"
+        print(f"🚀 Account runner running {len(calls)} account(s) ({mode}, {count} at a time)")
+
+        workers = []
+        for i in range(count):
+            jobs.put(None)
+            worker = threading.Thread(
+                target=self._worker, args=(jobs,), name=f"account-runner-{i + 1}", daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        try:
+            wait(futures)
+            return [future.exception() or future.result() for future in futures]
+        finally:
+            for worker in workers:
+                worker.join()
+
+    def post_account(self, email, posts, on_result=None, acquire=None):
+        """
+        Post listings for one account (runs on a worker thread)
+
+        Args:
+            email: Facebook account email
+            posts: List of dicts with title, description, price, image_path
+                   (optional post_id is passed back in the results)
+            on_result: Optional callback(result) after each listing
+            acquire: Optional callable(email) -> bool run before each
+                     listing; False stops the batch
+
+        Returns:
+            list: One result dict per listing (same shape as post_batch());
+                  if the batch aborts (missing session, browser crash) every
+                  listing that did not run is reported as failed
+        """
+        results = []
+
+        def report(result):
+            results.append(result)
+            if on_result:
+                with self.callback_lock:
+                    on_result(result)
+
+        try:
+            post_batch(email, posts, headless=self.headless, pool=self.pool,
+                       on_result=report, acquire=acquire, pipelined=self.pipelined)
+        except Exception as e:
+            print(f"❌ [{email}] Batch aborted: {e}")
+            tb = traceback.format_exc()
+            # Results arrive in listing order - the rest never ran
+            for post in posts[len(results):]:
+                result = _new_listing_result(post)
+                result.update(error=str(e), exception=e, traceback=tb)
+                report(result)
+        return results
+
+    def renew_account(self, email, renewal_count=20):
+        """Renew listings for one account, returns a renew_listings()-style dict"""
+        try:
+            return renew_listings(email, renewal_count, headless=self.headless, pool=self.pool)
+        except Exception as e:
+            print(f"❌ [{email}] Renewal failed: {e}")
+            return {
+                'success': False,
+                'renewed_count': 0,
+                'available_count': 0,
+                'message': f'Error during renewal: {str(e)}',
+                'condition_met': '',
+                'exception': e,
+            }
+
+    def run_post_batches(self, batches, on_result=None, acquire=None):
+        """
+        Post all batches concurrently (blocks until every account is done)
+
+        Args:
+            batches: Dict of email -> list of post dicts
+            on_result: Optional callback(result) after each listing
+            acquire: Optional callable(email) -> bool before each listing
+
+        Returns:
+            dict: email -> list of result dicts
+        """
+        results = self._run_jobs([
+            (self.post_account, (email, posts, on_result, acquire))
+            for email, posts in batches.items()
+        ])
+        return dict(zip(batches.keys(), results))
+
+    def run_renewals(self, renewals):
+        """
+        Renew several accounts concurrently (blocks until every account is done)
+
+        Args:
+            renewals: Dict of email -> renewal_count
+
+        Returns:
+            dict: email -> renew result dict
+        """
+        results = self._run_jobs([
+            (self.renew_account, (email, count)) for email, count in renewals.items()
+        ])
+        return dict(zip(renewals.keys(), results))
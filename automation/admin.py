@@ -1,3 +1,22 @@
 from django.contrib import admin
+from .models import AccountCircuitBreaker, AutomationOperation
 
-# Register your models here.
+
+@admin.register(AutomationOperation)
+class AutomationOperationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'operation_type', 'account_email', 'status',
+                    'attempts', 'lease_owner', 'lease_expires_at', 'created_at']
+    list_filter = ['operation_type', 'status', 'created_at']
+    search_fields = ['account_email', 'lease_owner']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['lease_owner', 'lease_expires_at', 'attempts',
+                       'created_at', 'started_at', 'finished_at']
+
+
+@admin.register(AccountCircuitBreaker)
+class AccountCircuitBreakerAdmin(admin.ModelAdmin):
+    list_display = ['account_email', 'state', 'consecutive_failures',
+                    'last_error_type', 'trips', 'retry_at', 'updated_at']
+    list_filter = ['state', 'last_error_type']
+    search_fields = ['account_email']
+    readonly_fields = ['opened_at', 'updated_at']
@@ -0,0 +1,226 @@
+"""
+Browser Pool for Facebook Marketplace Bot
+=========================================
+
+Keeps warm Chromium instances alive between automation runs instead of
+paying the cold start (seconds + hundreds of MB) for every listing.
+
+- Each account run gets a FRESH BrowserContext (cookies loaded from its
+  storage_state), so accounts never share cookies or cache
+- Session files are parsed once and cached (SessionStore); refreshed
+  cookies are written back after a successful run
+- Browsers are recycled after AUTOMATION_BROWSER_MAX_USES contexts
+- Crashed / disconnected browsers are relaunched automatically
+- Every context gets the NetworkFilter profile (no video, fonts, pixels...)
+
+Playwright's sync API is bound to the thread that started it, so every
+worker thread owns its own Playwright driver and browsers. Call release()
+from the worker thread when it is done to shut them down.
+"""
+
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from playwright.sync_api import sync_playwright
+import logging
+
+from . import network_filter as network_filtering
+from .session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """
+    Hands out per-account BrowserContexts backed by warm Chromium instances
+
+    USAGE:
+        with browser_pool.account_context(session_file, headless=True) as context:
+            page = context.new_page()
+            ...
+    """
+
+    def __init__(self, max_uses=None):
+        self.max_uses = max_uses or getattr(
+            settings, 'AUTOMATION_BROWSER_MAX_USES', 25)
+
+        # One slot (playwright driver + browsers) per worker thread
+        self._local = threading.local()
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'active_threads': 0,
+            'launches': 0,
+            'recycles': 0,
+            'crashes': 0,
+            'contexts_opened': 0,
+            'requests_skipped': 0,
+            'bytes_saved': 0,
+            'bytes_downloaded': 0,
+            'requests_from_cache': 0,
+        }
+
+    def _get_slot(self):
+        """Get (or start) the Playwright driver owned by the current thread"""
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = {
+                'playwright': sync_playwright().start(),
+                'browsers': {},  # headless flag -> {'browser', 'uses'}
+            }
+            self._local.slot = slot
+            with self.lock:
+                self.stats['active_threads'] += 1
+        return slot
+
+    def _launch(self, slot, headless):
+        """Launch a new Chromium instance for this thread"""
+        mode = "HEADLESS" if headless else "VISIBLE"
+        print(f"🚀 Launching pooled Chromium ({mode})")
+
+        browser = slot['playwright'].chromium.launch(headless=headless)
+        entry = {'browser': browser, 'uses': 0}
+        slot['browsers'][headless] = entry
+
+        with self.lock:
+            self.stats['launches'] += 1
+        return entry
+
+    def _close_entry(self, entry):
+        try:
+            entry['browser'].close()
+        except Exception:
+            # Browser already gone (crashed or killed)
+            pass
+
+    def _get_browser(self, headless):
+        """Return a live browser entry for this thread, relaunching if needed"""
+        slot = self._get_slot()
+        entry = slot['browsers'].get(headless)
+
+        if entry and not entry['browser'].is_connected():
+            print("💥 Pooled browser disconnected - relaunching")
+            logger.warning("Pooled browser crashed, relaunching")
+            with self.lock:
+                self.stats['crashes'] += 1
+            entry = None
+
+        if entry is None:
+            entry = self._launch(slot, headless)
+        return entry
+
+    def _recycle(self, headless):
+        """Close a browser that reached max uses; next request relaunches it"""
+        slot = self._get_slot()
+        entry = slot['browsers'].pop(headless, None)
+        if entry:
+            print(f"♻️  Recycling pooled browser after {entry['uses']} uses")
+            self._close_entry(entry)
+            with self.lock:
+                self.stats['recycles'] += 1
+
+    @contextmanager
+    def account_context(self, storage_state, headless=True, **context_options):
+        """
+        Open a fresh BrowserContext for one account on a warm browser
+
+        When storage_state is a path, the parsed state comes from the
+        session store and the context's refreshed cookies are written back
+        to that file if the block exits without an exception.
+
+        Args:
+            storage_state: Path to (or dict of) the account's Playwright storage_state
+            headless: Run in headless mode
+            **context_options: Extra options for browser.new_context()
+
+        Yields:
+            BrowserContext: Closed automatically when the block exits
+        """
+        session_file = None
+        if isinstance(storage_state, str):
+            session_file = storage_state
+            storage_state = session_store.get(session_file)
+
+        entry = self._get_browser(headless)
+
+        try:
+            context = entry['browser'].new_context(
+                storage_state=storage_state, **context_options)
+        except Exception:
+            if entry['browser'].is_connected():
+                raise
+            # Browser died between the health check and new_context()
+            entry = self._get_browser(headless)
+            context = entry['browser'].new_context(
+                storage_state=storage_state, **context_options)
+
+        with self.lock:
+            self.stats['contexts_opened'] += 1
+
+        # Skip video, fonts, tracking pixels... on every automation page
+        request_filter = None
+        if network_filtering.is_enabled():
+            request_filter = network_filtering.NetworkFilter()
+            request_filter.attach(context)
+
+        completed = False
+        try:
+            yield context
+            completed = True
+        finally:
+            if completed and session_file:
+                try:
+                    session_store.save(session_file, context.storage_state())
+                except Exception as e:
+                    logger.warning("Could not read storage_state for %s: %s", session_file, e)
+
+            if request_filter:
+                request_filter.log_summary()
+                totals = request_filter.summary()['totals']
+                with self.lock:
+                    self.stats['requests_skipped'] += (
+                        totals['requests_blocked'] + totals['requests_stubbed'])
+                    self.stats['bytes_saved'] += totals['bytes_saved']
+                    self.stats['bytes_downloaded'] += totals['bytes_downloaded']
+                    self.stats['requests_from_cache'] += totals['requests_from_cache']
+
+            try:
+                context.close()
+            except Exception:
+                pass
+
+            entry['uses'] += 1
+            if entry['uses'] >= self.max_uses:
+                self._recycle(headless)
+
+    def release(self):
+        """
+        Close all browsers and the Playwright driver owned by the current thread
+
+        Call this when a worker thread finishes (or a command exits).
+        """
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            return
+
+        for entry in slot['browsers'].values():
+            self._close_entry(entry)
+        slot['browsers'].clear()
+
+        try:
+            slot['playwright'].stop()
+        except Exception:
+            pass
+
+        self._local.slot = None
+        with self.lock:
+            self.stats['active_threads'] -= 1
+
+    def get_stats(self):
+        """Return pool counters for status endpoints"""
+        with self.lock:
+            return {**self.stats, 'max_uses': self.max_uses}
+
+
+# Shared pool used by the automation functions and the queue manager
+browser_pool = BrowserPool()
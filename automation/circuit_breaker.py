@@ -0,0 +1,231 @@
+"""
+Per-Account Circuit Breaker
+===========================
+
+Stops launching browsers for an account that keeps failing the same way
+(expired session, checkpoint, rate limit, network trouble). Every account
+has a breaker (AccountCircuitBreaker row, shared by all processes):
+
+    closed     - work runs normally; failures are counted
+    open       - tripped: the queue does not claim the account's work and
+                 post_to_marketplace fast-fails its posts without a browser
+    half_open  - the cool-down passed and one probe runs; success closes
+                 the breaker, failure opens it again with a doubled cool-down
+
+What trips it:
+- session_expired / captcha / rate_limit - at once (the account itself is broken)
+- network_error / selector_not_found / unknown - after
+  AUTOMATION_BREAKER_FAILURE_THRESHOLD consecutive failures
+- listing-specific failures (validation_error, publish_unconfirmed)
+  neither count nor reset the streak
+
+The cool-down starts at AUTOMATION_BREAKER_COOLDOWN_SECONDS and doubles
+per trip in a row, up to AUTOMATION_BREAKER_MAX_COOLDOWN_SECONDS. Fixing
+the account (session re-imported, OperationQueue.unpark_account) resets it.
+
+USAGE:
+    if circuit_breaker.allow(email):          # may open a browser (or probe)
+        ...post...
+        circuit_breaker.record_success(email)
+    circuit_breaker.record_failure(email, 'network_error', error)
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+
+from .exceptions import AutomationError
+from .models import AccountCircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Failures about the account itself - one is enough to trip
+TRIP_IMMEDIATELY = ('session_expired', 'captcha', 'rate_limit')
+# Failures that trip after a streak
+COUNTED = ('network_error', 'selector_not_found', 'unknown')
+
+
+class CircuitOpenError(AutomationError):
+    """Raised / recorded instead of running work for an account whose breaker is open"""
+
+    def __init__(self, message, error_type='unknown'):
+        super().__init__(message)
+        # Keep the type of the failure that tripped the breaker
+        self.error_type = error_type
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker per Facebook account (database backed)
+    """
+
+    def __init__(self, enabled=None, threshold=None, cooldown=None, max_cooldown=None):
+        self.enabled = enabled if enabled is not None else getattr(
+            settings, 'AUTOMATION_CIRCUIT_BREAKER_ENABLED', True)
+        self.threshold = max(threshold or getattr(
+            settings, 'AUTOMATION_BREAKER_FAILURE_THRESHOLD', 3), 1)
+        self.cooldown = cooldown or getattr(
+            settings, 'AUTOMATION_BREAKER_COOLDOWN_SECONDS', 900)
+        self.max_cooldown = max_cooldown or getattr(
+            settings, 'AUTOMATION_BREAKER_MAX_COOLDOWN_SECONDS', 6 * 3600)
+        # A probe that never reported (worker killed) may be replaced after this
+        self.probe_timeout = getattr(settings, 'AUTOMATION_QUEUE_LEASE_SECONDS', 900)
+
+    def _breaker(self, email):
+        return AccountCircuitBreaker.objects.get_or_create(account_email=email)[0]
+
+    def cooldown_for(self, trips):
+        """Cool-down before the next probe after `trips` trips in a row"""
+        return min(self.cooldown * (2 ** max(trips - 1, 0)), self.max_cooldown)
+
+    # ---------------------------------------------------------------
+    # Checks
+    # ---------------------------------------------------------------
+
+    def allow(self, email):
+        """
+        True if work for the account may run now
+
+        An open breaker whose cool-down passed turns half-open and the
+        caller becomes its probe (only one caller wins).
+        """
+        if not self.enabled:
+            return True
+
+        now = timezone.now()
+        breaker = AccountCircuitBreaker.objects.filter(account_email=email).first()
+        if breaker is None or breaker.state == CLOSED:
+            return True
+        if breaker.retry_at and breaker.retry_at > now:
+            return False
+
+        # Cool-down over (or the last probe never reported) - start a probe
+        probing = AccountCircuitBreaker.objects.filter(
+            id=breaker.id, state=breaker.state, retry_at=breaker.retry_at
+        ).update(state=HALF_OPEN, retry_at=now + timedelta(seconds=self.probe_timeout)) == 1
+        if probing:
+            print(f"🔌 Circuit half-open for {email} - probing")
+        return probing
+
+    def blocked_accounts(self):
+        """Accounts whose work must not be claimed right now"""
+        if not self.enabled:
+            return set()
+        return set(AccountCircuitBreaker.objects.filter(
+            state__in=(OPEN, HALF_OPEN), retry_at__gt=timezone.now()
+        ).values_list('account_email', flat=True))
+
+    def open_error(self, email):
+        """CircuitOpenError describing why the account is blocked"""
+        breaker = self._breaker(email)
+        retry_at = breaker.retry_at.isoformat() if breaker.retry_at else 'now'
+        return CircuitOpenError(
+            f"Circuit open for {email} after {breaker.last_error_type or 'failures'} "
+            f"- next attempt after {retry_at}",
+            error_type=breaker.last_error_type or 'unknown')
+
+    # ---------------------------------------------------------------
+    # Outcomes
+    # ---------------------------------------------------------------
+
+    def record_success(self, email):
+        """Close the breaker and clear the failure streak"""
+        if not self.enabled:
+            return
+        closed = AccountCircuitBreaker.objects.filter(account_email=email).filter(
+            ~Q(state=CLOSED) | Q(consecutive_failures__gt=0)
+        ).update(state=CLOSED, consecutive_failures=0, trips=0, retry_at=None)
+        if closed:
+            print(f"🔌 Circuit closed for {email}")
+
+    def record_failure(self, email, error_type, error=None):
+        """
+        Count a failure and trip the breaker if needed
+
+        Args:
+            email: Account email
+            error_type: ErrorLog.error_type of the failure
+            error: Exception or message (stored for the accounts API)
+
+        Returns:
+            bool: True if the breaker is open after this failure
+        """
+        if not self.enabled or error_type not in TRIP_IMMEDIATELY + COUNTED:
+            return False
+
+        breaker = self._breaker(email)
+        AccountCircuitBreaker.objects.filter(id=breaker.id).update(
+            consecutive_failures=F('consecutive_failures') + 1,
+            last_error_type=error_type, last_error=str(error or '')[:1000])
+        breaker.refresh_from_db()
+
+        if breaker.state == OPEN:
+            return True
+        if not (breaker.state == HALF_OPEN or error_type in TRIP_IMMEDIATELY
+                or breaker.consecutive_failures >= self.threshold):
+            return False
+
+        trips = breaker.trips + 1
+        cooldown = self.cooldown_for(trips)
+        now = timezone.now()
+        AccountCircuitBreaker.objects.filter(id=breaker.id).update(
+            state=OPEN, trips=trips, opened_at=now,
+            retry_at=now + timedelta(seconds=cooldown))
+        print(f"🔌 Circuit OPEN for {email} ({error_type}) - probing again in {cooldown}s")
+        logger.warning("Circuit breaker opened for %s after %s (trip %s)", email, error_type, trips)
+        return True
+
+    def reset(self, email):
+        """Close the breaker after the account was fixed by hand"""
+        AccountCircuitBreaker.objects.filter(account_email=email).update(
+            state=CLOSED, consecutive_failures=0, trips=0, retry_at=None)
+
+    # ---------------------------------------------------------------
+    # Status
+    # ---------------------------------------------------------------
+
+    @staticmethod
+    def describe(breaker):
+        """API dict for a breaker row (None = never failed)"""
+        if breaker is None:
+            return {'state': CLOSED, 'consecutive_failures': 0, 'last_error_type': '',
+                    'retry_at': None}
+        return {
+            'state': breaker.state,
+            'consecutive_failures': breaker.consecutive_failures,
+            'last_error_type': breaker.last_error_type,
+            'last_error': breaker.last_error,
+            'trips': breaker.trips,
+            'opened_at': breaker.opened_at.isoformat() if breaker.opened_at else None,
+            'retry_at': breaker.retry_at.isoformat() if breaker.retry_at else None,
+        }
+
+    def get_state(self, email):
+        return self.describe(AccountCircuitBreaker.objects.filter(account_email=email).first())
+
+    def get_states(self, emails):
+        """describe() of several accounts in one query (email -> dict)"""
+        emails = set(emails)
+        breakers = {breaker.account_email: breaker
+                    for breaker in AccountCircuitBreaker.objects.filter(account_email__in=emails)}
+        return {email: self.describe(breakers.get(email)) for email in emails}
+
+    def get_stats(self):
+        """Breakers that are not closed, for status endpoints"""
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'cooldown_seconds': self.cooldown,
+            'accounts': {breaker.account_email: self.describe(breaker)
+                         for breaker in AccountCircuitBreaker.objects.exclude(state=CLOSED)},
+        }
+
+
+# Shared breaker used by the queue, the workers and post_to_marketplace
+circuit_breaker = CircuitBreaker()
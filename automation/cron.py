@@ -1,12 +1,12 @@
-from postings.models import MarketplacePost
-from .post_to_facebook import login_and_post
+from .post_scheduler import post_scheduler
 
 
 def auto_post():
-    posts = MarketplacePost.objects.filter(posted=False)
-    for post in posts:
-        account = post.account
-        login_and_post(account.email, account.password, post.title,
-                       post.description, post.price, post.image.path, post.location)
-        post.posted = True
-        post.save()
+    """
+    Queue every post whose scheduled_time has passed (one-shot, for cron /
+    Task Scheduler setups that don't run the post scheduler service)
+
+    Returns:
+        list: PostingJob objects queued for the automation workers
+    """
+    return post_scheduler.enqueue_due()
@@ -0,0 +1,164 @@
+"""
+Single-roundtrip DOM scan for automation pages
+==============================================
+
+Looking up form fields with locators costs one browser round trip per
+call (count, is_visible, input_value, bounding_box...) and per element.
+scan_page() runs ONE page.evaluate that:
+
+- finds the create-item fields (title, price, description, category,
+  condition, availability, image input)
+- tags each of them with data-fbbot-field="<role>" so it can be acted on
+  with a plain selector: field_selector(scan, 'title')
+- returns visibility, position and value of every text input, the visible
+  buttons and the number of visible error messages
+
+Tags are cleared on every scan. React may re-render an element and drop
+its tag, so act on tagged fields with a short timeout and keep a fallback.
+"""
+
+FIELD_ATTRIBUTE = 'data-fbbot-field'
+
+_SCAN_JS = """([attr, filledTitle]) => {
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const labelOf = (el) => {
+        const parts = [el.getAttribute('aria-label'), el.getAttribute('placeholder')];
+        const labelledBy = el.getAttribute('aria-labelledby');
+        if (labelledBy) {
+            labelledBy.split(/\\s+/).forEach(id => {
+                const label = document.getElementById(id);
+                if (label) parts.push(label.innerText);
+            });
+        }
+        const label = el.closest('label');
+        if (label) parts.push(label.innerText);
+        return parts.filter(Boolean).join(' ').replace(/\\s+/g, ' ').trim();
+    };
+    const describe = (el) => {
+        const rect = el.getBoundingClientRect();
+        return {
+            tag: el.tagName.toLowerCase(),
+            type: el.getAttribute('type'),
+            label: labelOf(el).slice(0, 80),
+            value: el.value === undefined ? null : el.value,
+            visible: isVisible(el),
+            x: Math.round(rect.x),
+            y: Math.round(rect.y),
+            width: Math.round(rect.width),
+            height: Math.round(rect.height),
+        };
+    };
+
+    document.querySelectorAll(`[${attr}]`).forEach(el => el.removeAttribute(attr));
+
+    const fields = {};
+    const tag = (role, el) => {
+        if (!el || fields[role]) return null;
+        el.setAttribute(attr, role);
+        fields[role] = {selector: `[${attr}="${role}"]`, ...describe(el)};
+        return el;
+    };
+    const byLabel = (els, re) => els.find(el => re.test(labelOf(el)));
+
+    // Title / price: by label, then by position (the input already holding
+    // the title or the first empty input below the header, then the next
+    // empty input after it)
+    const inputs = Array.from(document.querySelectorAll("input[type='text']"));
+    const visibleInputs = inputs.filter(isVisible);
+    const title = tag('title', byLabel(visibleInputs, /^title\\b/i)
+        || (filledTitle && visibleInputs.find(el => el.value === filledTitle))
+        || visibleInputs.find(el => el.value === '' && el.getBoundingClientRect().y > 100));
+    const afterTitle = title ? visibleInputs.slice(visibleInputs.indexOf(title) + 1) : [];
+    tag('price', byLabel(visibleInputs, /^price\\b/i)
+        || afterTitle.find(el => el.value === ''));
+
+    const textareas = Array.from(document.querySelectorAll('textarea')).filter(isVisible);
+    tag('description', byLabel(textareas, /description/i) || textareas[0]);
+
+    // Dropdown triggers
+    const triggers = Array.from(
+        document.querySelectorAll('[role="combobox"], [role="button"], label')).filter(isVisible);
+    const byText = (re) => triggers.find(
+        el => re.test(labelOf(el)) || re.test((el.innerText || '').trim()));
+    tag('category', byText(/^category/i));
+    tag('condition', byText(/^condition/i));
+    tag('availability', byText(/^list as in stock/i));
+
+    tag('image', document.querySelector("input[type='file'][accept*='image']"));
+
+    const buttons = Array.from(document.querySelectorAll('button, [role="button"]'))
+        .filter(isVisible)
+        .map(el => (el.innerText || el.getAttribute('aria-label') || '').trim().slice(0, 50))
+        .filter(Boolean);
+
+    const errors = Array.from(document.querySelectorAll("[role='alert'], .error"))
+        .filter(isVisible).length;
+
+    return {
+        url: location.href,
+        fields: fields,
+        inputs: inputs.map(describe),
+        buttons: buttons,
+        errors: errors,
+    };
+}"""
+
+
+def scan_page(page, title=None):
+    """
+    Scan the page in one round trip and tag the form fields
+
+    Args:
+        page: Playwright page
+        title: Title already typed in the form, so a rescan still finds
+               the title input (and the price input after it)
+
+    Returns:
+        dict: {url, fields: {role: {selector, value, visible, x, y, ...}},
+               inputs: [...], buttons: [...], errors: int}
+    """
+    return page.evaluate(_SCAN_JS, [FIELD_ATTRIBUTE, title])
+
+
+def field_selector(scan, role):
+    """Selector of a tagged field, or None if the scan did not find it"""
+    field = scan['fields'].get(role)
+    return field['selector'] if field else None
+
+
+def print_inputs(scan):
+    """Print every text input from a scan (used when a field is missing)"""
+    print(f"Found {len(scan['inputs'])} text input(s):")
+    for i, field in enumerate(scan['inputs']):
+        print(
+            f"Input {i}: label='{field['label']}', value='{field['value']}', "
+            f"visible={field['visible']}, y={field['y']}")
+
+
+def print_page_state(scan, step_name):
+    """Print the debug summary of a scan"""
+    print(f"\n🔍 DEBUG: {step_name}")
+    print(f"   URL: {scan['url']}")
+
+    if scan['errors'] > 0:
+        print(f"   ⚠️ Found {scan['errors']} error message(s)")
+
+    if scan['buttons']:
+        # Show first 5 unique
+        print(f"   📍 Visible buttons: {', '.join(set(scan['buttons'][:5]))}")
+    else:
+        print("   ⚠️ No visible buttons found")
+
+    if scan['fields']:
+        print(f"   🧩 Fields found: {', '.join(scan['fields'])}")
+    print()
+
+
+def debug_page_state(page, step_name):
+    """Helper function to debug page state at any point (one round trip)"""
+    print_page_state(scan_page(page), step_name)
@@ -0,0 +1,129 @@
+"""
+Typed automation errors
+=======================
+
+The posting flow raises these instead of bare Exception so callers can
+react per failure kind (retry_policy) instead of searching error strings.
+error_type matches ErrorLog.error_type.
+
+    SessionExpiredError     - session file missing or Facebook sent us to /login
+    CaptchaRequiredError    - Facebook wants a checkpoint / captcha solved
+    SelectorNotFoundError   - a form field or button could not be found
+    NetworkError            - navigation / request failed
+    RateLimitedError        - Facebook refused the action as too frequent
+    PublishUnconfirmedError - the publish mutation came back with an error
+
+classify_exception() maps anything else (Playwright errors, legacy
+messages) onto the same types.
+"""
+
+from urllib.parse import urlsplit
+
+
+class AutomationError(Exception):
+    """Base class for posting / renewal failures"""
+    error_type = 'unknown'
+
+
+class SessionExpiredError(AutomationError):
+    error_type = 'session_expired'
+
+
+class CaptchaRequiredError(AutomationError):
+    error_type = 'captcha'
+
+
+class SelectorNotFoundError(AutomationError):
+    error_type = 'selector_not_found'
+
+
+class NetworkError(AutomationError):
+    error_type = 'network_error'
+
+
+class RateLimitedError(AutomationError):
+    error_type = 'rate_limit'
+
+
+class PublishUnconfirmedError(AutomationError):
+    error_type = 'publish_unconfirmed'
+
+
+# Errors about the account itself - the rest of its batch would fail too
+ACCOUNT_ERRORS = (SessionExpiredError, CaptchaRequiredError, RateLimitedError)
+
+# Messages Facebook uses when it blocks an action as too frequent
+RATE_LIMIT_HINTS = ('rate limit', 'temporarily blocked', 'too many', 'try again later',
+                    "you can't use this feature")
+
+_LEGACY_HINTS = (
+    ('session_expired', ('session', 'cookie', 'login')),
+    ('captcha', ('captcha', 'checkpoint')),
+    ('network_error', ('net::err', 'network', 'connection', 'econnreset')),
+    # Whole phrases only - bare 'rate' / 'limit' also match "generate",
+    # "accurate", "character limit"...
+    ('rate_limit', RATE_LIMIT_HINTS),
+    ('selector_not_found', ('could not find', 'not found')),
+    ('validation_error', ('no image',)),
+)
+
+
+def error_for_url(url):
+    """
+    Error for a page Facebook redirected us to instead of the one we asked for
+
+    Args:
+        url: Current page URL
+
+    Returns:
+        AutomationError or None
+    """
+    path = urlsplit(url or '').path
+    if path.startswith('/checkpoint'):
+        return CaptchaRequiredError(f"Facebook checkpoint required ({url})")
+    if path.startswith('/login'):
+        return SessionExpiredError(f"Session expired - redirected to login ({url})")
+    return None
+
+
+def error_for_publish_response(status, body):
+    """
+    Error for a publish mutation response that did not create the listing
+
+    Args:
+        status: HTTP status code
+        body: Response text (may be None if it could not be read)
+
+    Returns:
+        AutomationError or None if the response looks successful
+    """
+    text = (body or '')[:5000]
+    lowered = text.lower()
+    if status == 429 or any(hint in lowered for hint in RATE_LIMIT_HINTS):
+        return RateLimitedError(f"Publish refused as too frequent (HTTP {status})")
+    if status >= 400 or '"errors"' in text:
+        return PublishUnconfirmedError(
+            f"Publish request failed (HTTP {status}): {text[:200]}")
+    return None
+
+
+def classify_exception(error):
+    """
+    ErrorLog.error_type for an exception or error message
+
+    Args:
+        error: Exception (typed or not) or message string
+
+    Returns:
+        str: error_type
+    """
+    if isinstance(error, AutomationError):
+        return error.error_type
+
+    message = str(error).lower()
+    if type(error).__name__ == 'TimeoutError' and 'goto' in message:
+        return 'network_error'
+    for error_type, hints in _LEGACY_HINTS:
+        if any(hint in message for hint in hints):
+            return error_type
+    return 'unknown'
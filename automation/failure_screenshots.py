@@ -0,0 +1,186 @@
+"""
+Failure Screenshots
+===================
+
+When a listing fails we want to see the page, but the capture must not
+slow down the failure path or keep the browser busy:
+
+- capture_failure() grabs a viewport-only JPEG (full page is opt-in via
+  AUTOMATION_SCREENSHOT_FULL_PAGE) with a short timeout and returns the
+  raw bytes - nothing is encoded or written on the browser thread
+- screenshot_writer.submit() hands the bytes to a background thread which
+  caps the size (AUTOMATION_SCREENSHOT_MAX_KB), stores the file under
+  error_screenshots/<job>/<post>_<hash>.jpg and, when given an ErrorLog
+  or AutomationOperation id, fills in its screenshot field
+- identical screenshots (same SHA-256) are stored once and shared
+
+USAGE:
+    data = capture_failure(page)
+    screenshot_writer.submit(data, job_id=job.job_id, post_id=post.id,
+                             error_log_id=error_log.id)
+    # Queued operation without a MarketplacePost (single listing / renewal)
+    screenshot_writer.submit(data, operation_id=operation.id)
+"""
+
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = 'error_screenshots'
+
+# Lowest JPEG quality tried before the image is downscaled instead
+MIN_QUALITY = 30
+
+
+def _settings():
+    return {
+        'full_page': getattr(settings, 'AUTOMATION_SCREENSHOT_FULL_PAGE', False),
+        'quality': getattr(settings, 'AUTOMATION_SCREENSHOT_QUALITY', 60),
+        'max_bytes': getattr(settings, 'AUTOMATION_SCREENSHOT_MAX_KB', 250) * 1024,
+        'timeout': getattr(settings, 'AUTOMATION_SCREENSHOT_TIMEOUT', 3000),
+    }
+
+
+def _screenshot_options(options):
+    return {
+        'type': 'jpeg',
+        'quality': options['quality'],
+        'full_page': options['full_page'],
+        'timeout': options['timeout'],
+        'animations': 'disabled',
+    }
+
+
+def capture_failure(page):
+    """
+    Take a failure screenshot of the page
+
+    Args:
+        page: Playwright page
+
+    Returns:
+        bytes: JPEG data, or None if the page could not be captured
+    """
+    try:
+        return page.screenshot(**_screenshot_options(_settings()))
+    except Exception as e:
+        # Page crashed / closed - the error itself is what matters
+        logger.debug("Failure screenshot not taken: %s", e)
+        return None
+
+
+def cap_size(data, max_bytes, quality):
+    """
+    Re-encode a JPEG until it fits in max_bytes
+
+    Lowers the quality first, then halves the dimensions.
+    """
+    if len(data) <= max_bytes:
+        return data
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = source.convert('RGB')
+
+    quality = max(quality - 15, MIN_QUALITY)
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= max_bytes or min(image.size) < 200:
+            return data
+        if quality > MIN_QUALITY:
+            quality = max(quality - 15, MIN_QUALITY)
+        else:
+            image = image.resize((image.width // 2, image.height // 2), Image.LANCZOS)
+
+
+class ScreenshotWriter:
+    """
+    Background writer for failure screenshots (one thread, FIFO)
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='screenshot-writer')
+        self.lock = threading.Lock()
+        # sha256 of the captured bytes -> stored name
+        self._stored = {}
+
+    def submit(self, data, job_id=None, post_id=None, error_log_id=None, operation_id=None):
+        """
+        Queue a screenshot for writing
+
+        Args:
+            data: JPEG bytes from capture_failure() (None is ignored)
+            job_id: PostingJob.job_id used in the file path
+            post_id: MarketplacePost id used in the file name
+            error_log_id: Optional ErrorLog to attach the file to
+            operation_id: Optional AutomationOperation to attach the file to
+                          (its files go under operation_<id>/ without a job)
+
+        Returns:
+            Future resolving to the stored name (relative to MEDIA_ROOT),
+            or None if there was nothing to write
+        """
+        if not data:
+            return None
+        if not job_id and operation_id:
+            job_id = f'operation_{operation_id}'
+        return self.executor.submit(
+            self._write, data, job_id, post_id, error_log_id, operation_id)
+
+    def _write(self, data, job_id, post_id, error_log_id, operation_id):
+        try:
+            name = self._store(data, job_id, post_id)
+            if error_log_id or operation_id:
+                self._attach(name, error_log_id, operation_id)
+            return name
+        except Exception as e:
+            logger.warning("Could not save failure screenshot: %s", e)
+            return None
+
+    def _store(self, data, job_id, post_id):
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self.lock:
+            existing = self._stored.get(digest)
+        if existing and default_storage.exists(existing):
+            return existing
+
+        options = _settings()
+        name = (f"{SCREENSHOT_DIR}/{job_id or 'no_job'}/"
+                f"{post_id or 'post'}_{digest[:16]}.jpg")
+        if not default_storage.exists(name):
+            data = cap_size(data, options['max_bytes'], options['quality'])
+            name = default_storage.save(name, ContentFile(data))
+            print(f"📷 Failure screenshot saved: {name} ({len(data) / 1024:.0f} KB)")
+
+        with self.lock:
+            self._stored[digest] = name
+        return name
+
+    def _attach(self, name, error_log_id=None, operation_id=None):
+        from postings.models import ErrorLog
+        from .models import AutomationOperation
+
+        try:
+            if error_log_id:
+                ErrorLog.objects.filter(pk=error_log_id).update(screenshot=name)
+            if operation_id:
+                AutomationOperation.objects.filter(pk=operation_id).update(screenshot=name)
+        finally:
+            # This thread outlives requests/commands - don't keep stale connections
+            close_old_connections()
+
+
+# Shared writer used by the automation flows
+screenshot_writer = ScreenshotWriter()
@@ -0,0 +1,138 @@
+"""
+Image Preprocessing before upload
+=================================
+
+Phone photos are often several MB (and HEIC / PNG / WebP). Facebook
+re-encodes them anyway, so uploading the original only costs time.
+prepare_image() turns the source into a small JPEG first:
+
+- auto-orient from EXIF, then drop EXIF/GPS and other metadata
+- downscale so the longest side is at most AUTOMATION_IMAGE_MAX_SIDE
+- convert to RGB (transparent images go on a white background)
+- save as optimized progressive JPEG (AUTOMATION_IMAGE_JPEG_QUALITY)
+
+Results are cached in AUTOMATION_IMAGE_CACHE_DIR, keyed by the SHA-256
+of the source content, so posting one product to 30 accounts prepares it
+once. HEIC needs the optional pillow-heif package.
+
+If anything goes wrong the original path is returned and posting goes on.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from django.conf import settings
+from PIL import Image, ImageOps
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Optional: HEIC/HEIF support for iPhone photos
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+# (path, mtime, size) -> sha256, so repeated posts don't re-read the file
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def _settings():
+    return {
+        'cache_dir': getattr(settings, 'AUTOMATION_IMAGE_CACHE_DIR',
+                             os.path.join(settings.MEDIA_ROOT, 'prepared_images')),
+        'max_side': getattr(settings, 'AUTOMATION_IMAGE_MAX_SIDE', 2048),
+        'quality': getattr(settings, 'AUTOMATION_IMAGE_JPEG_QUALITY', 85),
+    }
+
+
+def content_hash(path):
+    """SHA-256 of a file's content (memoized by path, mtime and size)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    with _hash_lock:
+        digest = _hash_memo.get(key)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[key] = digest
+    return digest
+
+
+def _to_rgb(image):
+    """Flatten transparency onto white and convert to RGB"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _render(source_path, target_path, max_side, quality):
+    with Image.open(source_path) as image:
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image = _to_rgb(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        # Write to a temp file first: several workers may prepare the
+        # same product at the same time
+        fd, tmp_path = tempfile.mkstemp(
+            suffix='.jpg', dir=os.path.dirname(target_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # No exif= argument -> metadata is not written
+                image.save(f, 'JPEG', quality=quality, optimize=True,
+                           progressive=True, icc_profile=icc_profile)
+            os.replace(tmp_path, target_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def prepare_image(source_path):
+    """
+    Return the path of an upload-ready JPEG for source_path
+
+    Args:
+        source_path: Original product image
+
+    Returns:
+        str: Cached prepared JPEG, or source_path if preparation failed
+    """
+    options = _settings()
+    try:
+        digest = content_hash(source_path)
+        cache_dir = os.path.join(options['cache_dir'], digest[:2])
+        # Encoding options are part of the key so changing them re-renders
+        target_path = os.path.join(
+            cache_dir, f"{digest}_{options['max_side']}_q{options['quality']}.jpg")
+
+        if os.path.exists(target_path):
+            return target_path
+
+        os.makedirs(cache_dir, exist_ok=True)
+        _render(source_path, target_path, options['max_side'], options['quality'])
+
+        before = os.path.getsize(source_path) / 1024
+        after = os.path.getsize(target_path) / 1024
+        print(f"🖼️  Prepared image: {before:.0f} KB → {after:.0f} KB")
+        return target_path
+
+    except Exception as e:
+        print(f"⚠️ Could not prepare image, uploading original: {e}")
+        logger.warning("Image preparation failed for %s: %s", source_path, e)
+        return source_path
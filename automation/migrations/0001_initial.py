@@ -0,0 +1,36 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('post', 'Post Listing'), ('renew', 'Renew Listings')], max_length=10)),
+                ('account_email', models.EmailField(max_length=254)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('lease_owner', models.CharField(blank=True, default='', max_length=200)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'operation_type', 'created_at'], name='op_queue_claim_idx'), models.Index(fields=['account_email', 'status'], name='op_queue_account_idx'), models.Index(fields=['status', 'lease_expires_at'], name='op_queue_lease_idx')],
+            },
+        ),
+    ]
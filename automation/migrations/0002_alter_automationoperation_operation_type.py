@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='automationoperation',
+            name='operation_type',
+            field=models.CharField(choices=[('post', 'Post Listing'), ('renew', 'Renew Listings'), ('post_job', 'Posting Job (one account)')], max_length=20),
+        ),
+    ]
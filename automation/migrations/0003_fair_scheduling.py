@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0002_alter_automationoperation_operation_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='automationoperation',
+            name='op_queue_claim_idx',
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='cost',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='finish_tag',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('normal', 'Normal'), ('bulk', 'Bulk backlog')], default='normal', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='start_tag',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='automation_operations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='automationoperation',
+            index=models.Index(fields=['status', 'operation_type', 'start_tag'], name='op_queue_claim_idx'),
+        ),
+    ]
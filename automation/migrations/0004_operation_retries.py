@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0003_fair_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='automationoperation',
+            name='available_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='error_type',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='automationoperation',
+            name='retries',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='automationoperation',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('parked', 'Parked')], default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0004_operation_retries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountCircuitBreaker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_email', models.EmailField(max_length=254, unique=True)),
+                ('state', models.CharField(choices=[('closed', 'Closed'), ('open', 'Open'), ('half_open', 'Half-open (probing)')], default='closed', max_length=20)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('last_error_type', models.CharField(blank=True, default='', max_length=30)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('trips', models.PositiveIntegerField(default=0)),
+                ('opened_at', models.DateTimeField(blank=True, null=True)),
+                ('retry_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'retry_at'], name='breaker_state_idx')],
+            },
+        ),
+    ]
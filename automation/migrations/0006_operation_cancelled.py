@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0005_account_circuit_breaker'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='automationoperation',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('parked', 'Parked'), ('cancelled', 'Cancelled')], default='queued', max_length=20),
+        ),
+    ]
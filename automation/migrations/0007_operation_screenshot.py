@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0006_operation_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='automationoperation',
+            name='screenshot',
+            field=models.ImageField(blank=True, null=True, upload_to='error_screenshots/'),
+        ),
+    ]
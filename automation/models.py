@@ -1,3 +1,124 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class AutomationOperation(models.Model):
+    """
+    One queued posting / renewal operation (the persistent GLOBAL queues)
+
+    Workers in any process claim operations by setting status='running'
+    with a lease; an operation whose lease expires (worker crashed or was
+    killed mid-run) is put back in the queue by the next claim.
+
+    Operations are served in start_tag order (weighted fair queuing across
+    users and priority classes, see operation_queue), not by arrival time.
+    Retries wait until available_at; 'parked' operations wait for a human
+    (e.g. an expired session) and are requeued when the account is fixed.
+    Operations of a paused / cancelled PostingJob end as 'cancelled'.
+    """
+    OPERATION_TYPES = [
+        ('post', 'Post Listing'),
+        ('renew', 'Renew Listings'),
+        ('post_job', 'Posting Job (one account)'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('parked', 'Parked'),
+        ('cancelled', 'Cancelled'),
+    ]
+    PRIORITY_CHOICES = [
+        ('interactive', 'Interactive'),
+        ('normal', 'Normal'),
+        ('bulk', 'Bulk backlog'),
+    ]
+
+    operation_type = models.CharField(max_length=20, choices=OPERATION_TYPES)
+    account_email = models.EmailField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='automation_operations')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Lease held by the worker running the operation
+    lease_owner = models.CharField(max_length=200, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    # Fair scheduling: cost in listings, virtual start / finish time
+    priority = models.CharField(
+        max_length=20, choices=PRIORITY_CHOICES, default='normal')
+    cost = models.PositiveIntegerField(default=1)
+    start_tag = models.FloatField(default=0)
+    finish_tag = models.FloatField(default=0)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True, null=True)
+
+    # Automatic retries (retry_policy): how many so far, not claimed before
+    retries = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(null=True, blank=True)
+    error_type = models.CharField(max_length=30, blank=True, default='')
+    # Page of the last failed run (written in the background, failure_screenshots)
+    screenshot = models.ImageField(
+        upload_to='error_screenshots/', blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'operation_type', 'start_tag'],
+                         name='op_queue_claim_idx'),
+            models.Index(fields=['account_email', 'status'],
+                         name='op_queue_account_idx'),
+            models.Index(fields=['status', 'lease_expires_at'],
+                         name='op_queue_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation_type} for {self.account_email} - {self.status}"
+
+
+class AccountCircuitBreaker(models.Model):
+    """
+    Circuit breaker state of one Facebook account (see automation.circuit_breaker)
+
+    closed    - work runs normally
+    open      - consecutive failures tripped it; the account's work is not
+                claimed / fast-fails until retry_at
+    half_open - retry_at passed and one probe is running; success closes
+                the breaker, failure opens it again for longer
+    """
+    STATE_CHOICES = [
+        ('closed', 'Closed'),
+        ('open', 'Open'),
+        ('half_open', 'Half-open (probing)'),
+    ]
+
+    account_email = models.EmailField(unique=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='closed')
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    last_error_type = models.CharField(max_length=30, blank=True, default='')
+    last_error = models.TextField(blank=True, null=True)
+
+    # How often it tripped in a row (cool-down doubles each time)
+    trips = models.PositiveIntegerField(default=0)
+    opened_at = models.DateTimeField(null=True, blank=True)
+    # Open: earliest probe; half-open: when a stuck probe may be replaced
+    retry_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'retry_at'], name='breaker_state_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_email} - {self.state}"
@@ -0,0 +1,311 @@
+"""
+Network Request Filtering for automation pages
+==============================================
+
+The bot never looks at feed images, videos, fonts or tracking pixels, but
+Facebook loads all of them on the create-item and renew-listings pages.
+A NetworkFilter is attached to every automation BrowserContext and
+decides per request:
+
+- BLOCK  → request is aborted (URL deny list / blocked resource types)
+- ALLOW  → request goes to the network (allow list: never stubbed)
+- STUB   → request is answered locally with a tiny placeholder, so the
+           page does not wait on or retry it
+
+Blocking wins over the allow list on every browser: on Chromium the
+blocked patterns are enforced by the browser itself and never reach
+decide(), so the allow list can only protect requests from stubbing.
+Keep deny globs and blocked resource types narrow enough not to hit
+uploads, GraphQL or the marketplace pages.
+
+Only requests that can be blocked or stubbed are looked at, so the HTTP
+cache keeps working (pages of the same batch reuse Facebook's scripts):
+
+- on Chromium, blocked URL patterns (deny list + the URL patterns of the
+  blocked resource types) go to Network.setBlockedURLs - no interception
+- stubbing needs interception: a route is registered only for the URL
+  patterns of the stubbed resource types. Any route turns Chromium's
+  cache off for the context, so nothing is stubbed by default
+- other browsers get one route for the blocked and stubbed patterns
+
+Images of pages matching keep_images_on_pages (the create-item form with
+the upload preview) are never stubbed.
+
+Requests, (estimated) bytes saved and - on Chromium - bytes actually
+downloaded and requests served from the cache are counted per page.
+
+Configure via settings.AUTOMATION_NETWORK_PROFILE (merged over
+DEFAULT_PROFILE) or disable with AUTOMATION_NETWORK_FILTER_ENABLED = False.
+"""
+
+import base64
+import re
+from fnmatch import fnmatch
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 1x1 transparent GIF used to stub images
+STUB_GIF = base64.b64decode(
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+DEFAULT_PROFILE = {
+    # Resource types aborted outright
+    'block_resource_types': ['media', 'font'],
+    # Resource types answered with a placeholder (turns the cache off on
+    # Chromium, see module docstring)
+    'stub_resource_types': [],
+    # Pages whose images are never stubbed (upload preview)
+    'keep_images_on_pages': ['*/marketplace/create/*'],
+    # URL globs that are never stubbed (the deny list and blocked resource
+    # types still win - Chromium blocks them before any route runs)
+    'allow_patterns': [
+        '*/marketplace/*',
+        '*/api/graphql/*',
+        '*upload*',
+        'data:*',
+        'blob:*',
+    ],
+    # URL globs that are always blocked (trackers, pixels, video)
+    'deny_patterns': [
+        '*facebook.com/tr*',
+        '*facebook.com/ajax/bz*',
+        '*/ajax/bnzai*',
+        '*/logging/*',
+        '*doubleclick.net*',
+        '*google-analytics.com*',
+        '*googletagmanager.com*',
+        '*video*.fbcdn.net*',
+    ],
+    # URL globs of each resource type - only these requests are blocked /
+    # intercepted for the types above
+    'resource_type_patterns': {
+        'media': ['*.mp4*', '*.webm*', '*.m4a*', '*.m3u8*'],
+        'font': ['*.woff*', '*.ttf*', '*.otf*', '*.eot*'],
+        'image': ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.svg*', '*.ico*'],
+    },
+    # Rough average sizes used to estimate bytes saved (we never download
+    # the blocked response, so its real size is unknown)
+    'estimated_bytes': {
+        'image': 45000,
+        'media': 600000,
+        'font': 40000,
+        'script': 30000,
+        'stylesheet': 15000,
+        'other': 2000,
+    },
+}
+
+
+def get_network_profile():
+    """Return the active profile (settings override merged over defaults)"""
+    return {**DEFAULT_PROFILE, **getattr(settings, 'AUTOMATION_NETWORK_PROFILE', {})}
+
+
+def is_enabled():
+    return getattr(settings, 'AUTOMATION_NETWORK_FILTER_ENABLED', True)
+
+
+def glob_regex(patterns):
+    """One regex matching any of the URL globs ('*' = anything, like fnmatch)"""
+    return re.compile('^(?:' + '|'.join(
+        re.escape(pattern).replace(r'\*', '.*') for pattern in patterns) + ')$')
+
+
+class NetworkFilter:
+    """
+    Route interceptor for one BrowserContext
+
+    USAGE:
+        network_filter = NetworkFilter()
+        network_filter.attach(context)   # before the first page opens
+        ...
+        network_filter.summary()
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile or get_network_profile()
+        # page -> counters
+        self.page_stats = {}
+        # Chromium: blocked requests are aborted by CDP and counted when they fail
+        self.cdp_blocking = False
+
+    def decide(self, url, resource_type, page_url=None):
+        """
+        Decide what to do with a request
+
+        Args:
+            url: Request URL
+            resource_type: Playwright resource type ('image', 'font'...)
+            page_url: URL of the page that made the request
+
+        Returns:
+            str: 'allow', 'block' or 'stub'
+        """
+        # Same order as on Chromium, where blocked patterns never get here
+        if any(fnmatch(url, pattern) for pattern in self.profile['deny_patterns']):
+            return 'block'
+        if resource_type in self.profile['block_resource_types']:
+            return 'block'
+        if any(fnmatch(url, pattern) for pattern in self.profile['allow_patterns']):
+            return 'allow'
+        if resource_type in self.profile['stub_resource_types']:
+            if resource_type == 'image' and page_url and any(
+                    fnmatch(page_url, pattern)
+                    for pattern in self.profile['keep_images_on_pages']):
+                return 'allow'
+            return 'stub'
+        return 'allow'
+
+    def _type_patterns(self, resource_types):
+        type_patterns = self.profile['resource_type_patterns']
+        return [pattern for resource_type in resource_types
+                for pattern in type_patterns.get(resource_type, [])]
+
+    def blocked_patterns(self):
+        """URL globs that are blocked (deny list + blocked resource types)"""
+        return (list(self.profile['deny_patterns'])
+                + self._type_patterns(self.profile['block_resource_types']))
+
+    def stubbed_patterns(self):
+        """URL globs that may be stubbed (stubbed resource types)"""
+        return self._type_patterns(self.profile['stub_resource_types'])
+
+    def _stats(self, page):
+        return self.page_stats.setdefault(page, {
+            'requests': 0,
+            'requests_blocked': 0,
+            'requests_stubbed': 0,
+            'bytes_saved': 0,
+            'bytes_downloaded': 0,
+            'requests_from_cache': 0,
+        })
+
+    @staticmethod
+    def _page_of(request):
+        try:
+            return request.frame.page
+        except Exception:
+            # Service worker / detached frame requests have no page
+            return None
+
+    def _record(self, request, action):
+        stats = self._stats(self._page_of(request))
+        stats['requests_blocked' if action == 'block' else 'requests_stubbed'] += 1
+        estimates = self.profile['estimated_bytes']
+        stats['bytes_saved'] += estimates.get(
+            request.resource_type, estimates.get('other', 0))
+
+    def _on_request(self, request):
+        self._stats(self._page_of(request))['requests'] += 1
+
+    def _on_request_failed(self, request):
+        # Blocked by setBlockedURLs or by route.abort('blockedbyclient')
+        if 'ERR_BLOCKED_BY_CLIENT' in (request.failure or ''):
+            self._record(request, 'block')
+
+    def _handle(self, route, request):
+        try:
+            page_url = request.frame.page.url
+        except Exception:
+            page_url = None
+        action = self.decide(request.url, request.resource_type, page_url)
+        try:
+            if action != 'allow' and not (action == 'block' and self.cdp_blocking):
+                self._record(request, action)
+            if action == 'block':
+                route.abort('blockedbyclient')
+            elif action == 'stub':
+                route.fulfill(status=200, content_type='image/gif', body=STUB_GIF)
+            else:
+                route.fallback()
+        except Exception:
+            # Page/context closed while the request was in flight
+            pass
+
+    def _watch_page(self, context, page, blocked):
+        """Block URL patterns and count downloaded bytes through CDP (Chromium)"""
+        stats = self._stats(page)
+
+        def on_finished(event):
+            stats['bytes_downloaded'] += int(event.get('encodedDataLength', 0))
+
+        def on_cached(event):
+            stats['requests_from_cache'] += 1
+
+        try:
+            session = context.new_cdp_session(page)
+            session.on('Network.loadingFinished', on_finished)
+            session.on('Network.requestServedFromCache', on_cached)
+            session.send('Network.enable')
+            if blocked:
+                session.send('Network.setBlockedURLs', {'urls': blocked})
+        except Exception as e:
+            logger.debug("Network filter could not watch page: %s", e)
+
+    def attach(self, context):
+        """
+        Filter the requests of a BrowserContext
+
+        Call before the context opens its first page.
+        """
+        context.on('request', self._on_request)
+
+        blocked = self.blocked_patterns()
+        routed = self.stubbed_patterns()
+        try:
+            self.cdp_blocking = context.browser.browser_type.name == 'chromium'
+        except Exception:
+            self.cdp_blocking = False
+
+        if self.cdp_blocking:
+            context.on('requestfailed', self._on_request_failed)
+            context.on('page', lambda page: self._watch_page(context, page, blocked))
+        else:
+            routed = blocked + routed
+
+        if routed:
+            context.route(glob_regex(routed), self._handle)
+
+    def summary(self):
+        """
+        Per-page and total counters
+
+        Returns:
+            dict: {'pages': [{url, requests_*, bytes_saved}], 'totals': {...}}
+        """
+        pages = []
+        totals = {
+            'requests_allowed': 0,
+            'requests_blocked': 0,
+            'requests_stubbed': 0,
+            'bytes_saved': 0,
+            'bytes_downloaded': 0,
+            'requests_from_cache': 0,
+        }
+
+        for page, stats in self.page_stats.items():
+            try:
+                url = page.url if page else None
+            except Exception:
+                url = None
+            counters = {key: value for key, value in stats.items() if key != 'requests'}
+            counters['requests_allowed'] = max(
+                stats['requests'] - stats['requests_blocked'] - stats['requests_stubbed'], 0)
+            pages.append({'url': url, **counters})
+            for key in totals:
+                totals[key] += counters[key]
+
+        return {'pages': pages, 'totals': totals}
+
+    def log_summary(self):
+        """Print one line per page with requests / bytes saved"""
+        for page in self.summary()['pages']:
+            saved = page['requests_blocked'] + page['requests_stubbed']
+            if saved or page['bytes_downloaded']:
+                print(
+                    f"🧹 Network filter: {saved} request(s) skipped "
+                    f"(~{page['bytes_saved'] / 1024:.0f} KB), "
+                    f"{page['bytes_downloaded'] / 1024:.0f} KB downloaded, "
+                    f"{page['requests_from_cache']} from cache on {page['url']}")
@@ -0,0 +1,881 @@
+"""
+Persistent Operation Queue
+==========================
+
+The GLOBAL POST / RENEW queues live in the AutomationOperation table
+instead of in-process deques, so queued work survives restarts and any
+number of worker processes can drain the same queues.
+
+- Weighted fair queuing across users: enqueue() gives every operation a
+  virtual start / finish tag per flow (user + priority class), weighted by
+  AUTOMATION_USER_WEIGHTS x AUTOMATION_PRIORITY_WEIGHTS and charged by
+  cost (listings). One user's 500-post backlog advances its own tags, so
+  another user's single listing is served next instead of after it.
+- claim() atomically takes the queued operation with the lowest start tag
+  (ties: lowest finish tag, so cheap / heavily weighted work goes first)
+  whose account is not running anywhere (compare-and-set UPDATE, no
+  table locks needed, so it works on SQLite and PostgreSQL alike). For
+  POST, the account's other queued posts are claimed with it so they
+  share one browser session.
+- Posting queues skip accounts whose rate limiter (rate_limiter) doesn't
+  allow a listing yet; work it holds back mid-batch goes back with defer().
+- No queue claims work for an account whose circuit breaker is open
+  (circuit_breaker); settle_failure() feeds the breaker.
+- Failed listings are settled by retry_policy (settle_failure() /
+  settle_post_job()): retried after a backoff (available_at), cooled down,
+  parked until the account is fixed (unpark_account()) or failed.
+- A claim is a lease (AUTOMATION_QUEUE_LEASE_SECONDS). Workers extend it
+  while they run (heartbeat()); when a worker dies the lease expires and
+  reclaim_expired() puts the operation back in the queue, or fails it
+  after max_attempts.
+- complete() / fail() only touch operations still leased by the caller,
+  so a worker whose lease was taken over cannot overwrite the new run.
+- Admission control: admit() refuses new work (QueueFullError) once a
+  queue's backlog (queued + running listings) would pass
+  AUTOMATION_QUEUE_MAX_BACKLOG, or a user's would pass
+  AUTOMATION_QUEUE_MAX_BACKLOG_PER_USER, with a retry-after computed from
+  the current throughput. admission() holds the check until the work is
+  enqueued (one transaction, serialized per queue), so concurrent
+  requests can't all pass the check and overfill the queue.
+
+USAGE:
+    with operation_queue.admission('post', user, units=1, workers=2):  # may raise QueueFullError
+        operation_queue.enqueue('post', email, {'title': ...}, user=user, priority='interactive')
+    operations = operation_queue.claim('post', owner)
+    ...
+    operation_queue.complete(operations[0], owner)
+"""
+
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+import logging
+
+from .circuit_breaker import circuit_breaker
+from .exceptions import classify_exception
+from .models import AutomationOperation
+from .rate_limiter import rate_limiter
+from . import retry_policy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY_WEIGHTS = {'interactive': 8, 'normal': 4, 'bulk': 1}
+ACTIVE_STATUSES = ('queued', 'running')
+# Queues whose operations publish listings (subject to the account rate limiter)
+RATE_LIMITED_TYPES = ('post', 'post_job')
+
+
+class QueueFullError(Exception):
+    """Raised by admit() instead of queueing work past the admission limits"""
+
+    def __init__(self, message, retry_after=None, estimated_wait=0, scope='global'):
+        super().__init__(message)
+        # Seconds until enough backlog drained (None - too large to ever fit)
+        self.retry_after = retry_after
+        # Seconds the work would wait in the queue if it were admitted now
+        self.estimated_wait = estimated_wait
+        # 'global' or 'user' - which limit refused it
+        self.scope = scope
+
+    def describe(self):
+        """API dict for the rejection"""
+        return {
+            'error': str(self),
+            'scope': self.scope,
+            'retry_after_seconds': self.retry_after,
+            'estimated_wait_seconds': self.estimated_wait,
+        }
+
+
+def worker_identity(name):
+    """Lease owner string unique across hosts, processes and threads"""
+    return f"{socket.gethostname()}:{os.getpid()}:{name}"
+
+
+class OperationQueue:
+    """
+    Claim / lease / complete API over the AutomationOperation table
+    """
+
+    def __init__(self, lease_seconds=None, max_attempts=None):
+        self.lease_seconds = lease_seconds or getattr(
+            settings, 'AUTOMATION_QUEUE_LEASE_SECONDS', 900)
+        self.max_attempts = max_attempts or getattr(
+            settings, 'AUTOMATION_QUEUE_MAX_ATTEMPTS', 3)
+        self.max_batch = getattr(settings, 'AUTOMATION_MAX_BATCH_SIZE', 10)
+        # Admission limits in listings per queue (0 = unlimited)
+        self.max_backlog = getattr(settings, 'AUTOMATION_QUEUE_MAX_BACKLOG', 1000)
+        self.max_user_backlog = getattr(settings, 'AUTOMATION_QUEUE_MAX_BACKLOG_PER_USER', 200)
+        self._claim_lock = threading.Lock()
+        # Serializes admission() of this process (other processes: database lock)
+        self._admission_lock = threading.Lock()
+        # email -> time.time() it may post again, valid while
+        # rate_limiter.version == self._next_allowed_version
+        self._next_allowed = {}
+        self._next_allowed_version = None
+
+    def _lease_expiry(self):
+        return timezone.now() + timedelta(seconds=self.lease_seconds)
+
+    # ---------------------------------------------------------------
+    # Producers
+    # ---------------------------------------------------------------
+
+    def enqueue(self, operation_type, email, payload, user=None, priority='normal', cost=1):
+        """
+        Add an operation to a GLOBAL queue
+
+        Args:
+            operation_type: 'post', 'renew' or 'post_job'
+            email: Facebook account email
+            payload: JSON-serializable operation data
+            user: User the work is done for (default: owner of the account)
+            priority: 'interactive', 'normal' or 'bulk'
+            cost: Work units (listings) the operation stands for
+
+        Returns:
+            AutomationOperation
+        """
+        if user is None:
+            user = self._account_owner(email)
+        cost = max(1, int(cost))
+
+        # Tags of concurrent enqueues in other processes may interleave
+        # slightly - that only shifts the order, nothing is lost
+        with self._claim_lock:
+            start_tag, finish_tag = self._next_tags(
+                operation_type, user, email, priority, cost)
+            return AutomationOperation.objects.create(
+                operation_type=operation_type,
+                account_email=email,
+                user=user,
+                payload=payload,
+                priority=priority,
+                cost=cost,
+                start_tag=start_tag,
+                finish_tag=finish_tag,
+                max_attempts=self.max_attempts,
+            )
+
+    def admit(self, operation_type, user, units=1, workers=1, email=None):
+        """
+        Check that `units` more listings fit in a queue before enqueueing them
+
+        Producers use admission(), which keeps the check until the work is
+        queued.
+
+        Args:
+            operation_type: 'post', 'renew' or 'post_job'
+            user: User submitting the work (default: owner of `email`)
+            units: Listings (operation cost) about to be queued
+            workers: Workers draining the queue (retry-after estimate)
+            email: Account email, to find the user when none is given
+
+        Raises:
+            QueueFullError: The queue's or the user's backlog is full
+        """
+        if user is None and email:
+            user = self._account_owner(email)
+        units = max(1, int(units))
+
+        backlog = self.backlog(operation_type)
+        checks = [('global', self.max_backlog, backlog)]
+        if user is not None:
+            checks.append(('user', self.max_user_backlog, self.backlog(operation_type, user)))
+
+        refused = None
+        for scope, limit, queued in checks:
+            if not limit or queued + units <= limit:
+                continue
+            if units > limit:
+                raise QueueFullError(
+                    f"At most {limit} {operation_type} listing(s) can be queued at once "
+                    f"({units} submitted)", scope=scope)
+            # Wait until enough of the backlog drained to make room
+            wait = self.drain_seconds(operation_type, queued + units - limit, workers)
+            if refused is None or wait > refused[0]:
+                refused = (wait, scope, limit, queued)
+
+        if refused:
+            retry_after, scope, limit, queued = refused
+            raise QueueFullError(
+                f"The {operation_type} queue is full ({queued}/{limit} listings"
+                f"{' for this user' if scope == 'user' else ''}) - retry in {retry_after:.0f}s",
+                retry_after=max(1, round(retry_after)),
+                estimated_wait=round(self.drain_seconds(operation_type, backlog + units, workers)),
+                scope=scope)
+
+    @contextmanager
+    def admission(self, operation_type, user, units=1, workers=1, email=None):
+        """
+        admit() and keep the admission until the work is enqueued
+
+        The backlog check and the enqueue() calls in the with block run in
+        one transaction; other admissions to the same queue wait for it
+        (this process: a lock, other processes: a PostgreSQL advisory lock -
+        SQLite serializes writing transactions itself). If the block raises,
+        nothing it queued is kept.
+
+        Args:
+            Same as admit()
+
+        Raises:
+            QueueFullError: The queue's or the user's backlog is full
+        """
+        with self._admission_lock, transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [
+                        zlib.crc32(f'automation_admission:{operation_type}'.encode())])
+            self.admit(operation_type, user, units, workers, email)
+            yield
+
+    def backlog(self, operation_type, user=None):
+        """Listings queued / running in a queue (parked work doesn't count)"""
+        operations = AutomationOperation.objects.filter(
+            operation_type=operation_type, status__in=ACTIVE_STATUSES)
+        if user is not None:
+            operations = operations.filter(user=user)
+        return operations.aggregate(listings=Sum('cost'))['listings'] or 0
+
+    def _account_owner(self, email):
+        from accounts.models import FacebookAccount
+        account = FacebookAccount.objects.filter(
+            email=email).select_related('user').first()
+        return account.user if account else None
+
+    def flow_weight(self, user, priority):
+        """
+        Share of the workers a flow gets relative to the others
+
+        Args:
+            user: User (or None for accounts without owner)
+            priority: Priority class
+
+        Returns:
+            float: AUTOMATION_USER_WEIGHTS[username] x AUTOMATION_PRIORITY_WEIGHTS[priority]
+        """
+        user_weights = getattr(settings, 'AUTOMATION_USER_WEIGHTS', {})
+        priority_weights = getattr(
+            settings, 'AUTOMATION_PRIORITY_WEIGHTS', DEFAULT_PRIORITY_WEIGHTS)
+
+        user_weight = user_weights.get(user.username, 1) if user else 1
+        return max(float(user_weight) * float(priority_weights.get(priority, 1)), 0.001)
+
+    def _next_tags(self, operation_type, user, email, priority, cost):
+        """
+        Start / finish tag of a new operation (start-time fair queuing)
+
+        start = max(virtual time, last finish tag of the flow)
+        finish = start + cost / weight
+
+        The virtual time is the lowest start tag still queued or running,
+        so a flow that was idle can't bank credit from the past.
+        """
+        active = AutomationOperation.objects.filter(
+            operation_type=operation_type, status__in=ACTIVE_STATUSES)
+        virtual_time = active.aggregate(v=Min('start_tag'))['v'] or 0.0
+
+        flow = active.filter(priority=priority)
+        flow = flow.filter(user=user) if user else flow.filter(
+            user__isnull=True, account_email=email)
+        flow_finish = flow.aggregate(f=Max('finish_tag'))['f'] or 0.0
+
+        start_tag = max(virtual_time, flow_finish)
+        return start_tag, start_tag + cost / self.flow_weight(user, priority)
+
+    # ---------------------------------------------------------------
+    # Workers
+    # ---------------------------------------------------------------
+
+    def reclaim_expired(self):
+        """
+        Requeue (or fail) running operations whose lease expired
+
+        Returns:
+            int: Number of operations reclaimed
+        """
+        now = timezone.now()
+        expired = AutomationOperation.objects.filter(
+            status='running', lease_expires_at__lt=now)
+
+        failed = 0
+        requeued = 0
+        for operation in expired.only('id', 'attempts', 'max_attempts', 'lease_owner'):
+            base = AutomationOperation.objects.filter(
+                id=operation.id, status='running',
+                lease_owner=operation.lease_owner, lease_expires_at__lt=now)
+            if operation.attempts >= operation.max_attempts:
+                failed += base.update(
+                    status='failed', lease_owner='', lease_expires_at=None,
+                    finished_at=now,
+                    last_error=f'Lease expired after {operation.attempts} attempt(s)')
+            else:
+                requeued += base.update(
+                    status='queued', lease_owner='', lease_expires_at=None)
+
+        if failed or requeued:
+            print(f"♻️  Reclaimed expired leases: {requeued} requeued, {failed} failed")
+        return failed + requeued
+
+    def running_accounts(self):
+        """Accounts with an operation currently leased (any queue, any process)"""
+        return set(AutomationOperation.objects.filter(
+            status='running', lease_expires_at__gte=timezone.now()
+        ).values_list('account_email', flat=True))
+
+    def rate_limited_accounts(self, operation_type):
+        """
+        Accounts with queued work that may not post right now
+
+        Each account's next allowed time is asked from the rate limiter once
+        and reused until the limiter's state changes (a listing started, a
+        cool-down, another process posted with the account - sync()),
+        instead of on every claim. Caller holds self._claim_lock.
+        """
+        if operation_type not in RATE_LIMITED_TYPES:
+            return set()
+        rate_limiter.sync()
+        queued = set(AutomationOperation.objects.filter(
+            operation_type=operation_type, status='queued'
+        ).values_list('account_email', flat=True).distinct())
+
+        if self._next_allowed_version != rate_limiter.version:
+            self._next_allowed = {}
+            self._next_allowed_version = rate_limiter.version
+
+        for email in queued:
+            if email not in self._next_allowed:
+                self._next_allowed[email] = rate_limiter.next_allowed_at(email)
+        now = time.time()
+        return {email for email in queued if self._next_allowed[email] > now}
+
+    def _try_claim(self, operation, owner, now):
+        """Compare-and-set one queued operation to running"""
+        return AutomationOperation.objects.filter(
+            id=operation.id, status='queued'
+        ).update(
+            status='running',
+            lease_owner=owner,
+            lease_expires_at=self._lease_expiry(),
+            attempts=operation.attempts + 1,
+            started_at=now,
+        ) == 1
+
+    def _lost_account_race(self, operation, owner):
+        """
+        True if another worker holds the same account
+
+        Checked after our own claim, so of two workers claiming different
+        rows of one account at least the later checker sees the other
+        claim and backs off (both back off when the checks overlap - they
+        retry on the next claim). Never both keep it.
+        """
+        return AutomationOperation.objects.filter(
+            account_email=operation.account_email, status='running',
+            lease_expires_at__gte=timezone.now(),
+        ).exclude(lease_owner=owner).exists()
+
+    def _unclaim(self, operations, owner):
+        """Undo a claim without counting it as an attempt"""
+        AutomationOperation.objects.filter(
+            id__in=[op.id for op in operations], status='running', lease_owner=owner
+        ).update(status='queued', lease_owner='', lease_expires_at=None,
+                 attempts=F('attempts') - 1)
+
+    def claim(self, operation_type, owner):
+        """
+        Atomically claim the next operation (lowest start tag) for a free account
+
+        For POST, the account's other queued posts (up to
+        AUTOMATION_MAX_BATCH_SIZE in total, or fewer if the account's rate
+        limiter allows less) are claimed too. Accounts that have to wait
+        for their rate limiter are skipped.
+
+        Args:
+            operation_type: 'post' or 'renew'
+            owner: Lease owner (worker_identity())
+
+        Returns:
+            list: Claimed AutomationOperation objects (empty if none eligible)
+        """
+        # Threads of one process don't need to race each other in the DB
+        with self._claim_lock:
+            self.reclaim_expired()
+            busy = (self.running_accounts() | self.rate_limited_accounts(operation_type)
+                    | circuit_breaker.blocked_accounts())
+            now = timezone.now()
+
+            candidates = AutomationOperation.objects.filter(
+                Q(available_at__isnull=True) | Q(available_at__lte=now),
+                operation_type=operation_type, status='queued',
+            ).exclude(account_email__in=busy).order_by('start_tag', 'finish_tag', 'id')
+
+            for operation in candidates[:50]:
+                if operation.account_email in busy:
+                    continue
+                if not self._try_claim(operation, owner, now):
+                    # Taken by another process in the meantime
+                    continue
+
+                claimed = [operation]
+                if self._lost_account_race(operation, owner):
+                    self._unclaim(claimed, owner)
+                    busy.add(operation.account_email)
+                    continue
+
+                if operation_type in RATE_LIMITED_TYPES:
+                    # The account is ours now - re-read what other processes
+                    # posted with it before trusting this process's bucket
+                    rate_limiter.refresh(operation.account_email)
+                    if not rate_limiter.allows(operation.account_email):
+                        self._unclaim(claimed, owner)
+                        busy.add(operation.account_email)
+                        continue
+
+                if operation_type == 'post':
+                    claimed += self._claim_account_posts(operation, owner, now)
+
+                for claimed_operation in claimed:
+                    claimed_operation.refresh_from_db()
+                return claimed
+
+        return []
+
+    def _claim_account_posts(self, operation, owner, now):
+        """Claim the account's other queued posts for the same browser session"""
+        limit = min(self.max_batch, rate_limiter.available(operation.account_email)) - 1
+        if limit <= 0:
+            return []
+        extra = AutomationOperation.objects.filter(
+            Q(available_at__isnull=True) | Q(available_at__lte=now),
+            operation_type='post', status='queued',
+            account_email=operation.account_email,
+        ).exclude(id=operation.id).order_by('start_tag', 'finish_tag', 'id')[:limit]
+
+        return [candidate for candidate in extra
+                if self._try_claim(candidate, owner, now)]
+
+    def heartbeat(self, operations, owner):
+        """Extend the lease of operations still held by owner"""
+        return AutomationOperation.objects.filter(
+            id__in=[op.id for op in operations], status='running', lease_owner=owner
+        ).update(lease_expires_at=self._lease_expiry())
+
+    def complete(self, operation, owner):
+        """Mark an operation done (only if owner still holds its lease)"""
+        return self._finish(operation, owner, 'completed')
+
+    def fail(self, operation, owner, error):
+        """Mark an operation failed (only if owner still holds its lease)"""
+        return self._finish(operation, owner, 'failed', str(error))
+
+    def _finish(self, operation, owner, status, error=None):
+        updated = AutomationOperation.objects.filter(
+            id=operation.id, status='running', lease_owner=owner
+        ).update(
+            status=status, last_error=error, lease_owner='',
+            lease_expires_at=None, finished_at=timezone.now())
+        if not updated:
+            logger.warning(
+                "Lease on operation %s was lost before it finished (%s)", operation.id, status)
+        return bool(updated)
+
+    # ---------------------------------------------------------------
+    # Retry policy
+    # ---------------------------------------------------------------
+
+    def settle_failure(self, operation, owner, error):
+        """
+        Retry, cool down, park or fail a single failed operation
+
+        Args:
+            operation: Claimed operation whose run failed
+            owner: Lease owner
+            error: Exception (typed or not) or message
+
+        Returns:
+            dict: retry_policy decision
+        """
+        error_type = classify_exception(error)
+        decision = retry_policy.decide(error_type, operation.retries)
+        action = decision['action']
+        circuit_breaker.record_failure(operation.account_email, error_type, error)
+
+        if action in (retry_policy.RETRY, retry_policy.COOLDOWN):
+            AutomationOperation.objects.filter(
+                id=operation.id, status='running', lease_owner=owner
+            ).update(status='queued', lease_owner='', lease_expires_at=None,
+                     attempts=F('attempts') - 1, retries=F('retries') + 1,
+                     available_at=timezone.now() + timedelta(seconds=decision['delay']),
+                     error_type=error_type, last_error=str(error))
+            if action == retry_policy.COOLDOWN:
+                rate_limiter.cool_down(operation.account_email, decision['delay'])
+            print(f"🔁 Operation #{operation.id} ({error_type}) retries in {decision['delay']}s")
+        elif action == retry_policy.PARK:
+            AutomationOperation.objects.filter(
+                id=operation.id, status='running', lease_owner=owner
+            ).update(error_type=error_type)
+            self._finish(operation, owner, 'parked', str(error))
+            self.park_account(operation.account_email, error)
+        else:
+            AutomationOperation.objects.filter(
+                id=operation.id, status='running', lease_owner=owner
+            ).update(error_type=error_type)
+            self.fail(operation, owner, error)
+        return decision
+
+    def split_off(self, operation, post_ids, status='queued', decision=None, error=None):
+        """
+        Queue part of a 'post_job' chunk as its own operation
+
+        It keeps the chunk's place in the fair queue (tags).
+
+        Args:
+            operation: The chunk's operation
+            post_ids: Listings for the new operation
+            status: 'queued' or 'parked'
+            decision: retry_policy decision (delay / error_type)
+            error: Failure that caused the split
+
+        Returns:
+            AutomationOperation
+        """
+        decision = decision or {}
+        delay = decision.get('delay') or 0
+        return AutomationOperation.objects.create(
+            operation_type=operation.operation_type,
+            account_email=operation.account_email,
+            user_id=operation.user_id,
+            payload={**operation.payload, 'post_ids': list(post_ids)},
+            priority=operation.priority,
+            cost=max(len(post_ids), 1),
+            start_tag=operation.start_tag,
+            finish_tag=operation.finish_tag,
+            max_attempts=operation.max_attempts,
+            status=status,
+            retries=operation.retries + (1 if status == 'queued' else 0),
+            available_at=timezone.now() + timedelta(seconds=delay) if delay else None,
+            error_type=decision.get('error_type', ''),
+            last_error=str(error) if error else None,
+        )
+
+    def settle_post_job(self, operation, owner, outcome):
+        """
+        Settle a 'post_job' chunk from run_job_operation()'s outcome
+
+        Held-back listings are split off (retry / cool-down / park), listings
+        the rate limiter deferred keep the operation queued, the rest
+        completes it.
+
+        Args:
+            operation: Claimed 'post_job' operation
+            owner: Lease owner
+            outcome: dict with deferred (post ids), held
+                     ([{'post_ids', 'decision', 'error'}]) and halted (the
+                     job was paused / cancelled - nothing is requeued)
+        """
+        if outcome.get('halted'):
+            # Unposted listings are picked up again by resume_job()
+            self._finish(operation, owner, 'cancelled', 'Job paused or cancelled')
+            return
+
+        parked = False
+        for held in outcome.get('held', []):
+            decision = held['decision']
+            if decision['action'] == retry_policy.PARK:
+                self.split_off(operation, held['post_ids'], status='parked',
+                               decision=decision, error=held['error'])
+                parked = True
+                continue
+            self.split_off(operation, held['post_ids'], decision=decision, error=held['error'])
+            if decision['action'] == retry_policy.COOLDOWN:
+                rate_limiter.cool_down(operation.account_email, decision['delay'])
+            print(f"🔁 {len(held['post_ids'])} listing(s) of #{operation.id} "
+                  f"({decision['error_type']}) retry in {decision['delay']}s")
+
+        if outcome.get('deferred'):
+            self.defer([operation], owner, payload={
+                **operation.payload, 'post_ids': outcome['deferred']})
+        else:
+            self.complete(operation, owner)
+
+        if parked:
+            error = next(h['error'] for h in outcome['held']
+                         if h['decision']['action'] == retry_policy.PARK)
+            self.park_account(operation.account_email, error)
+
+    def park_account(self, email, reason):
+        """
+        Park the account's queued posting work until a human fixes the account
+
+        Returns:
+            int: Number of operations parked
+        """
+        parked = AutomationOperation.objects.filter(
+            account_email=email, status='queued', operation_type__in=RATE_LIMITED_TYPES
+        ).update(status='parked', last_error=str(reason))
+        print(f"🅿️  Parked posting work for {email}: {reason}")
+        return parked
+
+    def unpark_account(self, email):
+        """
+        Requeue the account's parked operations (e.g. after a session re-import)
+
+        Returns:
+            int: Number of operations requeued
+        """
+        requeued = AutomationOperation.objects.filter(
+            account_email=email, status='parked'
+        ).update(status='queued', available_at=None, lease_owner='',
+                 lease_expires_at=None, finished_at=None)
+        circuit_breaker.reset(email)
+        if requeued:
+            print(f"▶️ Requeued {requeued} parked operation(s) for {email}")
+        return requeued
+
+    def cancel_job_operations(self, job_id):
+        """
+        Cancel the queued / parked 'post_job' operations of a PostingJob
+
+        Running ones stop by themselves at their next listing.
+
+        Returns:
+            int: Number of operations cancelled
+        """
+        return AutomationOperation.objects.filter(
+            operation_type='post_job', status__in=('queued', 'parked'), payload__job_id=job_id
+        ).update(status='cancelled', finished_at=timezone.now(),
+                 last_error='Job paused or cancelled')
+
+    def job_has_active_operations(self, job_id):
+        """True if any 'post_job' operation of the job is queued / running"""
+        return AutomationOperation.objects.filter(
+            operation_type='post_job', status__in=ACTIVE_STATUSES, payload__job_id=job_id
+        ).exists()
+
+    def fail_parked_job_operations(self, job_id):
+        """
+        Fail the parked 'post_job' operations of a job with nothing queued / running left
+
+        Nothing else of the job would ever settle them, so the job could
+        not finish.
+
+        Returns:
+            list: Post ids of the operations this call failed
+        """
+        operations = AutomationOperation.objects.filter(
+            operation_type='post_job', payload__job_id=job_id)
+        if operations.filter(status__in=ACTIVE_STATUSES).exists():
+            return []
+
+        post_ids = []
+        for operation in operations.filter(status='parked'):
+            # Only once, if two workers finish the job's last chunks together
+            if operations.filter(id=operation.id, status='parked').update(
+                    status='failed', finished_at=timezone.now()):
+                post_ids.extend(operation.payload.get('post_ids', []))
+        return post_ids
+
+    def settle_unfinished(self, operations, owner, error):
+        """Retry / park / fail the operations of a batch that were not settled yet"""
+        unfinished = set(AutomationOperation.objects.filter(
+            id__in=[op.id for op in operations], status='running', lease_owner=owner
+        ).values_list('id', flat=True))
+        for operation in operations:
+            if operation.id in unfinished:
+                self.settle_failure(operation, owner, error)
+
+    def defer(self, operations, owner, payload=None):
+        """
+        Put operations the rate limiter held back in the queue again
+
+        They keep their place (tags) and the claim is not counted as an
+        attempt.
+
+        Args:
+            operations: Claimed operations to give back
+            owner: Lease owner
+            payload: New payload for a single partly run operation (its
+                     remaining work; cost follows payload['post_ids'])
+        """
+        if payload is not None:
+            AutomationOperation.objects.filter(
+                id=operations[0].id, status='running', lease_owner=owner
+            ).update(payload=payload, cost=max(len(payload.get('post_ids', [])), 1))
+        self._unclaim(operations, owner)
+
+    def release(self, operations, owner):
+        """Put unfinished claimed operations back in the queue (shutdown)"""
+        return AutomationOperation.objects.filter(
+            id__in=[op.id for op in operations], status='running', lease_owner=owner
+        ).update(status='queued', lease_owner='', lease_expires_at=None)
+
+    # ---------------------------------------------------------------
+    # Monitoring
+    # ---------------------------------------------------------------
+
+    def active_post_ids(self):
+        """MarketplacePost ids in queued / running / parked posting jobs"""
+        post_ids = set()
+        for payload in AutomationOperation.objects.filter(
+                operation_type='post_job', status__in=ACTIVE_STATUSES + ('parked',)
+        ).values_list('payload', flat=True):
+            post_ids.update(payload.get('post_ids', []))
+        return post_ids
+
+    def has_queued(self, operation_type):
+        return AutomationOperation.objects.filter(
+            operation_type=operation_type, status='queued').exists()
+
+    def snapshot(self):
+        """Queue sizes and per-account depth for status endpoints"""
+        queued = AutomationOperation.objects.filter(status='queued')
+        sizes = dict(queued.values_list('operation_type').annotate(n=Count('id')))
+
+        account_queue_depth = defaultdict(lambda: {'post': 0, 'renew': 0})
+        for email, operation_type, n in queued.values_list(
+                'account_email', 'operation_type').annotate(n=Count('id')):
+            account_queue_depth[email][operation_type] = n
+
+        running = AutomationOperation.objects.filter(
+            status='running', lease_expires_at__gte=timezone.now())
+
+        return {
+            'parked_operations': AutomationOperation.objects.filter(status='parked').count(),
+            'delayed_operations': queued.filter(available_at__gt=timezone.now()).count(),
+            'post_queue_size': sizes.get('post', 0),
+            'renew_queue_size': sizes.get('renew', 0),
+            'total_queue_size': sum(sizes.values()),
+            'running_operations': running.count(),
+            'busy_accounts': sorted(set(running.values_list('account_email', flat=True))),
+            'account_queue_depth': dict(account_queue_depth),
+        }
+
+    def seconds_per_unit(self, operation_type, sample=20):
+        """
+        Average run time per listing of recently completed operations
+
+        Falls back to AUTOMATION_ESTIMATED_SECONDS_PER_LISTING before
+        anything has completed.
+        """
+        recent = AutomationOperation.objects.filter(
+            operation_type=operation_type, status='completed',
+            started_at__isnull=False, finished_at__isnull=False,
+        ).order_by('-finished_at').values_list('started_at', 'finished_at', 'cost')[:sample]
+
+        total_seconds = 0.0
+        total_cost = 0
+        for started_at, finished_at, cost in recent:
+            total_seconds += (finished_at - started_at).total_seconds()
+            total_cost += cost or 1
+        if not total_cost:
+            return float(getattr(settings, 'AUTOMATION_ESTIMATED_SECONDS_PER_LISTING', 60))
+        return total_seconds / total_cost
+
+    def drain_seconds(self, operation_type, listings, workers=1):
+        """Seconds `workers` need for `listings` at the current throughput"""
+        return listings / max(workers, 1) * self.seconds_per_unit(operation_type)
+
+    def admission_stats(self, workers=None, user=None):
+        """
+        Backlog against the admission limits per queue
+
+        Args:
+            workers: Dict queue type -> number of workers (drain estimate)
+            user: Also report this user's backlog / limit
+
+        Returns:
+            dict: queue type -> {backlog, limit, saturation (1.0 = full),
+                  drain_seconds[, user_backlog, user_limit, user_saturation]}
+        """
+        workers = workers or {}
+        active = AutomationOperation.objects.filter(status__in=ACTIVE_STATUSES)
+        backlogs = dict(active.values_list('operation_type').annotate(listings=Sum('cost')))
+        user_backlogs = dict(active.filter(user=user).values_list(
+            'operation_type').annotate(listings=Sum('cost'))) if user is not None else {}
+
+        def saturation(backlog, limit):
+            return round(backlog / limit, 2) if limit else 0.0
+
+        stats = {}
+        for operation_type in ('post', 'renew', 'post_job'):
+            backlog = backlogs.get(operation_type) or 0
+            stats[operation_type] = {
+                'backlog': backlog,
+                'limit': self.max_backlog,
+                'saturation': saturation(backlog, self.max_backlog),
+                'drain_seconds': round(self.drain_seconds(
+                    operation_type, backlog, workers.get(operation_type, 1))) if backlog else 0,
+            }
+            if user is not None:
+                user_backlog = user_backlogs.get(operation_type) or 0
+                stats[operation_type].update({
+                    'user_backlog': user_backlog,
+                    'user_limit': self.max_user_backlog,
+                    'user_saturation': saturation(user_backlog, self.max_user_backlog),
+                })
+        return stats
+
+    def user_queue_status(self, user, workers=None):
+        """
+        Queue position and estimated wait of a user's queued work
+
+        Args:
+            user: User
+            workers: Dict queue type -> number of workers (wait estimate)
+
+        Returns:
+            dict: queue type -> {queued_operations, queued_listings,
+                  position, listings_ahead, estimated_wait_seconds}
+                  (position is 1 when the user's next operation is up next)
+        """
+        workers = workers or {}
+        queued = AutomationOperation.objects.filter(status='queued')
+        status = {}
+
+        own = queued.filter(user=user).values('operation_type').annotate(
+            n=Count('id'), listings=Sum('cost'))
+        for row in own:
+            operation_type = row['operation_type']
+            first = queued.filter(user=user, operation_type=operation_type).order_by(
+                'start_tag', 'finish_tag', 'id').first()
+
+            # Claim order is (start_tag, finish_tag, id)
+            ahead = queued.filter(operation_type=operation_type).filter(
+                Q(start_tag__lt=first.start_tag)
+                | Q(start_tag=first.start_tag, finish_tag__lt=first.finish_tag)
+                | Q(start_tag=first.start_tag, finish_tag=first.finish_tag, id__lt=first.id)
+            ).aggregate(n=Count('id'), listings=Sum('cost'))
+            listings_ahead = ahead['listings'] or 0
+
+            # Work already claimed by the workers finishes before this too
+            running = AutomationOperation.objects.filter(
+                operation_type=operation_type, status='running',
+                lease_expires_at__gte=timezone.now()).aggregate(listings=Sum('cost'))
+
+            worker_count = max(workers.get(operation_type, 1), 1)
+            wait = ((listings_ahead + (running['listings'] or 0)) / worker_count
+                    * self.seconds_per_unit(operation_type))
+
+            status[operation_type] = {
+                'queued_operations': row['n'],
+                'queued_listings': row['listings'] or 0,
+                'position': ahead['n'] + 1,
+                'listings_ahead': listings_ahead,
+                'estimated_wait_seconds': round(wait),
+            }
+        return status
+
+
+# Shared queue used by the manager (and any worker process)
+operation_queue = OperationQueue()
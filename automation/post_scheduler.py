@@ -0,0 +1,306 @@
+"""
+Scheduled Post Service
+======================
+
+Queues MarketplacePost rows when their scheduled_time arrives, without
+polling the posts table:
+
+- Due and upcoming posts (posted=False, scheduled_time within
+  AUTOMATION_SCHEDULER_HORIZON_SECONDS) are loaded with one range query on
+  posted_scheduled_idx and kept in a min-heap keyed by scheduled_time
+- The scheduler thread sleeps until the head of the heap is due, then
+  queues every due post as a posting job (one per user) for the workers
+- post_save / post_delete signals (postings.signals) push new and
+  rescheduled posts into the heap and wake the thread if they are due
+  earlier than the current head
+- Posts saved by other processes (e.g. the web server while the worker
+  daemon runs the scheduler) are picked up by the window reload every
+  AUTOMATION_SCHEDULER_RELOAD_SECONDS (same range query)
+
+A post fires once per scheduled_time: before a due post is queued it is
+claimed with a conditional UPDATE of MarketplacePost.queued_for (set to
+its scheduled_time), in the same transaction as its posting job. Another
+scheduler, a cron run or a manual job that queued the post first wins the
+claim, so the post is never queued twice - a failed post stays claimed
+too. Moving scheduled_time schedules it again.
+
+Runs in the worker daemon (run_automation_workers) - and in the web
+process only for single-process development (AUTOMATION_EMBEDDED_WORKERS,
+bot_core.wsgi), so the window reload runs in one process.
+
+USAGE:
+    post_scheduler.start()
+    post_scheduler.enqueue_due()   # one-shot, e.g. from cron
+"""
+
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _as_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
+
+
+class PostScheduler:
+    """
+    Min-heap of scheduled posts with a thread that wakes when the next one is due
+    """
+
+    def __init__(self, horizon=None, reload_seconds=None):
+        self.horizon = horizon or getattr(
+            settings, 'AUTOMATION_SCHEDULER_HORIZON_SECONDS', 86400)
+        self.reload_seconds = reload_seconds or getattr(
+            settings, 'AUTOMATION_SCHEDULER_RELOAD_SECONDS', 60)
+
+        # Heap of (due timestamp, post id); an entry is stale unless
+        # _due[post id] still holds the same timestamp
+        self._heap = []
+        self._due = {}
+        # post id -> due timestamp it was queued for
+        self._fired = {}
+        self._window_end = 0.0
+
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'loads': 0,
+            'posts_queued': 0,
+            'jobs_queued': 0,
+            'last_queued_at': None,
+        }
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the scheduler thread (no-op if already running)"""
+        with self._condition:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='post_scheduler', daemon=True)
+            self._thread.start()
+        print("⏰ Post scheduler started")
+
+    def stop(self):
+        """Stop the scheduler thread and wait for it"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    # ---------------------------------------------------------------
+    # Heap maintenance (signals)
+    # ---------------------------------------------------------------
+
+    def schedule(self, post):
+        """
+        Add / move / drop a post after it was saved
+
+        Args:
+            post: MarketplacePost instance
+        """
+        if not self.running:
+            return
+
+        with self._condition:
+            if post.posted or post.scheduled_time is None:
+                self._due.pop(post.id, None)
+                return
+
+            due = post.scheduled_time.timestamp()
+            if (due > self._window_end or self._fired.get(post.id) == due
+                    or post.queued_for == post.scheduled_time):
+                # Beyond the loaded window (next reload picks it up),
+                # or already queued for this time
+                self._due.pop(post.id, None)
+                return
+            if self._due.get(post.id) == due:
+                return
+
+            self._due[post.id] = due
+            heapq.heappush(self._heap, (due, post.id))
+            if self._heap[0] == (due, post.id):
+                # New earliest post - re-arm the timer
+                self._condition.notify_all()
+
+    def unschedule(self, post_id):
+        """Drop a deleted post"""
+        with self._condition:
+            self._due.pop(post_id, None)
+
+    # ---------------------------------------------------------------
+    # Queueing
+    # ---------------------------------------------------------------
+
+    def _eligible_posts(self, until):
+        """
+        Unposted posts scheduled up to `until` not queued for that time yet
+
+        The (posted, scheduled_time) filter is served by posted_scheduled_idx.
+        """
+        from postings.models import MarketplacePost
+
+        return MarketplacePost.objects.filter(
+            posted=False, scheduled_time__lte=until
+        ).exclude(queued_for=F('scheduled_time'))
+
+    def _claim(self, post_ids):
+        """
+        Claim due posts for their scheduled_time (caller runs in a transaction)
+
+        Returns:
+            list: Ids this call claimed - a post claimed elsewhere is left out
+        """
+        from postings.models import MarketplacePost
+
+        return [post_id for post_id in post_ids if MarketplacePost.objects.filter(
+            id=post_id, posted=False, scheduled_time__lte=timezone.now()
+        ).exclude(queued_for=F('scheduled_time')).update(queued_for=F('scheduled_time'))]
+
+    def _load(self):
+        """Rebuild the heap from the posts due within the horizon"""
+        now = time.time()
+        window_end = now + self.horizon
+        rows = list(self._eligible_posts(_as_datetime(window_end)).values_list(
+            'id', 'scheduled_time'))
+
+        with self._condition:
+            self._due = {post_id: scheduled_time.timestamp() for post_id, scheduled_time in rows}
+            self._heap = [(due, post_id) for post_id, due in self._due.items()]
+            heapq.heapify(self._heap)
+            self._window_end = window_end
+            # Queued entries older than the window can't come back
+            self._fired = {post_id: due for post_id, due in self._fired.items()
+                           if due > now - self.horizon}
+            self.stats['loads'] += 1
+
+        logger.info("Post scheduler loaded %s post(s) due within %ss", len(rows), self.horizon)
+
+    def _pop_due(self, now):
+        """Remove and return the ids of posts due by now (caller holds the lock)"""
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, post_id = heapq.heappop(self._heap)
+            if self._due.get(post_id) != due:
+                continue  # stale entry (rescheduled / posted / deleted)
+            del self._due[post_id]
+            self._fired[post_id] = due
+            due_ids.append(post_id)
+        return due_ids
+
+    def enqueue_posts(self, post_ids=None):
+        """
+        Queue due posts as posting jobs (one job per user)
+
+        Args:
+            post_ids: Posts to queue (default: every eligible due post)
+
+        Returns:
+            list: Queued PostingJob objects
+        """
+        from postings.job_runner import enqueue_posting_job
+        from postings.models import MarketplacePost
+        from .operation_queue import operation_queue
+        from .sequential_browser_manager import sequential_manager
+
+        posts = self._eligible_posts(timezone.now())
+        if post_ids is not None:
+            posts = posts.filter(id__in=post_ids)
+        # Not yet due when a user queued them by hand
+        active = operation_queue.active_post_ids()
+
+        ids_by_user = defaultdict(list)
+        for post in posts.select_related('account__user'):
+            if post.id not in active:
+                ids_by_user[post.account.user].append(post.id)
+
+        jobs = []
+        for user, ids in ids_by_user.items():
+            # A failed enqueue rolls the claim back
+            with transaction.atomic():
+                claimed = self._claim(ids)
+                if claimed:
+                    jobs.append(enqueue_posting_job(
+                        MarketplacePost.objects.filter(id__in=claimed), user=user))
+
+        if jobs:
+            queued = sum(len(job.post_ids) for job in jobs)
+            self.stats['posts_queued'] += queued
+            self.stats['jobs_queued'] += len(jobs)
+            self.stats['last_queued_at'] = timezone.now().isoformat()
+            print(f"⏰ Queued {queued} scheduled post(s) in {len(jobs)} job(s)")
+            sequential_manager.notify_queued('post_job')
+        return jobs
+
+    def enqueue_due(self):
+        """Queue every due post once (cron / manual runs)"""
+        return self.enqueue_posts()
+
+    # ---------------------------------------------------------------
+    # Thread
+    # ---------------------------------------------------------------
+
+    def _run(self):
+        next_reload = 0.0
+        while not self._stop.is_set():
+            now = time.time()
+            if now >= next_reload:
+                try:
+                    self._load()
+                except Exception as e:
+                    logger.error(f"Post scheduler could not load scheduled posts: {e}")
+                    close_old_connections()
+                next_reload = now + self.reload_seconds
+
+            with self._condition:
+                due_ids = self._pop_due(time.time())
+
+            if due_ids:
+                try:
+                    self.enqueue_posts(due_ids)
+                except Exception as e:
+                    logger.error(f"Post scheduler could not queue posts {due_ids}: {e}")
+                    close_old_connections()
+
+            with self._condition:
+                wake_at = next_reload
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                timeout = wake_at - time.time()
+                if timeout > 0 and not self._stop.is_set():
+                    self._condition.wait(timeout)
+
+        close_old_connections()
+        print("⏰ Post scheduler stopped")
+
+    def get_stats(self):
+        """Heap size and next due post for status endpoints"""
+        with self._condition:
+            next_due = min(self._due.values(), default=None)
+            return {
+                **self.stats,
+                'running': self.running,
+                'scheduled_posts': len(self._due),
+                'next_due_at': _as_datetime(next_due).isoformat() if next_due else None,
+            }
+
+
+# Shared scheduler (started by run_automation_workers / the web process)
+post_scheduler = PostScheduler()
@@ -1,38 +1,32 @@
 from playwright.sync_api import sync_playwright
 import time
 import os
+import traceback
 from django.conf import settings
-
-
-def debug_page_state(page, step_name):
-    """Helper function to debug page state at any point"""
-    print(f"\n🔍 DEBUG: {step_name}")
-    print(f"   URL: {page.url}")
-
-    # Check for error messages
-    errors = page.locator("[role='alert'], .error").all()
-    error_count = sum(1 for e in errors if e.is_visible())
-    if error_count > 0:
-        print(f"   ⚠️ Found {error_count} error message(s)")
-
-    # Check for buttons
-    buttons = page.locator("button").all()
-    visible_buttons = []
-    for btn in buttons:
-        try:
-            if btn.is_visible():
-                text = btn.inner_text()[:50]  # Limit text length
-                if text.strip():
-                    visible_buttons.append(text.strip())
-        except Exception:
-            pass
-
-    if visible_buttons:
-        # Show first 5 unique
-        print(f"   📍 Visible buttons: {', '.join(set(visible_buttons[:5]))}")
-    else:
-        print("   ⚠️ No visible buttons found")
-    print()
+from .browser_pool import browser_pool
+from .dom_scan import debug_page_state, field_selector, print_inputs, scan_page
+from .exceptions import (
+    ACCOUNT_ERRORS,
+    SelectorNotFoundError,
+    SessionExpiredError,
+    error_for_publish_response,
+    error_for_url,
+)
+from .failure_screenshots import capture_failure, screenshot_writer
+from .image_prep import prepare_image
+from .selector_strategies import selector_strategies
+from .waits import (
+    DROPDOWN_OPTIONS_SELECTOR,
+    StepTimer,
+    get_timeout,
+    is_publish_response,
+    is_upload_response,
+    wait_for_dom_settle,
+    wait_for_response,
+    wait_for_selector,
+    wait_for_watched_response,
+    watch_response,
+)
 
 
 def save_session(email, password=None):
@@ -382,8 +376,306 @@ def auto_login_and_save_session(email, password):
         return True
 
 
+CREATE_ITEM_URL = "https://www.facebook.com/marketplace/create/item"
+
+# Max wait when acting on a field tagged by the DOM scan (the tag is lost
+# if React re-renders the element - then the fallback search runs)
+FIELD_ACTION_TIMEOUT = 2000
+
+
+def _click_first_visible(page, selector, force=True):
+    """Click the first visible element matching selector, return True if clicked"""
+    for el in page.locator(selector).all():
+        if el.is_visible():
+            el.scroll_into_view_if_needed()
+            el.click(force=force)
+            return True
+    return False
+
+
+def _fill_field(page, scan, role, value, title=None):
+    """
+    Fill a field tagged by scan_page()
+
+    If the tag was lost (element re-rendered) the page is rescanned once.
+
+    Returns:
+        dict: The scan that was used (fresh one after a rescan)
+    """
+    selector = field_selector(scan, role)
+    if selector:
+        try:
+            page.locator(selector).fill(value, timeout=FIELD_ACTION_TIMEOUT)
+            return scan
+        except Exception:
+            pass
+
+    scan = scan_page(page, title=title)
+    selector = field_selector(scan, role)
+    if not selector:
+        print_inputs(scan)
+        raise SelectorNotFoundError(f"Could not find {role} input field")
+    page.locator(selector).fill(value, timeout=FIELD_ACTION_TIMEOUT)
+    return scan
+
+
+def _click_field(page, scan, role, fallback_selector):
+    """Click a field tagged by scan_page(), falling back to a text search"""
+    selector = field_selector(scan, role)
+    if selector:
+        try:
+            page.locator(selector).click(force=True, timeout=FIELD_ACTION_TIMEOUT)
+            return True
+        except Exception:
+            pass
+    return _click_first_visible(page, fallback_selector)
+
+
+def raise_for_publish_response(response):
+    """Raise the typed error if the publish mutation did not create the listing"""
+    try:
+        body = response.text()
+    except Exception:
+        body = None
+    error = error_for_publish_response(response.status, body)
+    if error:
+        raise error
+
+
+def stage_listing(page, title, description, price, image_path, timer):
+    """
+    Fill the create-item form up to (not including) Publish
+
+    Expects `page` to already be on CREATE_ITEM_URL.
+
+    Args:
+        page: Playwright page on the create-item form
+        title: Post title
+        description: Post description
+        price: Item price
+        image_path: Path to product image
+        timer: StepTimer that records each step duration
+    """
+    # Facebook sends dead sessions / checkpoints away from the form
+    landing_error = error_for_url(page.url)
+    if landing_error:
+        raise landing_error
+
+    with timer.step('prepare_image'):
+        # Small metadata-free JPEG, cached per source content
+        image_path = prepare_image(image_path)
+
+    with timer.step('upload_image'):
+        print("📸 Uploading image first...")
+        image_input = page.locator("input[type='file'][accept*='image']")
+        # Continue as soon as the upload request comes back
+        wait_for_response(
+            page, lambda: image_input.set_input_files(image_path),
+            is_upload_response, timeout=get_timeout('upload'), timer=timer)
+
+    # One round trip to locate (and tag) every form field
+    scan = scan_page(page)
+
+    with timer.step('fill_title'):
+        print("📝 Filling Title...")
+        scan = _fill_field(page, scan, 'title', title)
+
+    with timer.step('fill_price'):
+        print("💰 Filling Price...")
+        scan = _fill_field(page, scan, 'price', str(price), title=title)
+
+    with timer.step('select_category'):
+        print("📂 Selecting Category...")
+        if not _click_field(page, scan, 'category', "text=Category"):
+            print("❌ Could not find Category dropdown")
+        else:
+            print("✅ Clicked on Category dropdown")
+
+            # Wait for the dropdown options to render
+            wait_for_selector(page, DROPDOWN_OPTIONS_SELECTOR,
+                              timeout=get_timeout('dropdown'), timer=timer)
+
+            # Learned strategies: historically fastest option first
+            strategy = selector_strategies.apply(page, 'category_option')
+            if strategy:
+                print(f"✅ Selected Category: Furniture (via {strategy})")
+            else:
+                print(
+                    "❌ Could not select Furniture category - trying to continue anyway")
+
+    with timer.step('select_condition'):
+        print("🔧 Selecting Condition...")
+        if not _click_field(page, scan, 'condition', "text=Condition"):
+            print("❌ Could not find Condition dropdown")
+        else:
+            print("✅ Clicked on Condition dropdown")
+
+            # Wait for the dropdown options to render
+            wait_for_selector(page, DROPDOWN_OPTIONS_SELECTOR,
+                              timeout=get_timeout('dropdown'), timer=timer)
+
+            strategy = selector_strategies.apply(page, 'condition_option')
+            if strategy:
+                print(f"✅ Selected Condition: New (via {strategy})")
+            else:
+                print(
+                    "❌ Could not select New condition - trying to continue anyway")
+
+    with timer.step('fill_description'):
+        print("🧾 Filling Description...")
+        try:
+            # Tagged by the scan (labelled "Description" or first textarea)
+            _fill_field(page, scan, 'description', description)
+        except Exception:
+            # Fallback: use the first visible textarea
+            textareas = page.locator("textarea")
+            for i in range(textareas.count()):
+                el = textareas.nth(i)
+                if el.is_visible():
+                    el.fill(description)
+                    break
+
+    with timer.step('set_availability'):
+        print("📦 Setting Availability: In Stock...")
+
+        if not _click_field(page, scan, 'availability', "text=List as in Stock"):
+            print("❌ Could not find Availability dropdown")
+        else:
+            print("✅ Clicked on Availability dropdown")
+
+            # Wait for the dropdown options to render
+            wait_for_selector(page, DROPDOWN_OPTIONS_SELECTOR,
+                              timeout=get_timeout('dropdown'), timer=timer)
+
+            strategy = selector_strategies.apply(page, 'availability_option')
+            if strategy:
+                print(f"✅ Set Availability: In Stock (via {strategy})")
+            else:
+                print("❌ Could not set availability - trying to continue anyway")
+
+    print("📍 Skipping location (using proxy/VPN for region)...")
+
+    with timer.step('click_next'):
+        # Scroll to bottom to ensure all fields are visible and validated
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        wait_for_dom_settle(page, timer=timer)
+
+        print("📤 Looking for Next button...")
+        strategy = selector_strategies.apply(page, 'next')
+        if strategy:
+            print(f"✅ Clicked Next button (via {strategy})")
+        else:
+            print(
+                "⚠️ Could not find Next button - form might be single page, looking for Publish directly")
+
+        # Scroll to bottom again to reveal Publish button and let the
+        # next step (or the lazy part of the form) finish rendering
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        wait_for_dom_settle(page, timer=timer)
+
+
+def _click_publish(page):
+    """Click Publish, return the selector strategy that found it"""
+    strategy = selector_strategies.apply(page, 'publish')
+    if not strategy:
+        print("❌ Could not find Publish button!")
+        raise SelectorNotFoundError(
+            "Publish button not found after multiple attempts")
+    return strategy
+
+
+def _settle_publish(page, publish_response, timer):
+    if publish_response is None:
+        # Publish call not recognised - wait for the dialog to settle instead
+        wait_for_dom_settle(page, timer=timer)
+    else:
+        raise_for_publish_response(publish_response)
+
+
+def start_publish(page, timer):
+    """
+    Click Publish without waiting for the result (pipelined posting)
+
+    The publish mutation is watched in the background; finish with
+    confirm_publish() after other work (e.g. staging the next listing).
+
+    Returns:
+        dict: Response watch for confirm_publish()
+    """
+    with timer.step('publish'):
+        print("🔍 Looking for Publish button...")
+        watch = watch_response(page, is_publish_response)
+        try:
+            strategy = _click_publish(page)
+        except Exception:
+            page.remove_listener('response', watch['listener'])
+            raise
+        print(f"✅ Clicked Publish button (via {strategy}) - confirming later")
+    return watch
+
+
+def confirm_publish(page, watch, timer):
+    """
+    Wait for a publish started by start_publish() and check its response
+
+    Returns:
+        list: Step timings ({step, duration_ms, outcome})
+    """
+    with timer.step('confirm_publish'):
+        publish_response = wait_for_watched_response(
+            page, watch, timeout=get_timeout('publish'), timer=timer)
+        _settle_publish(page, publish_response, timer)
+
+    print("✅ Posted successfully!")
+    timer.log_summary()
+    return timer.steps
+
+
+def fill_and_publish(page, title, description, price, image_path, timer=None):
+    """
+    Fill the Marketplace create-item form and publish it
+
+    Expects `page` to already be on CREATE_ITEM_URL. Shared by
+    login_and_post (one listing) and post_batch (many listings, one session).
+    Waits are condition-based (see automation/waits.py), so a fast page is
+    published as soon as the UI is ready.
+
+    Args:
+        page: Playwright page on the create-item form
+        title: Post title
+        description: Post description
+        price: Item price
+        image_path: Path to product image
+        timer: Optional StepTimer that records each step duration
+
+    Returns:
+        list: Step timings ({step, duration_ms, outcome})
+    """
+    timer = timer or StepTimer('post')
+
+    stage_listing(page, title, description, price, image_path, timer)
+
+    with timer.step('publish'):
+        print("🔍 Looking for Publish button...")
+        published_with = []
+
+        # click() waits for the button to be stable/enabled; then wait for
+        # the publish mutation to come back
+        publish_response = wait_for_response(
+            page, lambda: published_with.append(_click_publish(page)), is_publish_response,
+            timeout=get_timeout('publish'), timer=timer)
+        print(f"✅ Clicked Publish button (via {published_with[0]})")
+
+        _settle_publish(page, publish_response, timer)
+
+    print("✅ Posted successfully!")
+    timer.log_summary()
+    return timer.steps
+
+
 # def login_and_post(email, title, description, price, image_path, location):
-def login_and_post(email, title, description, price, image_path, headless=True):
+def login_and_post(email, title, description, price, image_path, headless=True, pool=None,
+                   screenshot_to=None):
     """
     Post to Facebook Marketplace
 
@@ -394,390 +686,299 @@ def login_and_post(email, title, description, price, image_path, headless=True):
         price: Item price
         image_path: Path to product image
         headless: Run in headless mode (default: True for background posting)
+        pool: BrowserPool to run on (default: shared browser_pool)
+        screenshot_to: screenshot_writer.submit() ids (job_id / post_id /
+                       error_log_id / operation_id) for the failure screenshot
+
+    Returns:
+        list: Step timings ({step, duration_ms, outcome})
     """
     session_file = f"sessions/{email.replace('@', '_').replace('.', '_')}.json"
     if not os.path.exists(session_file):
-        raise Exception(
+        raise SessionExpiredError(
             f"❌ Session not found. Run save_session('{email}') first.")
 
-    with sync_playwright() as p:
-        # Run in headless mode by default for automated posting
-        # Use settings value if headless parameter not explicitly provided
-        use_headless = headless if headless is not None else getattr(
-            settings, 'AUTOMATION_HEADLESS_MODE', True)
+    pool = pool or browser_pool
+    timer = StepTimer('post')
 
-        if use_headless:
-            print("🤖 Running in HEADLESS mode (background posting)")
-        else:
-            print("🖥️  Running in VISIBLE mode (browser window will open)")
+    # Run in headless mode by default for automated posting
+    # Use settings value if headless parameter not explicitly provided
+    use_headless = headless if headless is not None else getattr(
+        settings, 'AUTOMATION_HEADLESS_MODE', True)
+
+    if use_headless:
+        print("🤖 Running in HEADLESS mode (background posting)")
+    else:
+        print("🖥️  Running in VISIBLE mode (browser window will open)")
 
-        browser = p.chromium.launch(headless=use_headless)
-        context = browser.new_context(storage_state=session_file)
+    # Warm pooled browser, fresh context for this account
+    opening = time.perf_counter()
+    with pool.account_context(session_file, headless=use_headless) as context:
         page = context.new_page()
+        timer.record('open_context', (time.perf_counter() - opening) * 1000)
 
-        print("🌐 Opening Marketplace listing page...")
-        page.goto("https://www.facebook.com/marketplace/create/item",
-                  timeout=60000)
+        with timer.step('goto'):
+            print("🌐 Opening Marketplace listing page...")
+            page.goto(CREATE_ITEM_URL, timeout=60000)
 
         try:
-            print("📸 Uploading image first...")
-            image_input = page.locator("input[type='file'][accept*='image']")
-            image_input.set_input_files(image_path)
-            page.wait_for_timeout(800)  # Reduced from 2000ms
-
-            print("📝 Filling Title...")
-            # Find all visible text inputs that are empty and not in the header
-            text_inputs = page.locator("input[type='text']")
-            title_input = None
-
-            for i in range(text_inputs.count()):
-                el = text_inputs.nth(i)
-                # Check if visible and empty
-                if el.is_visible() and el.input_value() == "":
-                    # Optionally, skip if it's in the header (search bar)
-                    # You can check its position on the page
-                    box = el.bounding_box()
-                    if box and box['y'] > 100:  # Skip inputs at the very top
-                        title_input = el
-                        break
-
-            if not title_input:
-                all_inputs = page.locator("input")
-                print(
-                    f"Found {all_inputs.count()} input fields. Printing their outerHTML:")
-                for i in range(all_inputs.count()):
-                    print(all_inputs.nth(i).evaluate("el => el.outerHTML"))
-                raise Exception("Could not find title input field")
+            return fill_and_publish(page, title, description, price, image_path, timer=timer)
 
-            title_input.fill(title)
-
-            print("💰 Filling Price...")
+        except Exception as e:
+            print("❌ Something went wrong while trying to fill the form.")
+            # Written in the background - the browser slot is freed right away
+            screenshot_writer.submit(capture_failure(page), **(screenshot_to or {}))
+            raise e
 
-            # Find all text inputs again
-            text_inputs = page.locator("input[type='text']")
-            price_input = None
-            title_filled = False
+        finally:
+            selector_strategies.flush()
 
-            for i in range(text_inputs.count()):
-                el = text_inputs.nth(i)
-                if el.is_visible():
-                    # If this is the title input, mark as found
-                    if not title_filled and el.input_value() == title:
-                        title_filled = True
-                        continue
-                    # The next visible, empty input after title is likely the price
-                    if title_filled and el.input_value() == "":
-                        price_input = el
-                        break
 
-            if not price_input:
-                print(
-                    "Could not find price input. Printing all text input values for debug:")
-                for i in range(text_inputs.count()):
-                    el = text_inputs.nth(i)
-                    print(
-                        f"Input {i}: value='{el.input_value()}', visible={el.is_visible()}")
-                raise Exception("Could not find price input field")
-
-            price_input.fill(str(price))
-            # page.locator("text=Category").first.wait_for(
-            # state="visible", timeout=10000)
-
-            print("📂 Selecting Category...")
-            category_clicked = False
-            category_elements = page.locator("text=Category")
-            for i in range(category_elements.count()):
-                el = category_elements.nth(i)
-                if el.is_visible():
-                    el.scroll_into_view_if_needed()
-                    el.click(force=True)
-                    category_clicked = True
-                    print("✅ Clicked on Category dropdown")
-                    break
+def _new_listing_result(post):
+    return {
+        'post_id': post.get('post_id'),
+        'title': post['title'],
+        'success': False,
+        'error': None,
+        'exception': None,
+        'traceback': None,
+        'steps': [],
+        'screenshot': None,
+    }
 
-            if not category_clicked:
-                print("❌ Could not find Category dropdown")
-            else:
-                # Wait for dropdown to fully open
-                page.wait_for_timeout(500)  # Reduced from 2000ms
 
-                # Try to select "Furniture"
-                furniture_selected = False
+def _post_pipelined(context, email, posts, open_ms, on_result=None, acquire=None):
+    """
+    post_batch() loop in pipelined mode (two pages of the same context)
 
-                # Approach 1: Try role-based selection
-                try:
-                    furniture_option = page.get_by_role(
-                        "option", name="Furniture")
-                    if furniture_option.is_visible():
-                        furniture_option.click()
-                        furniture_selected = True
-                        print("✅ Selected Category: Furniture (via role)")
-                except Exception:
-                    pass
+    While listing N publishes on one page, listing N+1 is opened, uploaded
+    and filled on the other; N is confirmed once N+1 is staged and N+1 is
+    published right after, so page loads and uploads overlap the publish
+    wait instead of following it.
 
-                # Approach 2: Try text locator
-                if not furniture_selected:
-                    try:
-                        furniture_options = page.locator(
-                            "text='Furniture'").all()
-                        for option in furniture_options:
-                            if option.is_visible():
-                                option.scroll_into_view_if_needed()
-                                option.click(force=True)
-                                furniture_selected = True
-                                print("✅ Selected Category: Furniture (via text)")
-                                break
-                    except Exception:
-                        pass
-
-                if not furniture_selected:
-                    print(
-                        "❌ Could not select Furniture category - trying to continue anyway")
-
-            print("🔧 Selecting Condition...")
-            condition_elements = page.locator("text=Condition")
-            condition_clicked = False
-            for i in range(condition_elements.count()):
-                el = condition_elements.nth(i)
-                if el.is_visible():
-                    el.scroll_into_view_if_needed()
-                    el.click(force=True)
-                    condition_clicked = True
-                    print("✅ Clicked on Condition dropdown")
-                    break
+    The rate limiter token (acquire) is taken right before a listing is
+    published, once the previous listing is confirmed - a staged listing
+    the batch drops never spends one.
 
-            if not condition_clicked:
-                print("❌ Could not find Condition dropdown")
-            else:
-                # Wait for dropdown to fully open
-                page.wait_for_timeout(500)  # Reduced from 2000ms
+    Returns:
+        list: Result dicts in listing order (same shape as post_batch())
+    """
+    results = []
+    pages = [context.new_page(), context.new_page()]
+    # (slot, result, timer, watch) of the listing waiting for confirmation
+    in_flight = None
+
+    def fail(slot, result, timer, e, tb):
+        print(f"❌ Listing failed: {e}")
+        timer.log_summary()
+        result['error'] = str(e)
+        result['exception'] = e
+        result['traceback'] = tb
+        result['screenshot'] = capture_failure(pages[slot])
+        # Clean page for the next listing (a half-filled form can block navigation)
+        try:
+            pages[slot].close()
+        except Exception:
+            pass
+        pages[slot] = context.new_page()
+
+    def report(result, timer):
+        """Hand a finished listing to the caller, False if the batch must stop"""
+        result['steps'] = timer.steps
+        results.append(result)
+        if on_result:
+            on_result(result)
+        if isinstance(result['exception'], ACCOUNT_ERRORS):
+            # The rest of the batch would fail the same way
+            print(f"⛔ Stopping batch for {email}: {result['error']}")
+            return False
+        return True
 
-                # Try multiple approaches to find and click "New" condition
-                new_clicked = False
+    def confirm(slot, result, timer, watch):
+        try:
+            confirm_publish(pages[slot], watch, timer)
+            result['success'] = True
+        except Exception as e:
+            fail(slot, result, timer, e, traceback.format_exc())
+        return report(result, timer)
+
+    for idx, post in enumerate(posts, 1):
+        slot = idx % 2
+        result = _new_listing_result(post)
+        timer = StepTimer(f"listing {idx}/{len(posts)} (pipelined)")
+        if idx == 1:
+            timer.record('open_context', open_ms)
+        print(f"\n📝 Listing {idx}/{len(posts)}: {post['title']}")
+
+        # Stage this listing while the previous one is still publishing
+        staging_error = None, None
+        try:
+            with timer.step('goto'):
+                print("🌐 Opening Marketplace listing page...")
+                pages[slot].goto(CREATE_ITEM_URL, timeout=60000)
+            stage_listing(pages[slot], post['title'], post['description'],
+                          post['price'], post['image_path'], timer)
+        except Exception as e:
+            staging_error = e, traceback.format_exc()
+
+        if in_flight:
+            keep_going = confirm(*in_flight)
+            in_flight = None
+            if not keep_going:
+                # Staged listing is left out of the results (requeued)
+                break
+
+        if staging_error[0] is not None:
+            fail(slot, result, timer, *staging_error)
+            if not report(result, timer):
+                break
+            continue
+
+        if acquire and not acquire(email):
+            # Staged listing is left out of the results (requeued)
+            print(f"⏸️ Rate limit reached for {email} - "
+                  f"{len(posts) - idx + 1} listing(s) left for later")
+            break
 
-                # Approach 1: Try exact text match with role
-                try:
-                    new_option = page.get_by_role("option", name="New")
-                    if new_option.is_visible():
-                        new_option.click()
-                        new_clicked = True
-                        print("✅ Selected Condition: New (via role)")
-                except Exception:
-                    pass
+        try:
+            in_flight = (slot, result, timer, start_publish(pages[slot], timer))
+        except Exception as e:
+            fail(slot, result, timer, e, traceback.format_exc())
+            if not report(result, timer):
+                break
 
-                # Approach 2: Try text locator with exact match
-                if not new_clicked:
-                    try:
-                        # Find all elements containing "New" and filter
-                        new_options = page.locator("text='New'").all()
-                        for option in new_options:
-                            if option.is_visible():
-                                option.scroll_into_view_if_needed()
-                                option.click(force=True)
-                                new_clicked = True
-                                print("✅ Selected Condition: New (via text)")
-                                break
-                    except Exception:
-                        pass
-
-                # Approach 3: Use keyboard navigation
-                if not new_clicked:
-                    try:
-                        page.keyboard.press("Home")  # Go to top
-                        page.keyboard.press("ArrowDown")  # Navigate to "New"
-                        page.keyboard.press("Enter")
-                        new_clicked = True
-                        print("✅ Selected Condition: New (via keyboard)")
-                    except Exception:
-                        pass
-
-                if not new_clicked:
-                    print(
-                        "❌ Could not select New condition - trying to continue anyway")
-
-            print("🧾 Filling Description...")
-            try:
-                # Try by accessible name
-                description_area = page.get_by_role(
-                    "textbox", name="Description")
-                description_area.fill(description)
-            except Exception:
-                # Fallback: use the first visible textarea
-                textareas = page.locator("textarea")
-                for i in range(textareas.count()):
-                    el = textareas.nth(i)
-                    if el.is_visible():
-                        el.fill(description)
-                        break
+    if in_flight:
+        confirm(*in_flight)
 
-            print("📦 Setting Availability: In Stock...")
+    return results
 
-            availability_clicked = False
-            availability_elements = page.locator("text=List as in Stock")
-            for i in range(availability_elements.count()):
-                el = availability_elements.nth(i)
-                if el.is_visible():
-                    el.scroll_into_view_if_needed()
-                    el.click(force=True)
-                    availability_clicked = True
-                    print("✅ Clicked on Availability dropdown")
-                    break
 
-            if availability_clicked:
-                page.wait_for_timeout(500)  # Reduced from 2000ms
+def post_batch(email, posts, headless=True, pool=None, on_result=None, acquire=None,
+               pipelined=None):
+    """
+    Post several listings for ONE account in a single browser session
 
-                # Try to select "In Stock"
-                in_stock_set = False
+    The session is loaded once; after each listing the page goes back to
+    /marketplace/create/item for the next one. A failed listing does not
+    stop the batch; a listing the rate limiter holds back (acquire) does -
+    it and the rest are left out of the results for the caller to requeue.
 
-                # Approach 1: Try direct selection
-                try:
-                    in_stock_option = page.get_by_role(
-                        "option", name="In stock")
-                    if in_stock_option.is_visible():
-                        in_stock_option.click()
-                        in_stock_set = True
-                        print("✅ Set Availability: In Stock (via role)")
-                except Exception:
-                    pass
+    In pipelined mode (AUTOMATION_PIPELINED_POSTING) the next listing is
+    staged on a second page while the current one publishes, see
+    _post_pipelined().
 
-                # Approach 2: Keyboard navigation
-                if not in_stock_set:
-                    try:
-                        page.keyboard.press("Home")
-                        page.keyboard.press("ArrowDown")
-                        page.keyboard.press("Enter")
-                        in_stock_set = True
-                        print("✅ Set Availability: In Stock (via keyboard)")
-                    except Exception:
-                        pass
-
-                if not in_stock_set:
-                    print("❌ Could not set availability - trying to continue anyway")
-            else:
-                print("❌ Could not find Availability dropdown")
+    Args:
+        email: Facebook account email
+        posts: List of dicts with title, description, price, image_path
+               (an optional post_id is passed back in the results)
+        headless: Run in headless mode (default: True for background posting)
+        pool: BrowserPool to run on (default: shared browser_pool)
+        on_result: Optional callback(result) called after each listing
+        acquire: Optional callable(email) -> bool run before each listing
+                 (e.g. rate_limiter.try_acquire); False stops the batch
+        pipelined: Stage the next listing while the current one publishes
+                   (default: AUTOMATION_PIPELINED_POSTING)
 
-            print("📍 Skipping location (using proxy/VPN for region)...")
+    Returns:
+        list: One dict per attempted listing with post_id, title, success, error,
+              exception, traceback, steps (StepTimer timings) and
+              screenshot (failure JPEG bytes for screenshot_writer, or None)
+    """
+    session_file = f"sessions/{email.replace('@', '_').replace('.', '_')}.json"
+    if not os.path.exists(session_file):
+        raise SessionExpiredError(
+            f"❌ Session not found. Run save_session('{email}') first.")
 
-            # Scroll to bottom to ensure all fields are visible and validated
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(400)  # Reduced from 2000ms
+    pool = pool or browser_pool
 
-            print("📤 Looking for Next button...")
-            next_clicked = False
+    # Use settings value if headless parameter not explicitly provided
+    use_headless = headless if headless is not None else getattr(
+        settings, 'AUTOMATION_HEADLESS_MODE', True)
 
-            # Try multiple approaches to click Next button
-            # Approach 1: Text-based selector
-            try:
-                next_buttons = page.locator("text='Next'").all()
-                for btn in next_buttons:
-                    if btn.is_visible():
-                        btn.scroll_into_view_if_needed()
-                        btn.click()
-                        next_clicked = True
-                        print("✅ Clicked Next button (via text)")
-                        break
-            except Exception:
-                pass
+    if pipelined is None:
+        pipelined = getattr(settings, 'AUTOMATION_PIPELINED_POSTING', False)
+    pipelined = pipelined and len(posts) > 1
 
-            # Approach 2: Role-based selector
-            if not next_clicked:
-                try:
-                    next_btn = page.get_by_role("button", name="Next")
-                    if next_btn.is_visible():
-                        next_btn.click()
-                        next_clicked = True
-                        print("✅ Clicked Next button (via role)")
-                except Exception:
-                    pass
+    print(f"📦 Posting {len(posts)} listing(s) for {email} in one session"
+          f"{' (pipelined)' if pipelined else ''}")
 
-            # Approach 3: Try finding button with aria-label
-            if not next_clicked:
-                try:
-                    next_btn = page.locator("button[aria-label*='Next']").first
-                    if next_btn.is_visible():
-                        next_btn.click()
-                        next_clicked = True
-                        print("✅ Clicked Next button (via aria-label)")
-                except Exception:
-                    pass
+    results = []
 
-            if not next_clicked:
-                print(
-                    "⚠️ Could not find Next button - form might be single page, looking for Publish directly")
+    # One context for the whole batch - session loaded only once
+    opening = time.perf_counter()
+    try:
+        with pool.account_context(session_file, headless=use_headless) as context:
+            if pipelined:
+                results = _post_pipelined(
+                    context, email, posts, (time.perf_counter() - opening) * 1000,
+                    on_result=on_result, acquire=acquire)
             else:
-                # Wait for page transition after clicking Next
-                page.wait_for_timeout(1000)  # Reduced from 3000ms
-
-            # Scroll to bottom again to reveal Publish button
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(400)  # Reduced from 2000ms
-
-            print("🔍 Looking for Publish button...")
-            publish_clicked = False
-
-            # Try multiple variations of the Publish button
-            publish_variations = [
-                "Publish",
-                "Publish listing",
-                "Post",
-                "Post listing",
-                "Confirm",
-                "Submit"
-            ]
-
-            for variation in publish_variations:
-                if publish_clicked:
-                    break
+                page = context.new_page()
+                # Browser launch / context setup is paid by the first listing only
+                open_ms = (time.perf_counter() - opening) * 1000
+
+                for idx, post in enumerate(posts, 1):
+                    if acquire and not acquire(email):
+                        print(f"⏸️ Rate limit reached for {email} - "
+                              f"{len(posts) - idx + 1} listing(s) left for later")
+                        break
 
-                # Try text-based selector
-                try:
-                    publish_buttons = page.locator(f"text='{variation}'").all()
-                    for btn in publish_buttons:
-                        if btn.is_visible():
-                            btn.scroll_into_view_if_needed()
-                            page.wait_for_timeout(1000)
-                            btn.click()
-                            publish_clicked = True
-                            print(
-                                f"✅ Clicked Publish button (found as '{variation}')")
-                            break
-                except Exception:
-                    pass
+                    result = _new_listing_result(post)
+                    timer = StepTimer(f"listing {idx}/{len(posts)}")
+                    if idx == 1:
+                        timer.record('open_context', open_ms)
+
+                    print(f"\n📝 Listing {idx}/{len(posts)}: {post['title']}")
 
-                # Try role-based selector
-                if not publish_clicked:
                     try:
-                        publish_btn = page.get_by_role(
-                            "button", name=variation)
-                        if publish_btn.is_visible():
-                            publish_btn.scroll_into_view_if_needed()
-                            page.wait_for_timeout(1000)
-                            publish_btn.click()
-                            publish_clicked = True
-                            print(
-                                f"✅ Clicked Publish button (role, found as '{variation}')")
-                            break
-                    except Exception:
-                        pass
-
-            if not publish_clicked:
-                print("❌ Could not find Publish button!")
-                raise Exception(
-                    "Publish button not found after multiple attempts")
-
-            # Wait for posting to complete
-            page.wait_for_timeout(1500)  # Reduced from 3000ms
-            print("✅ Posted successfully!")
+                        with timer.step('goto'):
+                            print("🌐 Opening Marketplace listing page...")
+                            page.goto(CREATE_ITEM_URL, timeout=60000)
+
+                        fill_and_publish(
+                            page,
+                            title=post['title'],
+                            description=post['description'],
+                            price=post['price'],
+                            image_path=post['image_path'],
+                            timer=timer
+                        )
+                        result['success'] = True
+
+                    except Exception as e:
+                        print(f"❌ Listing failed: {e}")
+                        timer.log_summary()
+                        result['error'] = str(e)
+                        result['exception'] = e
+                        result['traceback'] = traceback.format_exc()
+                        # Caller stores it (keyed by job / post) via screenshot_writer
+                        result['screenshot'] = capture_failure(page)
+
+                        # Start the next listing on a clean page (half-filled forms
+                        # can block navigation with a "leave page?" prompt)
+                        try:
+                            page.close()
+                        except Exception:
+                            pass
+                        page = context.new_page()
+
+                    result['steps'] = timer.steps
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+
+                    if isinstance(result['exception'], ACCOUNT_ERRORS):
+                        # The rest of the batch would fail the same way
+                        print(f"⛔ Stopping batch for {email}: {result['error']}")
+                        break
+    finally:
+        # Selector stats learned by this batch, in one write
+        selector_strategies.flush()
 
-        except Exception as e:
-            print("❌ Something went wrong while trying to fill the form.")
-            page.screenshot(path="error_screenshot.png")
-            print("📷 Screenshot saved as error_screenshot.png")
-            raise e
+    succeeded = sum(1 for r in results if r['success'])
+    print(f"🏁 Batch finished for {email}: {succeeded}/{len(results)} posted")
 
-        finally:
-            context.close()
-            browser.close()
+    return results
 
 
 # from playwright.sync_api import sync_playwright
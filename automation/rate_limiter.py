@@ -0,0 +1,298 @@
+"""
+Per-Account Rate Limiter
+========================
+
+Decides when an account may start its next listing, instead of spacing
+posts out by accident (title order). Every account has:
+
+- a token bucket - AUTOMATION_ACCOUNT_BURST listings back to back, refilled
+  at AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_HOUR per hour
+- a minimum gap between two listing starts (AUTOMATION_POST_DELAY_MIN)
+- sliding hourly / daily caps (AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_HOUR,
+  AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_DAY)
+- an optional cool-down (cool_down()) after Facebook refused a listing as
+  too frequent
+
+The queue only claims work for accounts whose bucket allows it, and a
+batch stops at the first listing that is not allowed yet (the rest goes
+back to the queue), so a worker never sleeps while another account is
+eligible.
+
+State lives in memory; an account's first use seeds it from the last 24
+hours of PostAnalytics 'posted' events, so a restart doesn't reset the
+limits. Several processes (worker daemon, embedded web workers) post
+with the same accounts, so the queue's claim path re-reads that history:
+sync() re-seeds the accounts another process posted with since the last
+call (one query on new event ids) and refresh() re-seeds the account a
+worker just claimed - the account lease guarantees nobody else is posting
+with it at that point.
+
+USAGE:
+    if rate_limiter.try_acquire(email):
+        ...post one listing...
+    rate_limiter.wait_seconds(email)  -> seconds until the next listing may start
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Max
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+
+
+class AccountRateLimiter:
+    """
+    Token bucket + minimum gap + hourly / daily caps per Facebook account
+    """
+
+    def __init__(self, enabled=None, min_gap=None, hourly_cap=None, daily_cap=None, burst=None):
+        self.enabled = enabled if enabled is not None else getattr(
+            settings, 'AUTOMATION_RATE_LIMIT_ENABLED', True)
+        self.min_gap = min_gap if min_gap is not None else getattr(
+            settings, 'AUTOMATION_POST_DELAY_MIN', 30)
+        self.hourly_cap = hourly_cap if hourly_cap is not None else getattr(
+            settings, 'AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_HOUR', 5)
+        self.daily_cap = daily_cap if daily_cap is not None else getattr(
+            settings, 'AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_DAY', 10)
+        self.burst = max(burst if burst is not None else getattr(
+            settings, 'AUTOMATION_ACCOUNT_BURST', 3), 1)
+
+        self._accounts = {}
+        self._lock = threading.RLock()
+        # Bumped whenever a listing starts or an account's state is changed,
+        # so callers can cache next_allowed_at() until it moves
+        self.version = 0
+        # Highest PostAnalytics 'posted' id sync() has looked at
+        self._last_event_id = None
+
+    # ---------------------------------------------------------------
+    # Account state
+    # ---------------------------------------------------------------
+
+    def _seed(self, email, now):
+        """Rebuild an account's bucket from its recent PostAnalytics history"""
+        state = {'tokens': float(self.burst), 'updated': now - DAY, 'last': None,
+                 'starts': deque(), 'blocked_until': 0.0}
+        try:
+            from postings.models import PostAnalytics
+            since = datetime.fromtimestamp(now - DAY, dt_timezone.utc)
+            history = PostAnalytics.objects.filter(
+                action='posted', account_email=email, timestamp__gte=since
+            ).order_by('timestamp').values_list('timestamp', flat=True)
+            for posted_at in history:
+                self._take(state, posted_at.timestamp())
+        except Exception as e:
+            logger.warning("Could not seed rate limiter for %s: %s", email, e)
+        return state
+
+    def _state(self, email, now):
+        # Caller holds self._lock
+        state = self._accounts.get(email)
+        if state is None:
+            state = self._accounts[email] = self._seed(email, now)
+        self._refill(state, now)
+        return state
+
+    def _refill(self, state, now):
+        if self.hourly_cap > 0 and now > state['updated']:
+            state['tokens'] = min(
+                float(self.burst),
+                state['tokens'] + (now - state['updated']) * self.hourly_cap / HOUR)
+        state['updated'] = max(state['updated'], now)
+        while state['starts'] and state['starts'][0] <= now - DAY:
+            state['starts'].popleft()
+
+    def _take(self, state, when):
+        self._refill(state, when)
+        state['tokens'] = max(state['tokens'] - 1, 0.0)
+        state['starts'].append(when)
+        state['last'] = when if state['last'] is None else max(state['last'], when)
+
+    def _wait(self, state, now):
+        waits = [0.0, state['blocked_until'] - now]
+        if state['last'] is not None:
+            waits.append(state['last'] + self.min_gap - now)
+        if self.hourly_cap > 0:
+            if state['tokens'] < 1:
+                waits.append((1 - state['tokens']) * HOUR / self.hourly_cap)
+            last_hour = [t for t in state['starts'] if t > now - HOUR]
+            if len(last_hour) >= self.hourly_cap:
+                waits.append(last_hour[-self.hourly_cap] + HOUR - now)
+        if self.daily_cap > 0 and len(state['starts']) >= self.daily_cap:
+            waits.append(state['starts'][-self.daily_cap] + DAY - now)
+        return max(waits)
+
+    # ---------------------------------------------------------------
+    # API
+    # ---------------------------------------------------------------
+
+    def wait_seconds(self, email):
+        """
+        Seconds until the account may start its next listing
+
+        Returns:
+            float: 0 if it may start now
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.time()
+        with self._lock:
+            return max(self._wait(self._state(email, now), now), 0.0)
+
+    def allows(self, email):
+        """True if the account may start a listing now"""
+        return self.wait_seconds(email) <= 0
+
+    def next_allowed_at(self, email):
+        """
+        Epoch time the account may start its next listing
+
+        Only moves when self.version changes - waiting never pushes it back.
+
+        Returns:
+            float: time.time() value (the current time if it may start now)
+        """
+        now = time.time()
+        if not self.enabled:
+            return now
+        with self._lock:
+            return now + max(self._wait(self._state(email, now), now), 0.0)
+
+    def available(self, email):
+        """
+        Listings the account may post in one session starting now
+
+        The minimum gap still applies between those listings - it is
+        checked again before each one (try_acquire).
+
+        Returns:
+            int: 0 if the account has to wait
+        """
+        if not self.enabled:
+            return math.inf
+        now = time.time()
+        with self._lock:
+            state = self._state(email, now)
+            if self._wait(state, now) > 0:
+                return 0
+            limits = [int(state['tokens'])] if self.hourly_cap > 0 else []
+            if self.hourly_cap > 0:
+                limits.append(self.hourly_cap - sum(1 for t in state['starts'] if t > now - HOUR))
+            if self.daily_cap > 0:
+                limits.append(self.daily_cap - len(state['starts']))
+            return max(min(limits), 1) if limits else math.inf
+
+    def try_acquire(self, email):
+        """
+        Take a slot for one listing if the account is allowed to post now
+
+        Returns:
+            bool: True if the listing may start
+        """
+        if not self.enabled:
+            return True
+        now = time.time()
+        with self._lock:
+            state = self._state(email, now)
+            if self._wait(state, now) > 0:
+                return False
+            self._take(state, now)
+            self.version += 1
+            return True
+
+    def refresh(self, email):
+        """
+        Re-seed an account from PostAnalytics (another process may have
+        posted with it); a running cool-down is kept
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        state = self._seed(email, now)
+        with self._lock:
+            previous = self._accounts.get(email)
+            if previous is not None:
+                state['blocked_until'] = previous['blocked_until']
+            self._accounts[email] = state
+            self.version += 1
+
+    def sync(self):
+        """
+        Re-seed the accounts with 'posted' events newer than the last sync
+
+        Catches listings other processes started with accounts this
+        process keeps state for.
+        """
+        if not self.enabled:
+            return
+        from postings.models import PostAnalytics
+
+        posted = PostAnalytics.objects.filter(action='posted')
+        try:
+            if self._last_event_id is None:
+                self._last_event_id = posted.aggregate(last=Max('id'))['last'] or 0
+                emails = set(self._accounts)
+            else:
+                rows = list(posted.filter(id__gt=self._last_event_id).values_list(
+                    'id', 'account_email'))
+                if not rows:
+                    return
+                self._last_event_id = max(event_id for event_id, _ in rows)
+                emails = {email for _, email in rows if email in self._accounts}
+        except Exception as e:
+            logger.warning("Could not sync rate limiter: %s", e)
+            return
+
+        for email in emails:
+            self.refresh(email)
+
+    def cool_down(self, email, seconds):
+        """Block an account for `seconds` (Facebook said it posts too often)"""
+        now = time.time()
+        with self._lock:
+            state = self._state(email, now)
+            state['blocked_until'] = max(state['blocked_until'], now + seconds)
+            self.version += 1
+
+    def forget(self, email=None):
+        """Drop cached state (re-seeded from PostAnalytics on next use)"""
+        with self._lock:
+            if email is None:
+                self._accounts.clear()
+            else:
+                self._accounts.pop(email, None)
+            self.version += 1
+
+    def get_stats(self):
+        """Limits and per-account bucket state for status endpoints"""
+        now = time.time()
+        accounts = {}
+        with self._lock:
+            for email in list(self._accounts):
+                state = self._state(email, now)
+                accounts[email] = {
+                    'tokens': round(state['tokens'], 2),
+                    'posts_last_hour': sum(1 for t in state['starts'] if t > now - HOUR),
+                    'posts_last_day': len(state['starts']),
+                    'wait_seconds': round(max(self._wait(state, now), 0.0)),
+                }
+        return {
+            'enabled': self.enabled,
+            'min_gap_seconds': self.min_gap,
+            'hourly_cap': self.hourly_cap,
+            'daily_cap': self.daily_cap,
+            'burst': self.burst,
+            'accounts': accounts,
+        }
+
+
+# Shared limiter used by the queue, the workers and post_to_marketplace
+rate_limiter = AccountRateLimiter()
@@ -1,40 +1,25 @@
-from playwright.sync_api import sync_playwright
 import os
+import time
 from django.conf import settings
+from .browser_pool import browser_pool
+from .exceptions import SelectorNotFoundError, SessionExpiredError, error_for_url
+from .failure_screenshots import capture_failure, screenshot_writer
+from .waits import StepTimer, expect_dom_change, wait_for_dom_settle, wait_for_selector
 
+RENEW_BUTTON_SELECTOR = 'div[role="button"]:has-text("Renew"), button:has-text("Renew")'
 
-def debug_page_state(page, step_name):
-    """Helper function to debug page state at any point"""
-    print(f"\n🔍 DEBUG: {step_name}")
-    print(f"   URL: {page.url}")
+# Home feed loaded (or bounced to the login form)
+HOME_READY_SELECTOR = '[role="banner"], [role="navigation"], input[name="email"]'
 
-    # Check for error messages
-    errors = page.locator("[role='alert'], .error").all()
-    error_count = sum(1 for e in errors if e.is_visible())
-    if error_count > 0:
-        print(f"   ⚠️ Found {error_count} error message(s)")
+# Renewal dialog loaded: buttons, the "nothing to renew" message, or login
+RENEW_PAGE_READY_SELECTOR = (
+    RENEW_BUTTON_SELECTOR
+    + ', :text-matches("no more listings eligible to be renewed", "i")'
+    + ', input[name="email"]'
+)
 
-    # Check for buttons
-    buttons = page.locator("button").all()
-    visible_buttons = []
-    for btn in buttons:
-        try:
-            if btn.is_visible():
-                text = btn.inner_text()[:50]  # Limit text length
-                if text.strip():
-                    visible_buttons.append(text.strip())
-        except Exception:
-            pass
-
-    if visible_buttons:
-        # Show first 5 unique
-        print(f"   📍 Visible buttons: {', '.join(set(visible_buttons[:5]))}")
-    else:
-        print("   ⚠️ No visible buttons found")
-    print()
 
-
-def renew_listings(email, renewal_count=20, headless=True):
+def renew_listings(email, renewal_count=20, headless=True, pool=None, screenshot_to=None):
     """
     Renew marketplace listings for a Facebook account
 
@@ -42,19 +27,25 @@ def renew_listings(email, renewal_count=20, headless=True):
         email: Facebook account email
         renewal_count: Number of listings to renew (default: 20)
         headless: Run in headless mode (default: False for debugging)
+        pool: BrowserPool to run on (default: shared browser_pool)
+        screenshot_to: screenshot_writer.submit() ids (job_id / post_id /
+                       error_log_id / operation_id) for the failure screenshot
 
     Returns:
-        dict: Result with success status, renewed count, and details
+        dict: Result with success status, renewed count, details and
+              steps (StepTimer timings)
+
+    Raises:
+        SessionExpiredError: No session file, or Facebook sent us to /login
+        CaptchaRequiredError: Facebook sent us to a checkpoint
+        SelectorNotFoundError: The renewal dialog showed no Renew buttons
+        Other errors of the page flow are raised as they are; a failure
+        screenshot is written in the background (screenshot_writer)
     """
     session_file = f"sessions/{email.replace('@', '_').replace('.', '_')}.json"
     if not os.path.exists(session_file):
-        return {
-            'success': False,
-            'renewed_count': 0,
-            'available_count': 0,
-            'message': 'Session file not found. Please import session first.',
-            'condition_met': ''
-        }
+        raise SessionExpiredError(
+            f"❌ Session not found. Please import the session for {email} first.")
 
     result = {
         'success': False,
@@ -64,48 +55,53 @@ def renew_listings(email, renewal_count=20, headless=True):
         'condition_met': ''
     }
 
-    with sync_playwright() as p:
-        # Use settings value if headless parameter not explicitly provided
-        use_headless = headless if headless is not None else getattr(
-            settings, 'AUTOMATION_HEADLESS_MODE', True)
+    timer = StepTimer('renew')
+    result['steps'] = timer.steps
+
+    pool = pool or browser_pool
 
-        if use_headless:
-            print("🤖 Running in HEADLESS mode")
-        else:
-            print("🖥️  Running in VISIBLE mode (browser window will open)")
+    # Use settings value if headless parameter not explicitly provided
+    use_headless = headless if headless is not None else getattr(
+        settings, 'AUTOMATION_HEADLESS_MODE', True)
 
-        browser = p.chromium.launch(headless=use_headless)
-        context = browser.new_context(storage_state=session_file)
+    if use_headless:
+        print("🤖 Running in HEADLESS mode")
+    else:
+        print("🖥️  Running in VISIBLE mode (browser window will open)")
+
+    # Warm pooled browser, fresh context for this account
+    # (context is closed by the pool when the block exits)
+    opening = time.perf_counter()
+    with pool.account_context(session_file, headless=use_headless) as context:
         page = context.new_page()
+        timer.record('open_context', (time.perf_counter() - opening) * 1000)
 
         try:
             # First, login to Facebook using session
             print(f"🌐 Logging in to Facebook for {email}...")
-            page.goto('https://www.facebook.com', timeout=60000)
-            page.wait_for_timeout(1500)
+            with timer.step('open_home'):
+                page.goto('https://www.facebook.com', timeout=60000)
+                wait_for_selector(page, HOME_READY_SELECTOR, timer=timer)
 
             # Check current URL to verify login
             current_url = page.url
             print(f"📍 After login, URL: {current_url}")
 
-            # Check if we got redirected to login
-            if 'login' in current_url.lower():
-                result['message'] = 'Session expired. Please re-import session.'
-                print("❌ Session expired - redirected to login")
-                page.screenshot(path="renewal_session_expired.png")
-                print("📷 Screenshot saved as renewal_session_expired.png")
-                browser.close()
-                return result
+            # Dead session / checkpoint: Facebook redirected us away
+            landing_error = error_for_url(current_url)
+            if landing_error:
+                raise landing_error
 
             print(f"✅ Logged in successfully")
 
             # Now navigate to the renewal page
             print(f"🔄 Opening renewal page...")
-            page.goto('https://www.facebook.com/marketplace/selling/renew_listings/?is_routable_dialog=true',
-                      timeout=60000)
+            with timer.step('open_renew_page'):
+                page.goto('https://www.facebook.com/marketplace/selling/renew_listings/?is_routable_dialog=true',
+                          timeout=60000)
 
-            # Wait for page to load
-            page.wait_for_timeout(1500)
+                # Wait until the dialog content (or a login redirect) shows up
+                wait_for_selector(page, RENEW_PAGE_READY_SELECTOR, timer=timer)
 
             # Debug: Check page state after loading (only when needed)
             # debug_page_state(page, "After loading renewal page")
@@ -114,24 +110,19 @@ def renew_listings(email, renewal_count=20, headless=True):
             current_url = page.url
             print(f"📍 Current URL: {current_url}")
 
-            # Check if we got redirected to login
-            if 'login' in current_url.lower():
-                result['message'] = 'Session expired. Please re-import session.'
-                print("❌ Session expired - redirected to login")
-                page.screenshot(path="renewal_session_expired.png")
-                print("📷 Screenshot saved as renewal_session_expired.png")
-                browser.close()
-                return result
+            # Dead session / checkpoint: Facebook redirected us away
+            landing_error = error_for_url(current_url)
+            if landing_error:
+                raise landing_error
 
             print(f"🔍 Looking for Renew buttons...")
 
             # Wait for Renew buttons to load
             try:
-                page.wait_for_selector(
-                    'div[role="button"]:has-text("Renew"), button:has-text("Renew")',
-                    timeout=6000
-                )
-                page.wait_for_timeout(1000)
+                with timer.step('wait_renew_buttons'):
+                    page.wait_for_selector(RENEW_BUTTON_SELECTOR, timeout=6000)
+                    # Let the rest of the list render
+                    wait_for_dom_settle(page, timer=timer)
             except Exception as e:
                 # Check if it's the "no more listings" scenario
                 try:
@@ -143,23 +134,15 @@ def renew_listings(email, renewal_count=20, headless=True):
                         result['message'] = 'No listings available for renewal'
                         result['success'] = True
                         print(f"✅ {result['message']}")
-                        browser.close()
                         return result
                 except Exception:
                     pass
 
                 # If not the "no listings" case, it's a real error
-                result['message'] = f'No Renew buttons found: {str(e)}'
-                print(f"❌ {result['message']}")
-                page.screenshot(path="renew_buttons_not_found.png")
-                print("📷 Screenshot saved as renew_buttons_not_found.png")
-                browser.close()
-                return result
+                raise SelectorNotFoundError(f'No Renew buttons found: {str(e)}')
 
             # Find all Renew buttons
-            renew_buttons = page.locator(
-                'div[role="button"]:has-text("Renew"), button:has-text("Renew")'
-            ).all()
+            renew_buttons = page.locator(RENEW_BUTTON_SELECTOR).all()
 
             result['available_count'] = len(renew_buttons)
             print(
@@ -169,7 +152,6 @@ def renew_listings(email, renewal_count=20, headless=True):
                 result['message'] = 'No listings available for renewal'
                 result['success'] = True
                 print(f"✅ {result['message']}")
-                browser.close()
                 return result
 
             clicks_done = 0
@@ -188,15 +170,18 @@ def renew_listings(email, renewal_count=20, headless=True):
                     result['condition_met'] = 'Condition 2: Reached target'
                     result['success'] = True
                     print(f"✅ {result['message']} (Reached target)")
-                    browser.close()
                     return result
 
                 try:
                     if button.is_visible():
-                        # Force click to bypass overlays
+                        # Force click to bypass overlays, continue as soon
+                        # as the page reacts to it
                         try:
                             button.scroll_into_view_if_needed()
-                            button.click(force=True, timeout=3000)
+                            with timer.step('renew_click'):
+                                expect_dom_change(
+                                    page, lambda: button.click(force=True, timeout=3000),
+                                    timer=timer)
                         except:
                             # Fallback: JavaScript click
                             try:
@@ -211,9 +196,6 @@ def renew_listings(email, renewal_count=20, headless=True):
                         print(
                             f"🔄 Renewed listing {clicks_done}/{renewal_count}")
 
-                        # Small delay between clicks
-                        page.wait_for_timeout(150)
-
                 except Exception as click_error:
                     print(f"⚠️  Error with button {i+1}: {str(click_error)}")
                     continue
@@ -229,7 +211,6 @@ def renew_listings(email, renewal_count=20, headless=True):
                         result['condition_met'] = 'Condition 1: All available renewed'
                         result['success'] = True
                         print(f"✅ {result['message']} (All available renewed)")
-                        browser.close()
                         return result
                 except Exception:
                     pass
@@ -239,18 +220,13 @@ def renew_listings(email, renewal_count=20, headless=True):
             result['message'] = f'Renewed {clicks_done} listings'
             result['success'] = True
             print(f"✅ {result['message']}")
-            browser.close()
             return result
 
         except Exception as e:
-            result['message'] = f'Error during renewal: {str(e)}'
-            print(f"❌ {result['message']}")
+            print(f"❌ Error during renewal: {str(e)}")
+            # Written in the background - the browser slot is freed right away
+            screenshot_writer.submit(capture_failure(page), **(screenshot_to or {}))
+            raise
 
-            try:
-                page.screenshot(path="renewal_error.png")
-                print("📷 Screenshot saved as renewal_error.png")
-            except:
-                pass
-
-            browser.close()
-            return result
+        finally:
+            timer.log_summary()
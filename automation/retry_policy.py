@@ -0,0 +1,91 @@
+"""
+Retry policy per failure type
+=============================
+
+What the queue does with a failed listing depends on why it failed:
+
+    retry     - back off exponentially with jitter and try again
+                (delay = base * 2^retries, capped, +/- jitter)
+    cooldown  - try again after a long fixed pause; the account's rate
+                limiter is blocked for the same time so nothing else is
+                posted from it meanwhile
+    park      - stop the account's posting work until a human fixes it
+                (session re-imported / checkpoint solved)
+    give_up   - final failure, no automatic retry (e.g. a publish that
+                may have gone through - retrying could duplicate it)
+
+Defaults below, overridable per type with AUTOMATION_RETRY_POLICIES.
+
+USAGE:
+    decision = decide('network_error', retries=1)
+    decision['action'] -> 'retry' / 'cooldown' / 'park' / 'give_up'
+    decision['delay']  -> seconds before the retry
+"""
+
+import random
+from django.conf import settings
+
+RETRY = 'retry'
+COOLDOWN = 'cooldown'
+PARK = 'park'
+GIVE_UP = 'give_up'
+
+DEFAULT_POLICIES = {
+    'network_error': {'action': RETRY, 'max_retries': 5, 'base_delay': 30,
+                      'max_delay': 1800, 'jitter': 0.3},
+    'selector_not_found': {'action': RETRY, 'max_retries': 2, 'base_delay': 300,
+                           'max_delay': 1800, 'jitter': 0.2},
+    'unknown': {'action': RETRY, 'max_retries': 1, 'base_delay': 120,
+                'max_delay': 600, 'jitter': 0.2},
+    'rate_limit': {'action': COOLDOWN, 'max_retries': 3, 'base_delay': 6 * 3600},
+    'session_expired': {'action': PARK},
+    'captcha': {'action': PARK},
+    'publish_unconfirmed': {'action': GIVE_UP},
+    'validation_error': {'action': GIVE_UP},
+}
+
+
+def get_policy(error_type):
+    """Policy dict for an error type (settings overrides merged over defaults)"""
+    overrides = getattr(settings, 'AUTOMATION_RETRY_POLICIES', {})
+    policy = dict(DEFAULT_POLICIES.get(error_type, DEFAULT_POLICIES['unknown']))
+    policy.update(overrides.get(error_type, {}))
+    return policy
+
+
+def backoff_delay(policy, retries):
+    """Exponential backoff with +/- jitter (seconds)"""
+    delay = min(policy.get('base_delay', 60) * (2 ** retries),
+                policy.get('max_delay', policy.get('base_delay', 60)))
+    jitter = policy.get('jitter', 0)
+    if jitter:
+        delay *= random.uniform(1 - jitter, 1 + jitter)
+    return round(delay)
+
+
+def decide(error_type, retries=0):
+    """
+    What to do with a listing that failed
+
+    Args:
+        error_type: ErrorLog.error_type of the failure
+        retries: Automatic retries this listing already had
+
+    Returns:
+        dict: action (retry / cooldown / park / give_up), delay (seconds),
+              error_type
+    """
+    policy = get_policy(error_type)
+    action = policy['action']
+
+    if action in (RETRY, COOLDOWN) and retries >= policy.get('max_retries', 0):
+        action = GIVE_UP
+
+    if action == RETRY:
+        delay = backoff_delay(policy, retries)
+    elif action == COOLDOWN:
+        delay = policy.get('base_delay', 3600)
+    else:
+        delay = 0
+
+    return {'action': action, 'delay': delay, 'error_type': error_type}
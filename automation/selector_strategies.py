@@ -0,0 +1,297 @@
+"""
+Learned Selector Strategies for form controls
+=============================================
+
+The Next / Publish buttons and the category, condition and availability
+options can be found in several ways (text, role, aria-label, keyboard).
+Instead of trying them in a fixed order every time:
+
+- The variants live in selector_packs.json (reloaded when the file
+  changes, no deploy needed)
+- Every attempt is recorded per control: wins, misses, average time
+- The most reliable winner is tried first on the next run (success rate,
+  then average time)
+- Strategies that keep missing, or have not won for
+  AUTOMATION_SELECTOR_STALE_DAYS, are demoted behind untried ones
+- "last_resort" strategies (keyboard navigation) always run last since
+  they "succeed" without proving the right option was picked
+
+Learned stats are persisted to AUTOMATION_SELECTOR_CACHE_FILE (JSON) - not
+on every attempt: wins and misses are kept in memory and written by
+flush() at the end of each batch, or by the next attempt once
+AUTOMATION_SELECTOR_SAVE_SECONDS passed. Every save merges this process's
+changes into the file's current contents, so several worker processes can
+share it without losing each other's stats.
+
+USAGE:
+    strategy = selector_strategies.apply(page, 'next')
+    selector_strategies.flush()               # end of the batch
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACKS_FILE = os.path.join(os.path.dirname(__file__), 'selector_packs.json')
+
+# Weight of the newest duration in the running average
+EWMA_ALPHA = 0.3
+
+
+def _locate(page, strategy):
+    """Build the Playwright locator for a text / role / css strategy"""
+    kind = strategy['kind']
+    if kind == 'text':
+        return page.locator(f"text='{strategy['value']}'")
+    if kind == 'role':
+        return page.get_by_role(strategy['role'], name=strategy['name'])
+    if kind == 'css':
+        return page.locator(strategy['value'])
+    raise ValueError(f"Unknown selector kind: {kind}")
+
+
+class SelectorStrategyCache:
+    """
+    Orders selector strategies per control by past success and speed
+    """
+
+    def __init__(self, packs_file=None, cache_file=None, stale_days=None, max_misses=None,
+                 save_interval=None):
+        self.packs_file = packs_file or getattr(
+            settings, 'AUTOMATION_SELECTOR_PACKS_FILE', DEFAULT_PACKS_FILE)
+        self.cache_file = cache_file or getattr(
+            settings, 'AUTOMATION_SELECTOR_CACHE_FILE', 'selector_cache.json')
+        self.stale_days = stale_days or getattr(
+            settings, 'AUTOMATION_SELECTOR_STALE_DAYS', 14)
+        self.max_misses = max_misses or getattr(
+            settings, 'AUTOMATION_SELECTOR_MAX_MISSES', 3)
+        self.save_interval = save_interval if save_interval is not None else getattr(
+            settings, 'AUTOMATION_SELECTOR_SAVE_SECONDS', 30)
+
+        self.lock = threading.Lock()
+        self._packs = {}
+        self._packs_mtime = None
+
+        # control -> strategy id -> {wins, misses, consecutive_misses,
+        #                            avg_ms, last_success, last_miss}
+        self.stats = self._load_stats()
+        # Stats as last read from / written to the file (to find our changes)
+        self._synced = copy.deepcopy(self.stats)
+        # Attempts recorded since the last save
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    # ---------------------------------------------------------------
+    # Packs and persistence
+    # ---------------------------------------------------------------
+
+    def get_packs(self):
+        """Return the selector packs, reloading the file if it changed"""
+        try:
+            mtime = os.path.getmtime(self.packs_file)
+        except OSError:
+            if self._packs_mtime is None:
+                logger.error("Selector packs file not found: %s", self.packs_file)
+            return self._packs
+
+        if mtime != self._packs_mtime:
+            try:
+                with open(self.packs_file) as f:
+                    packs = json.load(f)
+                with self.lock:
+                    self._packs = packs
+                    self._packs_mtime = mtime
+                logger.info("Loaded selector packs (%s)", ', '.join(packs))
+            except ValueError as e:
+                # Keep the previous packs while the file is being edited
+                logger.warning("Invalid selector packs file %s: %s", self.packs_file, e)
+        return self._packs
+
+    def _load_stats(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _latest(*values):
+        values = [value for value in values if value is not None]
+        return max(values) if values else None
+
+    def _merge_record(self, ours, theirs, base):
+        """Apply our changes since the last sync on top of the file's record"""
+        merged = dict(theirs)
+        for key in ('wins', 'misses'):
+            merged[key] = theirs[key] + ours[key] - (base[key] if base else 0)
+        merged['last_success'] = self._latest(ours['last_success'], theirs['last_success'])
+        merged['last_miss'] = self._latest(ours['last_miss'], theirs['last_miss'])
+        # Latest win's average and latest attempt's miss streak
+        if (ours['last_success'] or 0) >= (theirs['last_success'] or 0):
+            merged['avg_ms'] = ours['avg_ms']
+        ours_last = self._latest(ours['last_success'], ours['last_miss']) or 0
+        theirs_last = self._latest(theirs['last_success'], theirs['last_miss']) or 0
+        if ours_last >= theirs_last:
+            merged['consecutive_misses'] = ours['consecutive_misses']
+        return merged
+
+    def _save(self):
+        """
+        Merge our changes into the file and write it atomically (caller holds the lock)
+
+        The file is re-read first, so records other processes learned since
+        our last save are kept (and picked up here).
+        """
+        merged = self._load_stats()
+        for control, records in self.stats.items():
+            synced = self._synced.get(control, {})
+            merged_records = merged.setdefault(control, {})
+            for strategy_id, record in records.items():
+                base = synced.get(strategy_id)
+                theirs = merged_records.get(strategy_id)
+                if theirs is None:
+                    merged_records[strategy_id] = dict(record)
+                elif record != base:
+                    merged_records[strategy_id] = self._merge_record(record, theirs, base)
+
+        # Per-process temp file - concurrent writers never share one
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        self._last_save = time.monotonic()
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(merged, f, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            # Still dirty - retried with the next save
+            logger.warning("Could not save selector cache: %s", e)
+            return
+        self.stats = merged
+        self._synced = copy.deepcopy(merged)
+        self._dirty = False
+
+    def flush(self):
+        """Write the attempts recorded since the last save (end of a batch)"""
+        with self.lock:
+            if self._dirty:
+                self._save()
+
+    # ---------------------------------------------------------------
+    # Ranking
+    # ---------------------------------------------------------------
+
+    def _is_demoted(self, record, now):
+        if record['consecutive_misses'] >= self.max_misses:
+            return True
+        return now - (record['last_success'] or 0) > self.stale_days * 86400
+
+    def get_strategies(self, control):
+        """
+        Strategies for a control, best first
+
+        Order: proven winners by success rate, then average time; then
+        untried ones (pack order), then demoted ones, then last-resort
+        strategies.
+        """
+        strategies = self.get_packs().get(control, [])
+        control_stats = self.stats.get(control, {})
+        now = time.time()
+
+        def rank(item):
+            index, strategy = item
+            if strategy.get('last_resort'):
+                return (3, index, 0)
+            record = control_stats.get(strategy['id'])
+            if not record or not record['wins']:
+                return (1, index, 0)
+            if self._is_demoted(record, now):
+                return (2, -(record['last_success'] or 0), index)
+            # Smoothed so one lucky win doesn't outrank a long track record
+            rate = (record['wins'] + 1) / (record['wins'] + record['misses'] + 2)
+            return (0, -round(rate, 2), record['avg_ms'], index)
+
+        return [s for _, s in sorted(enumerate(strategies), key=rank)]
+
+    def record(self, control, strategy_id, success, duration_ms):
+        """Record one attempt (saved by flush() or once save_interval passed)"""
+        with self.lock:
+            record = self.stats.setdefault(control, {}).setdefault(strategy_id, {
+                'wins': 0,
+                'misses': 0,
+                'consecutive_misses': 0,
+                'avg_ms': None,
+                'last_success': None,
+                'last_miss': None,
+            })
+
+            if success:
+                record['wins'] += 1
+                record['consecutive_misses'] = 0
+                record['last_success'] = time.time()
+                if record['avg_ms'] is None:
+                    record['avg_ms'] = duration_ms
+                else:
+                    record['avg_ms'] = round(
+                        EWMA_ALPHA * duration_ms + (1 - EWMA_ALPHA) * record['avg_ms'], 1)
+            else:
+                record['misses'] += 1
+                record['consecutive_misses'] += 1
+                record['last_miss'] = time.time()
+
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+    def get_stats(self):
+        """Learned stats per control (for status endpoints / debugging)"""
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    # ---------------------------------------------------------------
+    # Applying strategies
+    # ---------------------------------------------------------------
+
+    def _attempt(self, page, strategy):
+        if strategy['kind'] == 'keyboard':
+            for key in strategy['keys']:
+                page.keyboard.press(key)
+            return True
+
+        for el in _locate(page, strategy).all():
+            if el.is_visible():
+                el.scroll_into_view_if_needed()
+                el.click(force=strategy.get('force', False))
+                return True
+        return False
+
+    def apply(self, page, control):
+        """
+        Click a control using the best known strategy first
+
+        Args:
+            page: Playwright page
+            control: Pack name ('next', 'publish', 'category_option', ...)
+
+        Returns:
+            str: Id of the strategy that worked, or None
+        """
+        for strategy in self.get_strategies(control):
+            start = time.perf_counter()
+            try:
+                success = self._attempt(page, strategy)
+            except Exception:
+                success = False
+            duration_ms = round((time.perf_counter() - start) * 1000)
+            self.record(control, strategy['id'], success, duration_ms)
+            if success:
+                return strategy['id']
+        return None
+
+
+# Shared cache used by the automation flows
+selector_strategies = SelectorStrategyCache()
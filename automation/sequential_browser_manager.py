@@ -2,76 +2,160 @@
 Sequential Queue Manager for Facebook Marketplace Bot
 ====================================================
 
-✅ TRUE SEQUENTIAL - GLOBAL QUEUES:
+✅ GLOBAL QUEUES - N WORKERS, ONE OPERATION PER ACCOUNT:
 - ONE global POST queue for ALL users
-- ONE global RENEW queue for ALL users  
-- Each queue processes ONE operation at a time (TRUE sequential)
-- Both queues can run in parallel (max 2 browsers total, not per user)
-
-EXAMPLE:
-User1 adds: Post1, Renew1
-User2 adds: Post2, Renew2
-User3 adds: Post3, Renew3
-
-GLOBAL POST Queue: [Post1, Post2, Post3]  → Processes 1-by-1
-GLOBAL RENEW Queue: [Renew1, Renew2, Renew3]  → Processes 1-by-1
-
-Max 2 browsers total = POST browser + RENEW browser (not multiplied by users)
+- ONE global RENEW queue for ALL users
+- Queues are persisted in the AutomationOperation table (operation_queue):
+  queued work survives restarts and several processes can drain them
+- Each queue is drained by a configurable number of worker threads
+  (AUTOMATION_POST_WORKERS / AUTOMATION_RENEW_WORKERS)
+- Account affinity: two operations for the same email NEVER run at once
+  (across both queues and processes), different accounts run in parallel
+- If the head of a queue belongs to a busy account, a worker skips ahead
+  to the next operation whose account is free instead of sitting idle
+
+EXAMPLE (2 POST workers):
+User1 adds: Post1 (acc A), Post2 (acc A)
+User2 adds: Post3 (acc B)
+
+GLOBAL POST Queue: [Post1(A), Post2(A), Post3(B)]
+Worker 1 → Post1 + Post2 (same account, one browser session)
+Worker 2 → Post3 (account B is free, runs in parallel)
+
+Max browsers = POST workers + RENEW workers (not multiplied by users)
+
+♻️ BROWSER POOL:
+- Each worker thread keeps its Chromium warm in the shared BrowserPool
+- Every operation gets a fresh BrowserContext loaded from the account session
+- Idle workers linger AUTOMATION_BROWSER_IDLE_TIMEOUT seconds for new work
+  before closing their browsers
+
+🧵 WORKER DAEMON:
+- `python manage.py run_automation_workers` runs these workers in a
+  long-lived process (serve()) that never retires them; StartPostingView
+  only queues a job ('post_job' operations, chunks of one account's listings)
+- Web processes only start their own on-demand workers when
+  AUTOMATION_EMBEDDED_WORKERS is True (single-process development without
+  the daemon)
+- The daemon also runs the post scheduler (post_scheduler), which queues
+  posts as their scheduled_time arrives
+
+🔒 LEASES:
+- A claimed operation is leased to its worker; the lease is extended after
+  every listing. If the process dies, the lease expires and the operation
+  is picked up again (up to AUTOMATION_QUEUE_MAX_ATTEMPTS)
+
+⏱️ RATE LIMITS:
+- Workers only claim posting work for accounts whose rate limiter
+  (rate_limiter) allows a listing now; listings it holds back mid-batch go
+  back to the queue (defer()) and the worker moves on to another account
+
+🔌 CIRCUIT BREAKER:
+- An account that keeps failing (expired session, checkpoint, repeated
+  network errors) trips its circuit breaker (circuit_breaker); its work
+  stays queued without opening a browser until a half-open probe succeeds
+
+🚦 ADMISSION CONTROL:
+- New work is refused (QueueFullError -> HTTP 429 + Retry-After) once a
+  queue's backlog reaches AUTOMATION_QUEUE_MAX_BACKLOG listings or a
+  user's reaches AUTOMATION_QUEUE_MAX_BACKLOG_PER_USER; status endpoints
+  report each queue's saturation
 """
 
 import threading
 import time
-from collections import defaultdict, deque
-from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
 import logging
 
 # ✅ IMPORT YOUR EXISTING WORKING FUNCTIONS - NO CHANGES TO THEM
-from .post_to_facebook import login_and_post
+from .post_to_facebook import login_and_post, post_batch
 from .renew_posts import renew_listings
+from .browser_pool import browser_pool
+from .session_store import session_store
+from .operation_queue import operation_queue, worker_identity
+from .rate_limiter import rate_limiter
+from .circuit_breaker import circuit_breaker
+from .failure_screenshots import screenshot_writer
+from . import retry_policy
+from .post_scheduler import post_scheduler
+from postings.profiling import record_step_timings
+from postings.job_runner import finish_parked_job, run_job_operation
 
 logger = logging.getLogger(__name__)
 
 
 class SequentialBrowserManager:
     """
-    Manages 2 GLOBAL sequential queues (not per user)
+    Manages 2 GLOBAL queues (not per user), each drained by N workers
 
     STRUCTURE:
     - ONE global POST queue for all users
     - ONE global RENEW queue for all users
-    - Each queue processes one operation at a time (TRUE sequential)
-    - Both queues can run in parallel (max 2 browsers total)
+    - Each queue has up to N worker threads (configurable)
+    - An account is only ever worked on by one worker at a time
     """
 
-    def __init__(self):
-        # ✅ GLOBAL QUEUES - all users share the same queues
-        self.global_post_queue = deque()     # All POST operations
-        self.global_renew_queue = deque()    # All RENEW operations
+    QUEUE_TYPES = ('post', 'renew', 'post_job')
+
+    def __init__(self, post_workers=None, renew_workers=None, job_workers=None):
+        # ✅ GLOBAL QUEUES - all users share the same (database) queues
+        self.queue = operation_queue
+
+        # Worker limits per queue
+        self.max_workers = {
+            'post': post_workers or getattr(settings, 'AUTOMATION_POST_WORKERS', 2),
+            'renew': renew_workers or getattr(settings, 'AUTOMATION_RENEW_WORKERS', 1),
+            'post_job': job_workers or getattr(settings, 'AUTOMATION_JOB_WORKERS', 2),
+        }
+
+        # Worker threads per queue: name -> {'state', 'email', 'thread'}
+        self.workers = {queue_type: {} for queue_type in self.QUEUE_TYPES}
+        self._worker_counter = 0
+
+        # Start workers on demand in this process (web) / keep them forever (daemon)
+        self.embedded = getattr(settings, 'AUTOMATION_EMBEDDED_WORKERS', False)
+        self.persistent = False
 
-        # Single processors for global queues
-        self.post_processor = None   # One posting processor
-        self.renew_processor = None  # One renewing processor
+        # Warm browsers shared by the workers (one slot per thread)
+        self.browser_pool = browser_pool
+        self.idle_timeout = getattr(
+            settings, 'AUTOMATION_BROWSER_IDLE_TIMEOUT', 60)
+        # Idle workers re-check the database this often (work queued by
+        # other processes doesn't wake them)
+        self.poll_interval = getattr(
+            settings, 'AUTOMATION_QUEUE_POLL_INTERVAL', 5)
+        self.stopping = False
 
         # Track status for monitoring
         self.status = {
             'post_active': False,
             'renew_active': False,
+            'post_job_active': False,
             'current_post_operation': None,
             'current_renew_operation': None,
+            'current_post_job_operation': None,
             'total_posts_queued': 0,
             'total_renews_queued': 0,
             'posts_completed': 0,
             'renews_completed': 0,
+            'post_jobs_completed': 0,
             'last_activity': None
         }
 
         # Thread lock for thread-safe operations
         self.lock = threading.Lock()
+        # Wakes idle workers when new work is queued or an account frees up
+        self.work_available = threading.Condition(self.lock)
 
-        print("🚀 Sequential Browser Manager initialized (GLOBAL queues - TRUE sequential)")
+        print(
+            f"🚀 Sequential Browser Manager initialized (GLOBAL queues - "
+            f"{self.max_workers['post']} POST / {self.max_workers['renew']} RENEW / "
+            f"{self.max_workers['post_job']} JOB workers)")
 
-    def add_posting_operation(self, email, title, description, price, image_path):
+    def add_posting_operation(self, email, title, description, price, image_path,
+                              user=None, priority='interactive'):
         """
         Add a posting operation to GLOBAL POST queue
 
@@ -81,232 +165,399 @@ class SequentialBrowserManager:
             description: Post description
             price: Item price
             image_path: Path to product image
+            user: User the listing is posted for (default: account owner)
+            priority: Scheduling class (a single listing is interactive)
+
+        Raises:
+            QueueFullError: The POST queue refused the listing
         """
-        operation = {
-            'type': 'post',
-            'email': email,
-            'data': {
+        with self.admission('post', user, email=email):
+            operation = self.queue.enqueue('post', email, {
                 'title': title,
                 'description': description,
-                'price': price,
+                'price': float(price),
                 'image_path': image_path
-            },
-            'timestamp': timezone.now()
-        }
+            }, user=user, priority=priority)
 
         with self.lock:
-            self.global_post_queue.append(operation)
             self.status['total_posts_queued'] += 1
 
-            print(f"📝 Added POSTING operation for {email}")
-            print(f"   GLOBAL POST queue size: {len(self.global_post_queue)}")
+            print(f"📝 Added POSTING operation #{operation.id} for {email}")
+
+            self._wake_workers('post')
 
-            # Start post processor if not already active
-            if not self.status['post_active']:
-                self._start_post_processor()
+        return operation
 
-    def add_renewing_operation(self, email, renewal_count=20):
+    def add_renewing_operation(self, email, renewal_count=20, user=None, priority='normal'):
         """
         Add a renewing operation to GLOBAL RENEW queue
 
         Args:
             email: Facebook account email
             renewal_count: Number of listings to renew
+            user: User the renewal runs for (default: account owner)
+            priority: Scheduling class
+
+        Raises:
+            QueueFullError: The RENEW queue refused the renewal
         """
-        operation = {
-            'type': 'renew',
-            'email': email,
-            'data': {
-                'renewal_count': renewal_count
-            },
-            'timestamp': timezone.now()
-        }
+        return self.add_renewing_operations(
+            [email], renewal_count, user=user, priority=priority)[0]
 
-        with self.lock:
-            self.global_renew_queue.append(operation)
-            self.status['total_renews_queued'] += 1
+    def add_renewing_operations(self, emails, renewal_count=20, user=None, priority='normal'):
+        """
+        Add one renewing operation per account to GLOBAL RENEW queue
 
-            print(f"🔄 Added RENEWING operation for {email}")
-            print(
-                f"   GLOBAL RENEW queue size: {len(self.global_renew_queue)}")
+        The renewals are admitted together: either all of them are queued
+        or none.
+
+        Args:
+            emails: Facebook account emails
+            renewal_count: Number of listings to renew per account
+            user: User the renewals run for (default: account owner)
+            priority: Scheduling class
 
-            # Start renew processor if not already active
-            if not self.status['renew_active']:
-                self._start_renew_processor()
+        Returns:
+            list: AutomationOperation per email
 
-    def _start_post_processor(self):
-        """
-        Start GLOBAL sequential processor for POST queue
+        Raises:
+            QueueFullError: The RENEW queue refused the renewals
         """
-        if self.post_processor:
-            # Already has a post processor
-            return
+        with self.admission('renew', user, len(emails), email=emails[0]):
+            operations = [self.queue.enqueue('renew', email, {
+                'renewal_count': renewal_count
+            }, user=user, priority=priority) for email in emails]
 
-        # Create single-threaded executor for sequential post processing
-        self.post_processor = ThreadPoolExecutor(
-            max_workers=1, thread_name_prefix="global_post")
-        self.status['post_active'] = True
+        with self.lock:
+            self.status['total_renews_queued'] += len(operations)
 
-        # Submit the processing task
-        future = self.post_processor.submit(self._process_post_queue)
-        future.add_done_callback(lambda f: self._cleanup_post_processor())
+            for operation in operations:
+                print(f"🔄 Added RENEWING operation #{operation.id} for {operation.account_email}")
 
-        print(f"🎬 Started GLOBAL POST processor")
+            self._wake_workers('renew')
 
-    def _start_renew_processor(self):
-        """
-        Start GLOBAL sequential processor for RENEW queue
+        return operations
+
+    def admission(self, queue_type, user, units=1, email=None):
         """
-        if self.renew_processor:
-            # Already has a renew processor
-            return
+        Admit `units` listings and hold the admission while they are enqueued
+        (see OperationQueue.admission)
 
-        # Create single-threaded executor for sequential renew processing
-        self.renew_processor = ThreadPoolExecutor(
-            max_workers=1, thread_name_prefix="global_renew")
-        self.status['renew_active'] = True
+        USAGE:
+            with sequential_manager.admission('post_job', user, 12):
+                enqueue_posting_job(...)
+            sequential_manager.notify_queued('post_job')
 
-        # Submit the processing task
-        future = self.renew_processor.submit(self._process_renew_queue)
-        future.add_done_callback(lambda f: self._cleanup_renew_processor())
+        Raises:
+            QueueFullError: The queue or the user's backlog is full
+        """
+        return self.queue.admission(queue_type, user, units,
+                                    workers=self.max_workers[queue_type], email=email)
 
-        print(f"🎬 Started GLOBAL RENEW processor")
+    def notify_queued(self, queue_type):
+        """Work was queued directly in the database - wake / start workers"""
+        with self.lock:
+            self._wake_workers(queue_type)
 
-    def _process_post_queue(self):
+    def ensure_workers(self):
         """
-        Process POST operations sequentially from GLOBAL queue
+        Start workers for work already waiting in the database
+        (e.g. queued before a restart or by another process)
         """
-        print(f"\n🎯 GLOBAL POST processor started")
-        print(f"   Initial POST queue size: {len(self.global_post_queue)}")
-
-        while True:
-            # Get next post operation
-            operation = None
-            with self.lock:
-                if self.global_post_queue:
-                    operation = self.global_post_queue.popleft()
-                else:
-                    # No more post operations, mark as inactive
-                    self.status['post_active'] = False
-                    break
-
-            if operation:
-                email = operation['email']
+        for queue_type in self.QUEUE_TYPES:
+            if self.queue.has_queued(queue_type):
+                self.notify_queued(queue_type)
 
-                # Update status
-                self.status['current_post_operation'] = f'Posting for {email}'
-                self.status['last_activity'] = timezone.now()
+    def serve(self, stop_event):
+        """
+        Run every queue's workers until stop_event is set (worker daemon)
 
-                print(f"\n▶️ Processing POST for {email}")
-                print(
-                    f"   Remaining POST operations: {len(self.global_post_queue)}")
+        Workers never retire while serving; on stop, busy workers finish
+        their current operation and everything still queued stays in the
+        database for the next start.
+        """
+        with self.lock:
+            self.persistent = True
+            self.stopping = False
+            for queue_type in self.QUEUE_TYPES:
+                while len(self.workers[queue_type]) < self.max_workers[queue_type]:
+                    self._start_worker(queue_type)
 
-                # Process the posting operation
-                try:
-                    self._execute_posting(operation)
+        stop_event.wait()
+        self.shutdown()
 
-                    # Update completed count
-                    with self.lock:
-                        self.status['posts_completed'] += 1
+        threads = [w['thread'] for workers in self.workers.values()
+                   for w in list(workers.values())]
+        for thread in threads:
+            thread.join()
 
-                    print(f"✅ Completed POST operation for {email}")
+    def _wake_workers(self, queue_type):
+        """
+        Wake idle workers and start a new one if every worker is busy
+        (caller must hold self.lock)
+        """
+        self.work_available.notify_all()
+        if self.stopping or not (self.embedded or self.persistent):
+            return
 
-                except Exception as e:
-                    print(f"❌ Error processing POST for {email}: {str(e)}")
-                    logger.error(
-                        f"Post operation failed for {email}: {str(e)}")
+        workers = self.workers[queue_type]
+        idle = sum(1 for w in workers.values() if w['state'] == 'idle')
+        if idle == 0 and len(workers) < self.max_workers[queue_type]:
+            self._start_worker(queue_type)
 
-                # Clear current operation status
-                self.status['current_post_operation'] = None
+    def _start_worker(self, queue_type):
+        """
+        Start one worker thread for a GLOBAL queue (caller must hold self.lock)
+        """
+        self._worker_counter += 1
+        name = f"global_{queue_type}_{self._worker_counter}"
+        thread = threading.Thread(
+            target=self._worker_loop, args=(queue_type, name),
+            name=name, daemon=True)
+        self.workers[queue_type][name] = {
+            'state': 'idle',
+            'email': None,
+            'started_at': timezone.now(),
+            'thread': thread,
+        }
+        self.status[f'{queue_type}_active'] = True
 
-                # Small delay between operations
-                time.sleep(1)
+        thread.start()
 
-        print(f"🏁 GLOBAL POST processor finished")
-        print(f"   Total posts completed: {self.status['posts_completed']}")
+        print(f"🎬 Started GLOBAL {queue_type.upper()} worker {name}")
 
-    def _process_renew_queue(self):
+    def _worker_loop(self, queue_type, name):
         """
-        Process RENEW operations sequentially from GLOBAL queue
+        Drain a GLOBAL queue: claim → execute → complete/fail → repeat
         """
-        print(f"\n🎯 GLOBAL RENEW processor started")
-        print(f"   Initial RENEW queue size: {len(self.global_renew_queue)}")
+        label = queue_type.upper()
+        owner = worker_identity(name)
+        print(f"\n🎯 GLOBAL {label} worker {name} started")
+
+        idle_since = time.monotonic()
 
         while True:
-            # Get next renew operation
-            operation = None
+            operations = [] if self.stopping else self._claim(queue_type, owner)
+
+            if not operations:
+                # Keep the browser warm for a while in case more work arrives
+                # (or a busy account frees up)
+                with self.lock:
+                    self.workers[queue_type][name]['state'] = 'idle'
+                    if not self.stopping:
+                        self.work_available.wait(timeout=self.poll_interval)
+
+                idle_too_long = (not self.persistent and
+                                 time.monotonic() - idle_since >= self.idle_timeout)
+                # Work waiting for a rate limit / busy account needs someone
+                # to pick it up once it becomes eligible
+                work_waiting = False
+                if idle_too_long and not self.stopping:
+                    try:
+                        work_waiting = self.queue.has_queued(queue_type)
+                    except Exception as e:
+                        logger.error(f"Could not check the {queue_type} queue: {e}")
+
+                with self.lock:
+                    if work_waiting and len(self.workers[queue_type]) == 1:
+                        idle_too_long = False
+                    if self.stopping or idle_too_long:
+                        # Nothing to do - retire this worker
+                        del self.workers[queue_type][name]
+                        if not self.workers[queue_type]:
+                            self.status[f'{queue_type}_active'] = False
+                        break
+                continue
+
+            email = operations[0].account_email
             with self.lock:
-                if self.global_renew_queue:
-                    operation = self.global_renew_queue.popleft()
-                else:
-                    # No more renew operations, mark as inactive
-                    self.status['renew_active'] = False
-                    break
-
-            if operation:
-                email = operation['email']
-
-                # Update status
-                self.status['current_renew_operation'] = f'Renewing for {email}'
-                self.status['last_activity'] = timezone.now()
-
-                print(f"\n▶️ Processing RENEW for {email}")
-                print(
-                    f"   Remaining RENEW operations: {len(self.global_renew_queue)}")
-
-                # Process the renewing operation
-                try:
-                    self._execute_renewing(operation)
-
-                    # Update completed count
-                    with self.lock:
-                        self.status['renews_completed'] += 1
+                self.workers[queue_type][name].update(
+                    state='busy', email=email)
 
-                    print(f"✅ Completed RENEW operation for {email}")
+            verb = 'Renewing' if queue_type == 'renew' else 'Posting'
+            self.status[f'current_{queue_type}_operation'] = f'{verb} for {email}'
+            self.status['last_activity'] = timezone.now()
 
-                except Exception as e:
-                    print(f"❌ Error processing RENEW for {email}: {str(e)}")
-                    logger.error(
-                        f"Renew operation failed for {email}: {str(e)}")
+            print(
+                f"\n▶️ [{name}] Processing {len(operations)} {label}(s) for {email}")
 
-                # Clear current operation status
-                self.status['current_renew_operation'] = None
+            try:
+                done = self._execute(queue_type, operations, owner)
 
-                # Small delay between operations
-                time.sleep(1)
+                # Update completed count
+                with self.lock:
+                    self.status[f'{queue_type}s_completed'] += done
 
-        print(f"🏁 GLOBAL RENEW processor finished")
-        print(f"   Total renews completed: {self.status['renews_completed']}")
+                print(
+                    f"✅ Completed {done}/{len(operations)} {label} operation(s) for {email}")
+
+            except Exception as e:
+                print(f"❌ Error processing {label} for {email}: {str(e)}")
+                logger.error(
+                    f"{queue_type.capitalize()} operation failed for {email}: {str(e)}")
+                # Whatever was not settled yet is retried / parked / failed
+                # according to retry_policy
+                self.queue.settle_unfinished(operations, owner, e)
+
+            finally:
+                if queue_type == 'post_job':
+                    self._finish_parked_job(operations[0])
+                with self.lock:
+                    self.workers[queue_type][name].update(
+                        state='idle', email=None)
+                    if self.status[f'current_{queue_type}_operation'] == f'{verb} for {email}':
+                        self.status[f'current_{queue_type}_operation'] = None
+                    # The account is free again - other workers may claim its work
+                    self.work_available.notify_all()
+
+            idle_since = time.monotonic()
+
+            # Small delay between operations
+            time.sleep(1)
+
+        # Close this thread's pooled browsers and DB connection
+        self.browser_pool.release()
+        close_old_connections()
+
+        print(f"🏁 GLOBAL {label} worker {name} finished")
+        print(
+            f"   Total {queue_type}s completed: {self.status[f'{queue_type}s_completed']}")
+
+    def _claim(self, queue_type, owner):
+        """Claim the next operations from the database queue (never raises)"""
+        try:
+            return self.queue.claim(queue_type, owner)
+        except Exception as e:
+            logger.error(f"Could not claim {queue_type} operations: {e}")
+            close_old_connections()
+            return []
+
+    def _execute(self, queue_type, operations, owner):
+        """Run claimed operations and settle them in the queue, return how many succeeded"""
+        if queue_type == 'post_job':
+            # One account's share of a PostingJob - listing outcomes go to the job
+            outcome = run_job_operation(
+                operations[0], pool=self.browser_pool,
+                heartbeat=lambda: self.queue.heartbeat(operations, owner))
+            # Failed listings are split off for retry / park, rate limited
+            # ones keep the chunk queued
+            self.queue.settle_post_job(operations[0], owner, outcome)
+            return 0 if outcome['deferred'] else 1
+
+        email = operations[0].account_email
+        if not circuit_breaker.allow(email):
+            # Tripped (or probed by another worker) since the claim - no browser
+            self.queue.defer(operations, owner)
+            return 0
+
+        if queue_type == 'renew':
+            self._execute_renewing(operations[0])
+            self.queue.complete(operations[0], owner)
+            circuit_breaker.record_success(email)
+            return 1
+
+        if len(operations) == 1:
+            if not rate_limiter.try_acquire(operations[0].account_email):
+                # The account's slot was taken since the claim
+                self.queue.defer(operations, owner)
+                return 0
+            self._execute_posting(operations[0])
+            self.queue.complete(operations[0], owner)
+            circuit_breaker.record_success(email)
+            return 1
+
+        results = self._execute_posting_batch(
+            operations[0].account_email, operations, owner)
+        return sum(1 for r in results if r['success'])
+
+    def _finish_parked_job(self, operation):
+        """A job whose other chunks are all parked can't finish by itself (never raises)"""
+        try:
+            finish_parked_job(operation.payload['job_id'])
+        except Exception as e:
+            logger.error(f"Could not finish job {operation.payload.get('job_id')}: {e}")
 
     def _execute_posting(self, operation):
         """
         Simply calls your EXISTING login_and_post function
-        No new code - just using what you already have!
+        Runs on this worker's warm pooled browser
         """
-        email = operation['email']
-        data = operation['data']
+        email = operation.account_email
+        data = operation.payload
 
         print(f"📝 Calling YOUR EXISTING posting function for: {email}")
 
         # ✅ CALLS YOUR EXISTING FUNCTION - NO MODIFICATIONS
-        result = login_and_post(
+        steps = login_and_post(
             email=email,
             title=data['title'],
             description=data['description'],
             price=data['price'],
             image_path=data['image_path'],
+            pool=self.browser_pool,
+            screenshot_to={'operation_id': operation.id},
             # headless=False  # Change to True for production
         )
+        record_step_timings(steps, 'post', email)
 
-        return result
+        return steps
+
+    def _execute_posting_batch(self, email, operations, owner):
+        """
+        Post several queued listings for one account in a single browser session
+        Each listing is settled in the queue as soon as it finishes.
+        """
+        print(
+            f"📦 Posting {len(operations)} queued listings for {email} in one session")
+
+        by_id = {operation.id: operation for operation in operations}
+        settled = set()
+        parked = []
+
+        def on_result(result):
+            operation = by_id[result['post_id']]
+            settled.add(operation.id)
+            record_step_timings(result['steps'], 'post', email)
+            if result['success']:
+                self.queue.complete(operation, owner)
+                circuit_breaker.record_success(email)
+            else:
+                logger.error(
+                    f"Post operation failed for {email}: {result['error']}")
+                screenshot_writer.submit(result['screenshot'], operation_id=operation.id)
+                decision = self.queue.settle_failure(
+                    operation, owner, result.get('exception') or result['error'])
+                if decision['action'] == retry_policy.PARK:
+                    parked.append(result['error'])
+            # Still alive - keep the lease on the remaining listings
+            self.queue.heartbeat(operations, owner)
+
+        results = post_batch(
+            email=email,
+            # The operation id rides along as post_id to match the results
+            posts=[{**operation.payload, 'post_id': operation.id}
+                   for operation in operations],
+            pool=self.browser_pool,
+            on_result=on_result,
+            acquire=rate_limiter.try_acquire,
+        )
+
+        # Listings the rate limiter held back wait in the queue
+        deferred = [operation for operation in operations if operation.id not in settled]
+        if deferred:
+            self.queue.defer(deferred, owner)
+            if parked:
+                # The batch stopped on a parked account - park the rest too
+                self.queue.park_account(email, parked[0])
+        return results
 
     def _execute_renewing(self, operation):
         """
         Simply calls your EXISTING renew_listings function
-        No new code - just using what you already have!
+        Runs on this worker's warm pooled browser
         """
-        email = operation['email']
-        data = operation['data']
+        email = operation.account_email
+        data = operation.payload
 
         print(f"🔄 Calling YOUR EXISTING renewing function for: {email}")
 
@@ -315,30 +566,50 @@ class SequentialBrowserManager:
         result = renew_listings(
             email=email,
             renewal_count=data['renewal_count'],
+            pool=self.browser_pool,
+            screenshot_to={'operation_id': operation.id},
             # headless=False  # Change to True for production
         )
+        record_step_timings(result.get('steps'), 'renew', email)
 
         return result
 
-    def _cleanup_post_processor(self):
-        """Clean up post processor when done"""
-        with self.lock:
-            if self.post_processor:
-                self.post_processor.shutdown(wait=False)
-                self.post_processor = None
-
-            self.status['post_active'] = False
-            self.status['current_post_operation'] = None
+    def _queue_snapshot(self):
+        """
+        Status counters, worker and per-account queue statistics
 
-    def _cleanup_renew_processor(self):
-        """Clean up renew processor when done"""
+        Only the in-memory worker state is copied under self.lock; the
+        database queries run outside it so a status poll never holds up
+        the workers' claims and hand-offs.
+        """
         with self.lock:
-            if self.renew_processor:
-                self.renew_processor.shutdown(wait=False)
-                self.renew_processor = None
+            status = dict(self.status)
+            worker_states = {queue_type: [(w['state'], w['email'])
+                                          for w in self.workers[queue_type].values()]
+                             for queue_type in self.QUEUE_TYPES}
+
+        workers = {}
+        for queue_type, states in worker_states.items():
+            workers[queue_type] = {
+                'max': self.max_workers[queue_type],
+                'running': len(states),
+                'busy': sum(1 for state, _ in states if state == 'busy'),
+                'idle': sum(1 for state, _ in states if state == 'idle'),
+                'accounts': sorted(email for _, email in states if email),
+            }
 
-            self.status['renew_active'] = False
-            self.status['current_renew_operation'] = None
+        return {
+            **status,
+            # Queue sizes / busy accounts come from the database (all processes)
+            **self.queue.snapshot(),
+            'workers': workers,
+            'browser_pool': self.browser_pool.get_stats(),
+            'session_store': session_store.get_stats(),
+            'rate_limiter': rate_limiter.get_stats(),
+            'circuit_breakers': circuit_breaker.get_stats(),
+            'post_scheduler': post_scheduler.get_stats(),
+            'admission': self.queue.admission_stats(workers=dict(self.max_workers)),
+        }
 
     def get_user_status(self, email):
         """
@@ -350,14 +621,38 @@ class SequentialBrowserManager:
         Returns:
             dict: Status information for this user
         """
-        # Return global status (applies to all users now)
-        with self.lock:
-            return {
-                **self.status,
-                'post_queue_size': len(self.global_post_queue),
-                'renew_queue_size': len(self.global_renew_queue),
-                'total_queue_size': len(self.global_post_queue) + len(self.global_renew_queue),
-            }
+        # Global status plus this account's own queue depth
+        snapshot = self._queue_snapshot()
+        return {
+            **snapshot,
+            'account_queue': snapshot['account_queue_depth'].get(
+                email, {'post': 0, 'renew': 0}),
+            'account_busy': email in snapshot['busy_accounts'],
+        }
+
+    def get_queue_position(self, user):
+        """
+        Where a user's queued work stands in the fair queues
+
+        Args:
+            user: User
+
+        Returns:
+            dict: queue type -> position / listings ahead / estimated wait
+        """
+        return self.queue.user_queue_status(user, workers=dict(self.max_workers))
+
+    def get_admission_status(self, user=None):
+        """
+        Saturation of the queues (and the user's share) against the admission limits
+
+        Args:
+            user: User (optional)
+
+        Returns:
+            dict: queue type -> backlog / limit / saturation
+        """
+        return self.queue.admission_stats(workers=dict(self.max_workers), user=user)
 
     def get_all_users_status(self):
         """
@@ -366,27 +661,20 @@ class SequentialBrowserManager:
         Returns:
             dict: Global status information
         """
-        with self.lock:
-            return {
-                **self.status,
-                'post_queue_size': len(self.global_post_queue),
-                'renew_queue_size': len(self.global_renew_queue),
-                'total_queue_size': len(self.global_post_queue) + len(self.global_renew_queue),
-            }
+        return self._queue_snapshot()
 
     def shutdown(self):
         """
-        Shutdown all processors and clean up
+        Shutdown all workers and clean up
         """
         print("🛑 Shutting down Sequential Browser Manager...")
 
         with self.lock:
-            if self.post_processor:
-                self.post_processor.shutdown(wait=False)
-            if self.renew_processor:
-                self.renew_processor.shutdown(wait=False)
-            self.post_processor = None
-            self.renew_processor = None
+            # Idle workers exit and close their browsers; busy workers
+            # finish their current operation first (queued operations stay
+            # in the database for the next start)
+            self.stopping = True
+            self.work_available.notify_all()
 
         print("✅ Sequential Browser Manager shutdown complete")
 
@@ -408,6 +696,9 @@ def post_to_marketplace_sequential(email, title, description, price, image_path)
 
     Returns:
         dict: Status information
+
+    Raises:
+        QueueFullError: The POST queue refused the listing
     """
     sequential_manager.add_posting_operation(
         email, title, description, price, image_path)
@@ -429,6 +720,9 @@ def renew_listings_sequential(email, renewal_count=20):
 
     Returns:
         dict: Status information
+
+    Raises:
+        QueueFullError: The RENEW queue refused the renewal
     """
     sequential_manager.add_renewing_operation(email, renewal_count)
 
@@ -452,6 +746,19 @@ def get_user_automation_status(email):
     return sequential_manager.get_user_status(email)
 
 
+def get_queue_position(user):
+    """
+    Get a user's queue position and estimated wait
+
+    Args:
+        user: User
+
+    Returns:
+        dict: queue type -> position information
+    """
+    return sequential_manager.get_queue_position(user)
+
+
 def get_all_automation_status():
     """
     Get automation status for all users
@@ -0,0 +1,268 @@
+"""
+Browserless Session Probe
+=========================
+
+Tells whether an account's saved session still works without launching
+Chromium:
+
+1. Cookie check - expiry of the auth cookies in the storage_state
+   (c_user and xs are required, datr missing/expired means Facebook will
+   probably challenge the login soon)
+2. Optional HTTP probe - ONE plain request to AUTOMATION_SESSION_PROBE_BASE_URL
+   + PROBE_PATH with the session cookies. A redirect to the login /
+   checkpoint page (or a login form) means the session is dead.
+
+Sessions are classified as:
+    valid          - auth cookies present and not expiring soon
+    expiring_soon  - auth cookies expire within AUTOMATION_SESSION_EXPIRING_DAYS
+                     (or datr is missing)
+    expired        - auth cookies missing/expired, or the probe hit the login page
+    missing        - no session file
+    invalid        - session file is not valid JSON
+
+Results are cached per session file for AUTOMATION_SESSION_PROBE_CACHE_SECONDS
+(and dropped as soon as the file changes).
+
+USAGE:
+    result = validate_session(session_file)              # cookie check only
+    result = validate_session(session_file, probe=True)  # + HTTP probe
+    result['status']  -> 'valid' / 'expiring_soon' / 'expired' / ...
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlsplit
+import requests
+from django.conf import settings
+import logging
+
+from .session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+VALID = 'valid'
+EXPIRING_SOON = 'expiring_soon'
+EXPIRED = 'expired'
+MISSING = 'missing'
+INVALID = 'invalid'
+
+REQUIRED_COOKIES = ('c_user', 'xs')
+DEVICE_COOKIES = ('datr',)
+
+# Logged in: redirects to the profile. Logged out: redirects to /login
+PROBE_PATH = '/me/'
+LOGIN_URL_MARKERS = ('/login', 'checkpoint')
+LOGIN_PAGE_MARKERS = ('id="loginform"', 'name="login"')
+PROBE_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+MESSAGES = {
+    VALID: 'Session is valid',
+    EXPIRING_SOON: 'Session expires soon',
+    EXPIRED: 'Session has expired',
+    MISSING: 'Session file does not exist',
+    INVALID: 'Session file is corrupted',
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _settings():
+    return {
+        'base_url': getattr(settings, 'AUTOMATION_SESSION_PROBE_BASE_URL',
+                            'https://www.facebook.com'),
+        'http': getattr(settings, 'AUTOMATION_SESSION_PROBE_HTTP', False),
+        'timeout': getattr(settings, 'AUTOMATION_SESSION_PROBE_TIMEOUT', 10),
+        'cache_seconds': getattr(settings, 'AUTOMATION_SESSION_PROBE_CACHE_SECONDS', 300),
+        'expiring_days': getattr(settings, 'AUTOMATION_SESSION_EXPIRING_DAYS', 3),
+    }
+
+
+def _describe_cookie(cookie, now):
+    expires = cookie.get('expires') or -1
+    if expires <= 0:
+        # Session cookie - Playwright keeps it as long as the file exists
+        return {'present': True, 'expires_at': None, 'expires_in_days': None}
+    return {
+        'present': True,
+        'expires_at': datetime.fromtimestamp(expires, dt_timezone.utc).isoformat(),
+        'expires_in_days': round((expires - now) / 86400, 1),
+    }
+
+
+def inspect_cookies(state, expiring_days=3, now=None):
+    """
+    Classify a storage_state by the expiry of its auth cookies
+
+    Args:
+        state: Playwright storage_state dict
+        expiring_days: Days left below which a session is "expiring soon"
+        now: Current epoch time (default: time.time())
+
+    Returns:
+        dict: {'status', 'cookies': {name: {...}}, 'expires_in_days'}
+    """
+    now = now if now is not None else time.time()
+    by_name = {}
+    for cookie in state.get('cookies', []):
+        # Only Facebook's cookies matter; keep the longest-lived duplicate
+        if 'facebook.com' not in (cookie.get('domain') or ''):
+            continue
+        previous = by_name.get(cookie.get('name'))
+        if previous is None or (cookie.get('expires') or -1) > (previous.get('expires') or -1):
+            by_name[cookie.get('name')] = cookie
+
+    cookies = {}
+    for name in REQUIRED_COOKIES + DEVICE_COOKIES:
+        cookie = by_name.get(name)
+        cookies[name] = (_describe_cookie(cookie, now) if cookie else
+                         {'present': False, 'expires_at': None, 'expires_in_days': None})
+
+    remaining = [cookies[name]['expires_in_days'] for name in REQUIRED_COOKIES
+                 if cookies[name]['expires_in_days'] is not None]
+    expires_in_days = min(remaining) if remaining else None
+
+    device = [cookies[name] for name in DEVICE_COOKIES]
+    if any(not cookies[name]['present'] for name in REQUIRED_COOKIES):
+        status = EXPIRED
+    elif expires_in_days is not None and expires_in_days <= 0:
+        status = EXPIRED
+    elif expires_in_days is not None and expires_in_days <= expiring_days:
+        status = EXPIRING_SOON
+    elif any(not c['present'] or (c['expires_in_days'] is not None and c['expires_in_days'] <= 0)
+             for c in device):
+        status = EXPIRING_SOON
+    else:
+        status = VALID
+
+    return {'status': status, 'cookies': cookies, 'expires_in_days': expires_in_days}
+
+
+def probe_http(state, base_url=None, timeout=None):
+    """
+    Make ONE plain HTTP request with the session cookies
+
+    Args:
+        state: Playwright storage_state dict
+        base_url: Site to probe (default: AUTOMATION_SESSION_PROBE_BASE_URL)
+        timeout: Request timeout in seconds
+
+    Returns:
+        str: VALID or EXPIRED, or None if the answer was inconclusive
+             (network error, unexpected status)
+    """
+    options = _settings()
+    base_url = (base_url or options['base_url']).rstrip('/')
+    timeout = timeout or options['timeout']
+
+    # Sent as a header so the probe also works against a local stand-in
+    # whose host doesn't match the cookie domain
+    cookie_header = '; '.join(
+        f"{cookie['name']}={cookie['value']}" for cookie in state.get('cookies', [])
+        if 'facebook.com' in (cookie.get('domain') or ''))
+
+    try:
+        response = requests.get(
+            f"{base_url}{PROBE_PATH}",
+            headers={'Cookie': cookie_header, 'User-Agent': PROBE_USER_AGENT},
+            allow_redirects=False,
+            timeout=timeout,
+        )
+    except requests.RequestException as e:
+        logger.info("Session probe request failed: %s", e)
+        return None
+
+    if response.is_redirect:
+        location = urlsplit(response.headers.get('Location', ''))
+        target = f"{location.path}?{location.query}"
+        return EXPIRED if any(marker in target for marker in LOGIN_URL_MARKERS) else VALID
+
+    if response.status_code == 200:
+        body = response.text[:200000]
+        return EXPIRED if any(marker in body for marker in LOGIN_PAGE_MARKERS) else VALID
+
+    return None
+
+
+def validate_session(session_file, probe=None, use_cache=True, base_url=None):
+    """
+    Validate a saved session without a browser
+
+    Args:
+        session_file: Path to the Playwright storage_state JSON
+        probe: Also make the HTTP probe (default: AUTOMATION_SESSION_PROBE_HTTP)
+        use_cache: Return a cached result if the file did not change
+        base_url: Override AUTOMATION_SESSION_PROBE_BASE_URL (tests / stand-ins)
+
+    Returns:
+        dict: status, message, cookies, expires_in_days, http_check
+              ('valid' / 'expired' / 'inconclusive' / 'skipped'),
+              session_age_days, checked_at, cached
+    """
+    options = _settings()
+    probe = options['http'] if probe is None else probe
+
+    try:
+        mtime = os.path.getmtime(session_file)
+    except OSError:
+        return _result(MISSING)
+
+    key = (os.path.abspath(session_file), mtime, bool(probe))
+    if use_cache:
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached and time.time() - cached['_at'] < options['cache_seconds']:
+            return {**cached['result'], 'cached': True}
+
+    try:
+        state = session_store.get(session_file)
+    except (OSError, ValueError):
+        return _result(INVALID)
+
+    checked = inspect_cookies(state, options['expiring_days'])
+    status = checked['status']
+
+    http_check = 'skipped'
+    if probe and status != EXPIRED:
+        outcome = probe_http(state, base_url=base_url)
+        http_check = outcome or 'inconclusive'
+        if outcome == EXPIRED:
+            status = EXPIRED
+
+    result = _result(
+        status,
+        cookies=checked['cookies'],
+        expires_in_days=checked['expires_in_days'],
+        http_check=http_check,
+        session_age_days=round((time.time() - mtime) / 86400, 1),
+    )
+
+    with _cache_lock:
+        # Drop results for older versions of this file
+        for old_key in [k for k in _cache if k[0] == key[0] and k[1] != mtime]:
+            del _cache[old_key]
+        _cache[key] = {'_at': time.time(), 'result': result}
+    return result
+
+
+def _result(status, **details):
+    return {
+        'status': status,
+        'valid': status in (VALID, EXPIRING_SOON),
+        'message': MESSAGES[status],
+        'cookies': details.get('cookies', {}),
+        'expires_in_days': details.get('expires_in_days'),
+        'http_check': details.get('http_check', 'skipped'),
+        'session_age_days': details.get('session_age_days'),
+        'checked_at': datetime.now(dt_timezone.utc).isoformat(),
+        'cached': False,
+    }
+
+
+def clear_cache():
+    """Forget all cached probe results"""
+    with _cache_lock:
+        _cache.clear()
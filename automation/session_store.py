@@ -0,0 +1,193 @@
+"""
+Session Store (storage_state cache with cookie write-back)
+==========================================================
+
+Every run used to hand the session file path to new_context(), so
+Playwright re-read and re-parsed sessions/<email>.json each time, and the
+cookies Facebook refreshed during the run were thrown away - sessions
+decayed until a manual re-login.
+
+SessionStore keeps the parsed storage_state in memory:
+
+- get() returns the cached dict, re-reading the file only when its mtime
+  changed (e.g. a new session was imported / saved by the login flow)
+- save() writes context.storage_state() back after a successful run,
+  atomically (temp file + os.replace) and only when the cookies actually
+  changed
+- a state without the auth cookies (c_user / xs) is never written back,
+  so a run that got logged out cannot overwrite a good session
+
+Write-back can be turned off with AUTOMATION_SESSION_WRITE_BACK.
+
+USAGE:
+    state = session_store.get(session_file)
+    context = browser.new_context(storage_state=state)
+    ...
+    session_store.save(session_file, context.storage_state())
+"""
+
+import json
+import os
+import tempfile
+import threading
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cookies that must be present for a state to count as logged in
+AUTH_COOKIES = ('c_user', 'xs')
+
+# Expiry moves smaller than this don't count as a change (Facebook bumps
+# expiry dates on almost every request)
+EXPIRY_SLACK_SECONDS = 86400
+
+
+def _cookie_fingerprint(state):
+    """Comparable summary of the cookies in a storage_state"""
+    fingerprint = set()
+    for cookie in state.get('cookies', []):
+        expires = cookie.get('expires') or -1
+        fingerprint.add((
+            cookie.get('name'),
+            cookie.get('domain'),
+            cookie.get('path'),
+            cookie.get('value'),
+            int(expires // EXPIRY_SLACK_SECONDS) if expires > 0 else -1,
+        ))
+    return frozenset(fingerprint)
+
+
+def is_logged_in(state):
+    """True if the storage_state still carries the Facebook auth cookies"""
+    names = {cookie.get('name') for cookie in state.get('cookies', [])}
+    return all(name in names for name in AUTH_COOKIES)
+
+
+class SessionStore:
+    """
+    In-memory cache of parsed storage_state files, invalidated by mtime
+    """
+
+    def __init__(self, write_back=None):
+        self.write_back = write_back if write_back is not None else getattr(
+            settings, 'AUTOMATION_SESSION_WRITE_BACK', True)
+
+        self.lock = threading.Lock()
+        # abspath -> {'mtime', 'state', 'fingerprint'}
+        self._entries = {}
+        self.stats = {
+            'hits': 0,
+            'loads': 0,
+            'writes': 0,
+            'unchanged': 0,
+            'rejected': 0,
+        }
+
+    def get(self, session_file):
+        """
+        Parsed storage_state for a session file
+
+        The returned dict is shared - do not modify it.
+
+        Args:
+            session_file: Path to the Playwright storage_state JSON
+
+        Returns:
+            dict: storage_state (raises OSError / ValueError like open/json)
+        """
+        key = os.path.abspath(session_file)
+        mtime = os.stat(key).st_mtime_ns
+
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry and entry['mtime'] == mtime:
+                self.stats['hits'] += 1
+                return entry['state']
+
+        with open(key) as f:
+            state = json.load(f)
+
+        with self.lock:
+            self._entries[key] = {
+                'mtime': mtime,
+                'state': state,
+                'fingerprint': _cookie_fingerprint(state),
+            }
+            self.stats['loads'] += 1
+        return state
+
+    def save(self, session_file, state):
+        """
+        Write a refreshed storage_state back if its cookies changed
+
+        Never raises - a failed write-back only loses the refresh.
+
+        Args:
+            session_file: Path to the Playwright storage_state JSON
+            state: Result of context.storage_state()
+
+        Returns:
+            bool: True if the file was written
+        """
+        if not self.write_back or not state:
+            return False
+
+        key = os.path.abspath(session_file)
+
+        if not is_logged_in(state):
+            logger.warning("Not saving session %s: auth cookies missing", session_file)
+            with self.lock:
+                self.stats['rejected'] += 1
+            return False
+
+        fingerprint = _cookie_fingerprint(state)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry and entry['fingerprint'] == fingerprint:
+                self.stats['unchanged'] += 1
+                return False
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                suffix='.tmp', dir=os.path.dirname(key))
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, key)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            mtime = os.stat(key).st_mtime_ns
+        except OSError as e:
+            logger.warning("Could not save session %s: %s", session_file, e)
+            return False
+
+        with self.lock:
+            self._entries[key] = {
+                'mtime': mtime,
+                'state': state,
+                'fingerprint': fingerprint,
+            }
+            self.stats['writes'] += 1
+
+        print(f"🍪 Session cookies refreshed: {os.path.basename(key)}")
+        return True
+
+    def invalidate(self, session_file=None):
+        """Forget one cached session (or all of them)"""
+        with self.lock:
+            if session_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(session_file), None)
+
+    def get_stats(self):
+        """Cache counters for status endpoints"""
+        with self.lock:
+            return {**self.stats, 'cached_sessions': len(self._entries)}
+
+
+# Shared store used by the browser pool
+session_store = SessionStore()
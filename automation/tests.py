@@ -1,3 +1,763 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .exceptions import (
+    CaptchaRequiredError,
+    NetworkError,
+    PublishUnconfirmedError,
+    RateLimitedError,
+    SessionExpiredError,
+    classify_exception,
+    error_for_publish_response,
+    error_for_url,
+)
+from . import account_runner
+from .account_runner import ThreadedAccountRunner
+from .circuit_breaker import CircuitBreaker
+from .failure_screenshots import ScreenshotWriter
+from .models import AccountCircuitBreaker, AutomationOperation
+from .network_filter import DEFAULT_PROFILE, NetworkFilter
+from . import post_to_facebook
+from .operation_queue import OperationQueue, QueueFullError
+from . import rate_limiter as rate_limiting
+from .rate_limiter import AccountRateLimiter, HOUR, DAY, rate_limiter
+from .renew_posts import renew_listings
+from .selector_strategies import SelectorStrategyCache
+from . import sequential_browser_manager
+from .sequential_browser_manager import sequential_manager
+
+User = get_user_model()
+
+
+class SelectorStrategyCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.packs_file = os.path.join(self.tmp.name, 'packs.json')
+        self.cache_file = os.path.join(self.tmp.name, 'cache.json')
+        with open(self.packs_file, 'w') as f:
+            json.dump({'next': [
+                {'id': 'fast', 'kind': 'text', 'value': 'Next'},
+                {'id': 'steady', 'kind': 'role', 'role': 'button', 'name': 'Next'},
+                {'id': 'keys', 'kind': 'keyboard', 'keys': ['Tab'], 'last_resort': True},
+            ]}, f)
+
+    def make_cache(self, save_interval=3600):
+        return SelectorStrategyCache(packs_file=self.packs_file, cache_file=self.cache_file,
+                                     save_interval=save_interval)
+
+    def saved(self):
+        with open(self.cache_file) as f:
+            return json.load(f)
+
+    def test_ranks_by_success_rate_before_latency(self):
+        cache = self.make_cache()
+        for _ in range(2):
+            cache.record('next', 'fast', True, 100)
+            cache.record('next', 'fast', False, 100)
+        for _ in range(4):
+            cache.record('next', 'steady', True, 400)
+
+        ids = [strategy['id'] for strategy in cache.get_strategies('next')]
+        self.assertEqual(ids, ['steady', 'fast', 'keys'])
+
+    def test_equal_success_rate_ranks_by_latency(self):
+        cache = self.make_cache()
+        for _ in range(3):
+            cache.record('next', 'steady', True, 400)
+            cache.record('next', 'fast', True, 100)
+
+        ids = [strategy['id'] for strategy in cache.get_strategies('next')]
+        self.assertEqual(ids, ['fast', 'steady', 'keys'])
+
+    def test_save_merges_stats_of_other_processes(self):
+        first, second = self.make_cache(), self.make_cache()
+        first.record('next', 'fast', True, 100)
+        first.flush()
+        second.record('next', 'fast', True, 120)
+        second.record('next', 'steady', True, 300)
+        second.flush()
+        first.record('next', 'fast', True, 100)
+        first.flush()
+
+        saved = self.saved()
+        self.assertEqual(saved['next']['fast']['wins'], 3)
+        self.assertEqual(saved['next']['steady']['wins'], 1)
+        # The last writer also picked up what the other one learned
+        self.assertEqual(first.get_stats()['next']['steady']['wins'], 1)
+        # No temp files left behind
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['cache.json', 'packs.json'])
+
+    def test_attempts_are_saved_in_batches(self):
+        cache = self.make_cache()
+        for _ in range(3):
+            cache.record('next', 'fast', False, 100)
+        cache.record('next', 'steady', True, 300)
+
+        # Nothing written on the hot path
+        self.assertFalse(os.path.exists(self.cache_file))
+
+        cache.flush()
+        saved = self.saved()
+        self.assertEqual(saved['next']['fast']['misses'], 3)
+        self.assertEqual(saved['next']['fast']['consecutive_misses'], 3)
+        self.assertEqual(saved['next']['steady']['wins'], 1)
+
+        # Misses alone are persisted too - another process sees the demotion
+        self.assertEqual(self.make_cache().get_stats()['next']['fast']['consecutive_misses'], 3)
+
+    def test_attempt_saves_once_the_interval_passed(self):
+        cache = self.make_cache(save_interval=0)
+
+        cache.record('next', 'fast', False, 100)
+
+        self.assertEqual(self.saved()['next']['fast']['misses'], 1)
+
+
+class ClassifyExceptionTests(TestCase):
+    def test_typed_errors_keep_their_type(self):
+        self.assertEqual(classify_exception(SessionExpiredError('x')), 'session_expired')
+        self.assertEqual(classify_exception(CaptchaRequiredError('x')), 'captcha')
+        self.assertEqual(classify_exception(RateLimitedError('x')), 'rate_limit')
+        # The type wins over a misleading message
+        self.assertEqual(classify_exception(NetworkError('login failed')), 'network_error')
+
+    def test_legacy_messages(self):
+        cases = {
+            'Session not found. Run save_session() first': 'session_expired',
+            'Checkpoint required': 'captcha',
+            'net::ERR_CONNECTION_RESET at https://www.facebook.com': 'network_error',
+            'Rate limit exceeded': 'rate_limit',
+            'Too many requests, try again later': 'rate_limit',
+            "You can't use this feature right now": 'rate_limit',
+            'Could not find the price input': 'selector_not_found',
+            'No image for this post': 'validation_error',
+            'Something else broke': 'unknown',
+        }
+        for message, error_type in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(classify_exception(Exception(message)), error_type)
+                self.assertEqual(classify_exception(message), error_type)
+
+    def test_words_containing_rate_or_limit_are_not_rate_limits(self):
+        for message in ('Could not generate the description', 'Price is not accurate',
+                        'Title exceeds the character limit', 'Price limit is 100000',
+                        'Moderate content detected'):
+            with self.subTest(message=message):
+                self.assertEqual(classify_exception(Exception(message)), 'unknown')
+
+    def test_renewal_without_session_raises(self):
+        with self.assertRaises(SessionExpiredError) as caught:
+            renew_listings('nobody@example.com', renewal_count=1)
+        # Parked by the retry policy instead of retried or counted as done
+        self.assertEqual(classify_exception(caught.exception), 'session_expired')
+
+    def test_goto_timeout_is_a_network_error(self):
+        TimeoutError = type('TimeoutError', (Exception,), {})
+        self.assertEqual(classify_exception(TimeoutError('Page.goto: Timeout 60000ms exceeded')),
+                         'network_error')
+
+    def test_errors_for_redirects_and_publish_responses(self):
+        self.assertIsInstance(error_for_url('https://www.facebook.com/login/?next=x'),
+                              SessionExpiredError)
+        self.assertIsInstance(error_for_url('https://www.facebook.com/checkpoint/828281030'),
+                              CaptchaRequiredError)
+        self.assertIsNone(error_for_url('https://www.facebook.com/marketplace/create/item'))
+
+        self.assertIsInstance(error_for_publish_response(429, ''), RateLimitedError)
+        self.assertIsInstance(error_for_publish_response(200, '{"errors": [{}]}'),
+                              PublishUnconfirmedError)
+        self.assertIsNone(error_for_publish_response(200, '{"data": {}}'))
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_limiter"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def record_posted(email, user=None):
+    """'posted' event as another process's listing leaves it"""
+    from postings.models import PostAnalytics
+    user = user or User.objects.get_or_create(username='poster')[0]
+    return PostAnalytics.objects.create(
+        user=user, post_title='Chair', action='posted', account_email=email)
+
+
+class NetworkFilterTests(TestCase):
+    def setUp(self):
+        self.filter = NetworkFilter({**DEFAULT_PROFILE, 'stub_resource_types': ['image']})
+
+    def test_blocking_wins_over_the_allow_list(self):
+        # What Chromium's setBlockedURLs does before any route sees the request
+        self.assertEqual(self.filter.decide(
+            'https://upload.facebook.com/clip.mp4', 'media'), 'block')
+        self.assertEqual(self.filter.decide(
+            'https://www.facebook.com/tr?id=1', 'image'), 'block')
+
+    def test_allow_list_protects_from_stubbing(self):
+        self.assertEqual(self.filter.decide(
+            'https://upload.facebook.com/photo.jpg', 'image'), 'allow')
+        self.assertEqual(self.filter.decide(
+            'https://scontent.fbcdn.net/feed.jpg', 'image'), 'stub')
+        self.assertEqual(self.filter.decide(
+            'https://scontent.fbcdn.net/preview.jpg', 'image',
+            'https://www.facebook.com/marketplace/create/item'), 'allow')
+
+
+class AccountRateLimiterTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limiting, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def limiter(self, **limits):
+        options = {'enabled': True, 'min_gap': 0, 'hourly_cap': 0, 'daily_cap': 0, 'burst': 3}
+        options.update(limits)
+        return AccountRateLimiter(**options)
+
+    def test_minimum_gap_between_listings(self):
+        limiter = self.limiter(min_gap=30)
+
+        self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.assertFalse(limiter.try_acquire('a@example.com'))
+        self.assertEqual(limiter.wait_seconds('a@example.com'), 30)
+        # Other accounts are not held back
+        self.assertTrue(limiter.allows('b@example.com'))
+
+        self.clock.advance(29)
+        self.assertFalse(limiter.allows('a@example.com'))
+        self.clock.advance(1)
+        self.assertTrue(limiter.try_acquire('a@example.com'))
+
+    def test_token_bucket_burst_then_refill(self):
+        limiter = self.limiter(burst=3, hourly_cap=6)
+
+        for _ in range(3):
+            self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.assertEqual(limiter.available('a@example.com'), 0)
+        # One token every HOUR / 6 seconds
+        self.assertAlmostEqual(limiter.wait_seconds('a@example.com'), HOUR / 6)
+
+        self.clock.advance(HOUR / 6)
+        self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.assertFalse(limiter.allows('a@example.com'))
+
+    def test_hourly_cap_is_a_sliding_window(self):
+        limiter = self.limiter(burst=10, hourly_cap=2)
+
+        self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.clock.advance(10)
+        self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.clock.advance(10)
+
+        # Tokens are left, but two listings started in the last hour
+        self.assertFalse(limiter.allows('a@example.com'))
+        self.assertAlmostEqual(limiter.wait_seconds('a@example.com'), HOUR - 20)
+        self.clock.advance(HOUR - 20)
+        self.assertTrue(limiter.allows('a@example.com'))
+
+    def test_daily_cap(self):
+        limiter = self.limiter(burst=10, daily_cap=3)
+
+        for _ in range(3):
+            self.assertTrue(limiter.try_acquire('a@example.com'))
+            self.clock.advance(60)
+
+        self.assertFalse(limiter.allows('a@example.com'))
+        self.assertAlmostEqual(limiter.wait_seconds('a@example.com'), DAY - 180)
+        self.clock.advance(DAY - 180)
+        self.assertTrue(limiter.allows('a@example.com'))
+
+    def test_cool_down_blocks_the_account(self):
+        limiter = self.limiter()
+
+        limiter.cool_down('a@example.com', 600)
+
+        self.assertEqual(limiter.wait_seconds('a@example.com'), 600)
+        self.assertEqual(limiter.next_allowed_at('a@example.com'), self.clock.now + 600)
+        self.clock.advance(600)
+        self.assertTrue(limiter.allows('a@example.com'))
+
+    def test_version_moves_with_state_changes_only(self):
+        limiter = self.limiter(min_gap=30)
+        version = limiter.version
+
+        limiter.wait_seconds('a@example.com')
+        limiter.allows('a@example.com')
+        self.assertEqual(limiter.version, version)
+
+        limiter.try_acquire('a@example.com')
+        self.assertEqual(limiter.version, version + 1)
+        # Refused: nothing changed
+        limiter.try_acquire('a@example.com')
+        self.assertEqual(limiter.version, version + 1)
+
+    def test_sync_sees_listings_of_other_processes(self):
+        self.clock.now = time.time()
+        limiter = self.limiter(burst=10, daily_cap=2)
+        self.assertTrue(limiter.allows('a@example.com'))
+        limiter.sync()
+        version = limiter.version
+
+        record_posted('a@example.com')
+        record_posted('a@example.com')
+        record_posted('b@example.com')
+        # Bucket in this process is stale until the next sync
+        self.assertTrue(limiter.allows('a@example.com'))
+
+        limiter.sync()
+
+        self.assertFalse(limiter.allows('a@example.com'))
+        self.assertGreater(limiter.version, version)
+        # Accounts this process never used are seeded on first use anyway
+        self.assertNotIn('b@example.com', limiter.get_stats()['accounts'])
+
+    def test_refresh_keeps_the_cool_down(self):
+        self.clock.now = time.time()
+        limiter = self.limiter(min_gap=30)
+        limiter.cool_down('a@example.com', 600)
+
+        limiter.refresh('a@example.com')
+
+        self.assertAlmostEqual(limiter.wait_seconds('a@example.com'), 600)
+
+    def test_disabled_limiter_allows_everything(self):
+        limiter = self.limiter(enabled=False, min_gap=30, daily_cap=1)
+
+        for _ in range(5):
+            self.assertTrue(limiter.try_acquire('a@example.com'))
+        self.assertEqual(limiter.wait_seconds('a@example.com'), 0)
+
+
+class OperationQueueTests(TestCase):
+    def setUp(self):
+        self.queue = OperationQueue(lease_seconds=60, max_attempts=2)
+        rate_limiter.forget()
+        self.addCleanup(rate_limiter.forget)
+
+    def enqueue(self, email='a@example.com', operation_type='renew'):
+        return self.queue.enqueue(operation_type, email, {'renewal_count': 1})
+
+    def test_claim_takes_lowest_start_tag_and_leases_it(self):
+        first, second = self.enqueue(), self.enqueue('b@example.com')
+
+        claimed = self.queue.claim('renew', 'w1')
+
+        self.assertEqual([op.id for op in claimed], [first.id])
+        self.assertEqual(claimed[0].status, 'running')
+        self.assertEqual(claimed[0].lease_owner, 'w1')
+        self.assertEqual(claimed[0].attempts, 1)
+        # The account is busy now - the next claim moves on to another account
+        self.assertEqual([op.id for op in self.queue.claim('renew', 'w2')], [second.id])
+        self.assertEqual(self.queue.claim('renew', 'w3'), [])
+
+    def test_unequal_backlogs_are_interleaved(self):
+        bulk, small = User.objects.create(username='bulk'), User.objects.create(username='small')
+        for i in range(6):
+            self.queue.enqueue('renew', f'bulk{i}@example.com', {}, user=bulk)
+        for i in range(2):
+            self.queue.enqueue('renew', f'small{i}@example.com', {}, user=small)
+
+        order = []
+        while True:
+            claimed = self.queue.claim('renew', 'w1')
+            if not claimed:
+                break
+            order.append(claimed[0].user.username)
+            self.queue.complete(claimed[0], 'w1')
+
+        # The small backlog is served alongside the bulk one, not after it
+        self.assertEqual(order, ['bulk', 'small', 'bulk', 'small', 'bulk', 'bulk', 'bulk', 'bulk'])
+
+    def test_finish_tags_favour_the_heavier_flow(self):
+        light, heavy = User.objects.create(username='light'), User.objects.create(username='heavy')
+        with self.settings(AUTOMATION_USER_WEIGHTS={'heavy': 3}):
+            for i in range(4):
+                self.queue.enqueue('renew', f'light{i}@example.com', {}, user=light)
+                self.queue.enqueue('renew', f'heavy{i}@example.com', {}, user=heavy)
+            order = [op.user.username for op in AutomationOperation.objects.order_by(
+                'start_tag', 'finish_tag', 'id')]
+
+        # Three times the weight: three listings for each one of the other flow
+        self.assertEqual(order[:5], ['heavy', 'light', 'heavy', 'heavy', 'heavy'])
+
+    def test_rate_limited_accounts_are_cached_until_the_limiter_changes(self):
+        self.enqueue('a@example.com', 'post')
+        self.enqueue('b@example.com', 'post')
+        rate_limiter.cool_down('a@example.com', 600)
+
+        with mock.patch.object(rate_limiter, 'next_allowed_at',
+                               wraps=rate_limiter.next_allowed_at) as next_allowed_at:
+            for _ in range(3):
+                self.assertEqual(self.queue.rate_limited_accounts('post'), {'a@example.com'})
+            self.assertEqual(next_allowed_at.call_count, 2)
+
+            # A listing started: asked again
+            rate_limiter.try_acquire('b@example.com')
+            self.assertIn('b@example.com', self.queue.rate_limited_accounts('post'))
+            self.assertEqual(next_allowed_at.call_count, 4)
+
+    def test_racing_claimers_never_share_an_account(self):
+        first, second = self.enqueue(), self.enqueue()
+        try_claim = self.queue._try_claim
+
+        def claim_with_rival(operation, owner, now):
+            # Another process claimed the account's other row after our
+            # running-accounts check
+            if operation.id == first.id:
+                self.assertTrue(try_claim(second, 'w2', now))
+            return try_claim(operation, owner, now)
+
+        with mock.patch.object(self.queue, '_try_claim', side_effect=claim_with_rival):
+            self.assertEqual(self.queue.claim('renew', 'w1'), [])
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'queued')
+        # Backing off is not an attempt
+        self.assertEqual(first.attempts, 0)
+        self.assertEqual(AutomationOperation.objects.get(id=second.id).lease_owner, 'w2')
+
+    def test_later_checker_backs_off_whatever_the_ids(self):
+        first, second = self.enqueue(), self.enqueue()
+        now = timezone.now()
+
+        # w2 claimed the higher id and checked before w1 claimed the lower one
+        self.assertTrue(self.queue._try_claim(second, 'w2', now))
+        self.assertFalse(self.queue._lost_account_race(second, 'w2'))
+        self.assertTrue(self.queue._try_claim(first, 'w1', now))
+        self.assertTrue(self.queue._lost_account_race(first, 'w1'))
+
+    def test_expired_lease_is_reclaimed(self):
+        operation = self.enqueue()
+        self.queue.claim('renew', 'dead-worker')
+        AutomationOperation.objects.filter(id=operation.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        # The dead worker's lease no longer blocks the account
+        claimed = self.queue.claim('renew', 'w2')
+
+        self.assertEqual([op.id for op in claimed], [operation.id])
+        self.assertEqual(claimed[0].lease_owner, 'w2')
+        self.assertEqual(claimed[0].attempts, 2)
+        # The dead worker can't overwrite the new run
+        self.assertFalse(self.queue.complete(operation, 'dead-worker'))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        operation = self.enqueue()
+        AutomationOperation.objects.filter(id=operation.id).update(
+            status='running', lease_owner='w1', attempts=2,
+            lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.queue.reclaim_expired(), 1)
+
+        operation.refresh_from_db()
+        self.assertEqual(operation.status, 'failed')
+        self.assertIn('Lease expired', operation.last_error)
+
+    def test_retried_failure_gives_the_attempt_back(self):
+        operation = self.enqueue()
+        claimed = self.queue.claim('renew', 'w1')[0]
+
+        decision = self.queue.settle_failure(claimed, 'w1', NetworkError('net::ERR_TIMED_OUT'))
+
+        operation.refresh_from_db()
+        self.assertEqual(decision['action'], 'retry')
+        self.assertEqual(operation.status, 'queued')
+        self.assertEqual(operation.attempts, 0)
+        self.assertEqual(operation.retries, 1)
+        self.assertEqual(operation.error_type, 'network_error')
+        self.assertGreater(operation.available_at, timezone.now())
+        # Backing off: not claimable before available_at
+        self.assertEqual(self.queue.claim('renew', 'w1'), [])
+
+    def test_claim_skips_an_account_another_process_just_posted_with(self):
+        self.queue.enqueue('post_job', 'a@example.com', {'post_ids': [1]})
+        # This process's bucket for the account says it is free...
+        self.assertTrue(rate_limiter.allows('a@example.com'))
+        self.queue.rate_limited_accounts('post_job')
+
+        # ...but the worker daemon started a listing with it meanwhile
+        record_posted('a@example.com')
+
+        self.assertEqual(self.queue.claim('post_job', 'w1'), [])
+        self.assertGreater(rate_limiter.wait_seconds('a@example.com'), 0)
+
+    def test_claim_rereads_the_account_history(self):
+        self.queue.enqueue('post_job', 'a@example.com', {'post_ids': [1]})
+        self.assertTrue(rate_limiter.allows('a@example.com'))
+        self.queue.rate_limited_accounts('post_job')
+        record_posted('a@example.com')
+
+        # Even when the pre-filter missed the event, the claim re-seeds the account
+        with mock.patch.object(rate_limiter, 'sync'):
+            self.assertEqual(self.queue.claim('post_job', 'w1'), [])
+        self.assertEqual(AutomationOperation.objects.get().status, 'queued')
+        self.assertEqual(AutomationOperation.objects.get().attempts, 0)
+
+    @override_settings(AUTOMATION_ESTIMATED_SECONDS_PER_LISTING=60)
+    def test_admit_refuses_a_full_queue_with_retry_after(self):
+        owner, other = User.objects.create(username='owner'), User.objects.create(username='other')
+        self.queue.max_backlog, self.queue.max_user_backlog = 10, 4
+        self.queue.enqueue('post', 'a@example.com', {}, user=owner, cost=3)
+        self.queue.enqueue('post', 'b@example.com', {}, user=other, cost=5)
+
+        # Fits both limits
+        self.queue.admit('post', owner, units=1, workers=2)
+
+        with self.assertRaises(QueueFullError) as refused:
+            self.queue.admit('post', owner, units=3, workers=2)
+
+        # The user's limit needs the most draining: 2 listings on 2 workers at 60s
+        self.assertEqual(refused.exception.scope, 'user')
+        self.assertEqual(refused.exception.retry_after, 60)
+        self.assertEqual(refused.exception.estimated_wait, 330)
+        self.assertEqual(refused.exception.describe()['retry_after_seconds'], 60)
+
+    def test_admit_refuses_work_larger_than_the_limit_for_good(self):
+        self.queue.max_backlog, self.queue.max_user_backlog = 10, 0
+
+        with self.assertRaises(QueueFullError) as refused:
+            self.queue.admit('post', None, units=11)
+
+        self.assertIsNone(refused.exception.retry_after)
+        self.assertEqual(refused.exception.scope, 'global')
+
+    def test_admission_counts_work_queued_by_the_previous_one(self):
+        self.queue.max_backlog, self.queue.max_user_backlog = 2, 0
+
+        with self.queue.admission('post', None, units=2):
+            self.queue.enqueue('post', 'a@example.com', {}, cost=2)
+        with self.assertRaises(QueueFullError):
+            with self.queue.admission('post', None, units=1):
+                self.queue.enqueue('post', 'b@example.com', {})
+
+        self.assertEqual(AutomationOperation.objects.count(), 1)
+
+    def test_failed_admission_block_keeps_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with self.queue.admission('renew', None, units=2):
+                self.enqueue()
+                raise RuntimeError('second account vanished')
+
+        self.assertFalse(AutomationOperation.objects.exists())
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(enabled=True, threshold=3, cooldown=60, max_cooldown=600)
+        self.email = 'a@example.com'
+
+    def state(self):
+        return AccountCircuitBreaker.objects.get(account_email=self.email)
+
+    def fail(self, error):
+        return self.breaker.record_failure(self.email, classify_exception(error), error)
+
+    def end_cooldown(self):
+        AccountCircuitBreaker.objects.filter(account_email=self.email).update(
+            retry_at=timezone.now() - timedelta(seconds=1))
+
+    def test_account_error_trips_at_once(self):
+        self.assertTrue(self.fail(CaptchaRequiredError('checkpoint')))
+
+        breaker = self.state()
+        self.assertEqual(breaker.state, 'open')
+        self.assertEqual(breaker.last_error_type, 'captcha')
+        self.assertEqual(breaker.trips, 1)
+        self.assertFalse(self.breaker.allow(self.email))
+        self.assertEqual(self.breaker.blocked_accounts(), {self.email})
+
+    def test_counted_errors_trip_after_the_threshold(self):
+        self.assertFalse(self.fail(NetworkError('net::ERR_TIMED_OUT')))
+        self.assertFalse(self.fail(NetworkError('net::ERR_TIMED_OUT')))
+        # Listing-specific failures neither count nor reset the streak
+        self.assertFalse(self.fail(PublishUnconfirmedError('no confirmation')))
+        self.assertEqual(self.state().consecutive_failures, 2)
+
+        self.assertTrue(self.fail(NetworkError('net::ERR_TIMED_OUT')))
+        self.assertEqual(self.state().state, 'open')
+
+    def test_only_one_caller_becomes_the_probe(self):
+        self.fail(SessionExpiredError('login page'))
+        self.end_cooldown()
+        stale = self.state()
+
+        self.assertTrue(self.breaker.allow(self.email))
+        self.assertEqual(self.state().state, 'half_open')
+        # A second caller that read the row before the probe started loses the update
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=stale):
+            self.assertFalse(self.breaker.allow(self.email))
+        self.assertFalse(self.breaker.allow(self.email))
+
+    def test_successful_probe_closes_the_breaker(self):
+        self.fail(SessionExpiredError('login page'))
+        self.end_cooldown()
+        self.assertTrue(self.breaker.allow(self.email))
+
+        self.breaker.record_success(self.email)
+
+        breaker = self.state()
+        self.assertEqual((breaker.state, breaker.consecutive_failures, breaker.trips),
+                         ('closed', 0, 0))
+        self.assertIsNone(breaker.retry_at)
+        self.assertTrue(self.breaker.allow(self.email))
+
+    def test_failed_probe_reopens_with_a_longer_cooldown(self):
+        self.fail(SessionExpiredError('login page'))
+        self.end_cooldown()
+        self.assertTrue(self.breaker.allow(self.email))
+
+        self.assertTrue(self.fail(NetworkError('net::ERR_TIMED_OUT')))
+
+        breaker = self.state()
+        self.assertEqual((breaker.state, breaker.trips), ('open', 2))
+        self.assertGreater(breaker.retry_at, timezone.now() + timedelta(seconds=100))
+
+
+class FailureScreenshotTests(TransactionTestCase):
+    """TransactionTestCase: the writer attaches the file from its own thread"""
+
+    def setUp(self):
+        self.operation = AutomationOperation.objects.create(
+            operation_type='post', account_email='a@example.com',
+            payload={'title': 'Chair', 'description': '', 'price': 1, 'image_path': None})
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_operation_gets_its_screenshot(self):
+        writer = ScreenshotWriter()
+        self.addCleanup(writer.executor.shutdown)
+
+        name = writer.submit(b'jpeg', operation_id=self.operation.id).result()
+
+        self.assertTrue(name.startswith(f'error_screenshots/operation_{self.operation.id}/'))
+        self.operation.refresh_from_db()
+        self.assertEqual(self.operation.screenshot.name, name)
+
+    def test_failed_batch_listing_keeps_its_screenshot(self):
+        def post_batch(email, posts, on_result=None, **kwargs):
+            result = {'post_id': posts[0]['post_id'], 'success': False, 'steps': [],
+                      'error': 'Publish button not found', 'exception': None,
+                      'screenshot': b'jpeg'}
+            on_result(result)
+            return [result]
+
+        with mock.patch.object(sequential_browser_manager, 'post_batch', side_effect=post_batch), \
+                mock.patch.object(sequential_browser_manager.screenshot_writer, 'submit') as submit:
+            sequential_manager._execute_posting_batch(
+                'a@example.com', [self.operation], 'owner')
+
+        submit.assert_called_once_with(b'jpeg', operation_id=self.operation.id)
+
+
+class ThreadedAccountRunnerTests(TestCase):
+    def setUp(self):
+        self.runner = ThreadedAccountRunner(concurrency=2, pool=mock.Mock())
+
+    def test_results_keep_the_account_order(self):
+        def renew(email, renewal_count, **kwargs):
+            if email == 'b@example.com':
+                raise SessionExpiredError('Redirected to the login page')
+            return {'success': True, 'renewed_count': renewal_count}
+
+        with mock.patch.object(account_runner, 'renew_listings', side_effect=renew):
+            results = self.runner.run_renewals(
+                {'a@example.com': 1, 'b@example.com': 2, 'c@example.com': 3})
+
+        self.assertEqual(list(results), ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual(results['c@example.com']['renewed_count'], 3)
+        self.assertFalse(results['b@example.com']['success'])
+        self.assertEqual(self.runner.pool.release.call_count, 2)
+
+    def test_can_be_called_from_a_running_event_loop(self):
+        async def caller():
+            return self.runner.run_renewals({'a@example.com': 1})
+
+        with mock.patch.object(account_runner, 'renew_listings', return_value={'success': True}):
+            results = asyncio.run(caller())
+
+        self.assertTrue(results['a@example.com']['success'])
+
+
+class PipelinedPostingTests(TestCase):
+    def setUp(self):
+        self.context = mock.Mock()
+        self.acquired = []
+        for name in ('stage_listing', 'start_publish', 'capture_failure'):
+            patcher = mock.patch.object(post_to_facebook, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def acquire(self, email, allowed=3):
+        self.acquired.append(email)
+        return len(self.acquired) <= allowed
+
+    def post(self, count, confirm=None, acquire=None):
+        posts = [{'post_id': i, 'title': f'Listing {i}', 'description': '', 'price': 1,
+                  'image_path': None} for i in range(1, count + 1)]
+        with mock.patch.object(post_to_facebook, 'confirm_publish', side_effect=confirm):
+            return post_to_facebook._post_pipelined(
+                self.context, 'a@example.com', posts, 0, acquire=acquire or self.acquire)
+
+    def test_every_published_listing_takes_one_token(self):
+        results = self.post(3)
+
+        self.assertEqual([r['success'] for r in results], [True, True, True])
+        self.assertEqual(len(self.acquired), 3)
+
+    def test_dropped_staged_listing_keeps_its_token(self):
+        # Listing 1 turns out to be logged out while listing 2 is staged
+        results = self.post(3, confirm=SessionExpiredError('Redirected to the login page'))
+
+        self.assertEqual([r['post_id'] for r in results], [1])
+        self.assertEqual(len(self.acquired), 1)
+        self.assertEqual(post_to_facebook.start_publish.call_count, 1)
+
+    def test_rate_limited_listing_is_not_published(self):
+        results = self.post(3, acquire=lambda email: self.acquire(email, allowed=1))
+
+        self.assertEqual([r['post_id'] for r in results], [1])
+        self.assertTrue(results[0]['success'])
+        self.assertEqual(post_to_facebook.start_publish.call_count, 1)
+
+
+class ManagerStatusTests(TestCase):
+    def test_status_queries_run_outside_the_worker_lock(self):
+        lock_free = []
+        snapshot = sequential_manager.queue.snapshot
+
+        def spy():
+            # The workers' Condition must be free while the database is read
+            lock_free.append(sequential_manager.lock.acquire(blocking=False))
+            if lock_free[-1]:
+                sequential_manager.lock.release()
+            return snapshot()
+
+        with mock.patch.object(sequential_manager.queue, 'snapshot', side_effect=spy):
+            status = sequential_manager.get_user_status('a@example.com')
+            sequential_manager.get_all_users_status()
+
+        self.assertEqual(lock_free, [True, True])
+        self.assertEqual(status['account_queue'], {'post': 0, 'renew': 0})
+        self.assertIn('total_posts_queued', status)
@@ -0,0 +1,335 @@
+"""
+Condition-based waits for automation pages
+==========================================
+
+Replaces fixed page.wait_for_timeout() sleeps. Every wait returns as soon
+as its condition is met:
+
+- wait_for_selector   → an element reaches a state (visible, attached...)
+- wait_for_dom_settle → no DOM mutations for a short quiet period
+- expect_dom_change   → the DOM changes after an action (e.g. a click)
+- wait_for_response   → a network response after an action (image upload,
+                        publish GraphQL mutation...)
+- watch_response / wait_for_watched_response
+                      → the same, split in two so other work can run
+                        between the action and the wait (pipelined posting)
+
+Each wait has a timeout and a fallback: when the condition is not met in
+time the wait sleeps `fallback_ms` (0 by default) and returns a falsy
+value instead of raising, so the flow degrades to the old fixed delay.
+
+StepTimer records how long each step of a flow actually took and which
+steps had to fall back.
+
+Timeouts can be tuned via settings.AUTOMATION_WAIT_TIMEOUTS (merged over
+DEFAULT_TIMEOUTS).
+"""
+
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUTS = {
+    'upload': 10000,        # image upload response
+    'dropdown': 2000,       # options of an opened dropdown
+    'settle': 1500,         # DOM settle after scroll / Next
+    'settle_quiet': 150,    # quiet period that counts as "settled"
+    'publish': 15000,       # publish mutation response
+    'page_ready': 8000,     # first meaningful element after navigation
+    'click_effect': 1000,   # DOM reaction to a click (renew buttons)
+}
+
+# Options rendered by an opened dropdown / listbox
+DROPDOWN_OPTIONS_SELECTOR = '[role="option"], [role="listbox"], [role="menuitemradio"]'
+
+# Friendly names (fb_api_req_friendly_name) that identify the publish call
+PUBLISH_MUTATION_HINTS = (
+    'MarketplaceComposerCreate',
+    'MarketplaceListingCreate',
+    'ListingCreateMutation',
+    'CreateListing',
+)
+
+_SETTLE_JS = """([quietMs, timeoutMs]) => new Promise(resolve => {
+    let quiet = null, hard = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quiet);
+        quiet = setTimeout(() => done(true), quietMs);
+    });
+    const done = (settled) => {
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(hard);
+        resolve(settled);
+    };
+    observer.observe(document.body, {childList: true, subtree: true});
+    quiet = setTimeout(() => done(true), quietMs);
+    hard = setTimeout(() => done(false), timeoutMs);
+})"""
+
+_ARM_MUTATION_JS = """(selector) => {
+    const root = (selector && document.querySelector(selector)) || document.body;
+    if (window.__fbbotObserver) window.__fbbotObserver.disconnect();
+    window.__fbbotMutated = false;
+    window.__fbbotObserver = new MutationObserver(() => {
+        window.__fbbotMutated = true;
+        window.__fbbotObserver.disconnect();
+    });
+    window.__fbbotObserver.observe(
+        root, {childList: true, subtree: true, attributes: true, characterData: true});
+}"""
+
+_MUTATED_JS = "() => window.__fbbotMutated === true"
+
+
+def get_timeout(name):
+    """Timeout (ms) for a named wait, settings override merged over defaults"""
+    timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, 'AUTOMATION_WAIT_TIMEOUTS', {})}
+    return timeouts[name]
+
+
+def is_upload_response(response):
+    """Response of the photo upload triggered by set_input_files()"""
+    return 'upload' in response.url and response.request.method == 'POST'
+
+
+def is_publish_response(response):
+    """Response of the GraphQL mutation that creates the listing"""
+    if '/api/graphql' not in response.url or response.request.method != 'POST':
+        return False
+    body = response.request.post_data or ''
+    return any(hint in body for hint in PUBLISH_MUTATION_HINTS)
+
+
+class StepTimer:
+    """
+    Records the real duration of each step of an automation flow
+
+    USAGE:
+        timer = StepTimer('post')
+        with timer.step('upload_image'):
+            ...
+            wait_for_response(page, action, is_upload_response, timer=timer)
+        timer.log_summary()
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        self.steps = []
+        self._current = None
+
+    @contextmanager
+    def step(self, name):
+        entry = {'step': name, 'duration_ms': 0, 'outcome': 'ok'}
+        previous = self._current
+        self._current = entry
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception:
+            entry['outcome'] = 'error'
+            raise
+        finally:
+            entry['duration_ms'] = round((time.perf_counter() - start) * 1000)
+            self.steps.append(entry)
+            self._current = previous
+
+    def record(self, name, duration_ms, outcome='ok'):
+        """Add a step measured elsewhere (e.g. a context shared by a batch)"""
+        self.steps.append({'step': name, 'duration_ms': round(duration_ms), 'outcome': outcome})
+
+    def fallback(self, reason):
+        """Mark the running step as having hit a wait timeout"""
+        if self._current is not None:
+            self._current['outcome'] = 'fallback'
+            self._current.setdefault('fallbacks', []).append(reason)
+
+    def total_ms(self):
+        return sum(entry['duration_ms'] for entry in self.steps)
+
+    def log_summary(self):
+        """Print one line with every step duration"""
+        if not self.steps:
+            return
+        parts = []
+        for entry in self.steps:
+            flag = '' if entry['outcome'] == 'ok' else f" ({entry['outcome']})"
+            parts.append(f"{entry['step']}={entry['duration_ms']}ms{flag}")
+        print(f"⏱️  {self.name} steps: {', '.join(parts)} | total {self.total_ms()}ms")
+
+
+def _timed_out(page, reason, fallback_ms, timer):
+    logger.debug("Wait fell back: %s", reason)
+    if timer:
+        timer.fallback(reason)
+    if fallback_ms:
+        page.wait_for_timeout(fallback_ms)
+
+
+def wait_for_selector(page, selector, state='visible', timeout=None, fallback_ms=0, timer=None):
+    """
+    Wait until `selector` reaches `state`
+
+    Args:
+        page: Playwright page
+        selector: Selector to wait for
+        state: 'visible', 'attached', 'hidden' or 'detached'
+        timeout: Max wait in ms (default: 'page_ready' timeout)
+        fallback_ms: Fixed delay used when the condition times out
+        timer: Optional StepTimer to mark the fallback on
+
+    Returns:
+        bool: True if the condition was met
+    """
+    timeout = timeout if timeout is not None else get_timeout('page_ready')
+    try:
+        page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        _timed_out(page, f"selector {selector!r} not {state}", fallback_ms, timer)
+        return False
+
+
+def wait_for_dom_settle(page, quiet_ms=None, timeout=None, fallback_ms=0, timer=None):
+    """
+    Wait until the DOM stops changing for `quiet_ms`
+
+    Args:
+        page: Playwright page
+        quiet_ms: Quiet period that counts as settled (default: 'settle_quiet')
+        timeout: Max wait in ms (default: 'settle' timeout)
+        fallback_ms: Fixed delay used when the page never settles
+        timer: Optional StepTimer to mark the fallback on
+
+    Returns:
+        bool: True if the DOM settled before the timeout
+    """
+    quiet_ms = quiet_ms if quiet_ms is not None else get_timeout('settle_quiet')
+    timeout = timeout if timeout is not None else get_timeout('settle')
+    try:
+        settled = page.evaluate(_SETTLE_JS, [quiet_ms, timeout])
+    except Exception:
+        # Navigation destroyed the execution context - page is changing anyway
+        settled = False
+    if not settled:
+        _timed_out(page, "DOM did not settle", fallback_ms, timer)
+    return bool(settled)
+
+
+def expect_dom_change(page, action, root_selector=None, timeout=None, fallback_ms=0, timer=None):
+    """
+    Run `action` and wait for the first DOM mutation it causes
+
+    Args:
+        page: Playwright page
+        action: Callable performing the interaction (e.g. a click)
+        root_selector: Only watch this subtree (default: whole body)
+        timeout: Max wait in ms (default: 'click_effect' timeout)
+        fallback_ms: Fixed delay used when nothing changes
+        timer: Optional StepTimer to mark the fallback on
+
+    Returns:
+        bool: True if the DOM changed before the timeout
+    """
+    timeout = timeout if timeout is not None else get_timeout('click_effect')
+    page.evaluate(_ARM_MUTATION_JS, root_selector)
+    action()
+    try:
+        page.wait_for_function(_MUTATED_JS, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        _timed_out(page, "no DOM change after action", fallback_ms, timer)
+        return False
+
+
+def wait_for_response(page, action, predicate, timeout=None, fallback_ms=0, timer=None):
+    """
+    Run `action` and wait for the network response it triggers
+
+    Errors raised by `action` itself are propagated; only a missing
+    response falls back.
+
+    Args:
+        page: Playwright page
+        action: Callable performing the interaction
+        predicate: Callable(response) -> bool, e.g. is_upload_response
+        timeout: Max wait in ms (default: 'upload' timeout)
+        fallback_ms: Fixed delay used when no matching response arrives
+        timer: Optional StepTimer to mark the fallback on
+
+    Returns:
+        Response or None
+    """
+    timeout = timeout if timeout is not None else get_timeout('upload')
+    acted = False
+    try:
+        with page.expect_response(predicate, timeout=timeout) as response_info:
+            action()
+            acted = True
+        return response_info.value
+    except PlaywrightTimeoutError:
+        if not acted:
+            raise
+        _timed_out(page, f"no response for {getattr(predicate, '__name__', 'predicate')}",
+                   fallback_ms, timer)
+        return None
+
+
+def watch_response(page, predicate):
+    """
+    Start collecting responses matching `predicate` without blocking
+
+    Call before the action that triggers the response; the page keeps
+    recording while other work runs (responses are delivered whenever
+    Playwright processes events, e.g. during calls on another page).
+
+    Returns:
+        dict: Watch for wait_for_watched_response()
+    """
+    watch = {'responses': [], 'predicate': predicate, 'started': time.perf_counter()}
+
+    def on_response(response):
+        if predicate(response):
+            watch['responses'].append(response)
+
+    watch['listener'] = on_response
+    page.on('response', on_response)
+    return watch
+
+
+def _watch_remaining_ms(watch, timeout):
+    return timeout - (time.perf_counter() - watch['started']) * 1000
+
+
+def wait_for_watched_response(page, watch, timeout=None, fallback_ms=0, timer=None):
+    """
+    First response seen by a watch_response() watch, waiting for it if needed
+
+    The timeout counts from when the watch started. The watch is stopped.
+
+    Returns:
+        Response or None
+    """
+    timeout = timeout if timeout is not None else get_timeout('upload')
+    try:
+        if not watch['responses']:
+            remaining = _watch_remaining_ms(watch, timeout)
+            if remaining > 0:
+                try:
+                    response = page.wait_for_event(
+                        'response', predicate=watch['predicate'], timeout=remaining)
+                    if response not in watch['responses']:
+                        watch['responses'].append(response)
+                except PlaywrightTimeoutError:
+                    pass
+        if watch['responses']:
+            return watch['responses'][0]
+        _timed_out(page, f"no response for {getattr(watch['predicate'], '__name__', 'predicate')}",
+                   fallback_ms, timer)
+        return None
+    finally:
+        page.remove_listener('response', watch['listener'])
@@ -296,9 +296,134 @@ AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_DAY = int(
 AUTOMATION_MAX_ACCOUNTS_PER_IP = int(
     os.environ.get('MAX_ACCOUNTS_PER_IP', '5'))
 
+# Per-account rate limiter (token bucket; POST_DELAY_MIN is the minimum gap
+# between two listings of one account, MAX_POSTS_PER_ACCOUNT the daily cap)
+AUTOMATION_RATE_LIMIT_ENABLED = os.environ.get(
+    'RATE_LIMIT', 'True') == 'True'
+AUTOMATION_MAX_POSTS_PER_ACCOUNT_PER_HOUR = int(os.environ.get(
+    'MAX_POSTS_PER_ACCOUNT_PER_HOUR', '5'))  # Also the bucket refill rate (0 = no hourly cap)
+AUTOMATION_ACCOUNT_BURST = int(os.environ.get(
+    'ACCOUNT_BURST', '3'))  # Listings an idle account may post back to back
+AUTOMATION_RATE_LIMIT_MAX_WAIT = int(os.environ.get(
+    'RATE_LIMIT_MAX_WAIT', '900'))  # post_to_marketplace waits at most this long for a free account
+# Retry policy per failure type, merged over automation.retry_policy.DEFAULT_POLICIES, e.g.
+# {'network_error': {'max_retries': 8}, 'rate_limit': {'base_delay': 12 * 3600}}
+AUTOMATION_RETRY_POLICIES = {}
+AUTOMATION_CIRCUIT_BREAKER_ENABLED = os.environ.get(
+    'CIRCUIT_BREAKER_ENABLED', 'True') == 'True'  # Stop working an account that keeps failing
+AUTOMATION_BREAKER_FAILURE_THRESHOLD = int(os.environ.get(
+    'BREAKER_FAILURE_THRESHOLD', '3'))  # Consecutive network / selector failures before it trips
+AUTOMATION_BREAKER_COOLDOWN_SECONDS = int(os.environ.get(
+    'BREAKER_COOLDOWN_SECONDS', '900'))  # First cool-down before a probe (doubles per trip)
+AUTOMATION_BREAKER_MAX_COOLDOWN_SECONDS = int(os.environ.get(
+    'BREAKER_MAX_COOLDOWN_SECONDS', '21600'))
+
 # Session Settings
+AUTOMATION_SESSION_WRITE_BACK = os.environ.get(
+    'SESSION_WRITE_BACK', 'True') == 'True'  # Save refreshed cookies after successful runs
 AUTOMATION_SESSION_TIMEOUT = int(os.environ.get(
     'SESSION_TIMEOUT', '3600'))  # 1 hour in seconds
+AUTOMATION_SESSION_EXPIRING_DAYS = int(os.environ.get(
+    'SESSION_EXPIRING_DAYS', '3'))  # Health check warns when auth cookies expire this soon
+AUTOMATION_SESSION_PROBE_HTTP = os.environ.get(
+    'SESSION_PROBE_HTTP', 'False') == 'True'  # Plain-HTTP session probe by default (?probe=1 forces it)
+AUTOMATION_SESSION_PROBE_BASE_URL = os.environ.get(
+    'SESSION_PROBE_BASE_URL', 'https://www.facebook.com')
+AUTOMATION_SESSION_PROBE_TIMEOUT = 10  # seconds
+AUTOMATION_SESSION_PROBE_CACHE_SECONDS = int(os.environ.get(
+    'SESSION_PROBE_CACHE_SECONDS', '300'))
+
+# Browser Pool (warm Chromium reused across posts/renewals)
+AUTOMATION_BROWSER_MAX_USES = int(os.environ.get(
+    'BROWSER_MAX_USES', '25'))  # Recycle a browser after this many contexts
+AUTOMATION_BROWSER_IDLE_TIMEOUT = int(os.environ.get(
+    'BROWSER_IDLE_TIMEOUT', '60'))  # Seconds a queue keeps its browser warm when idle
+AUTOMATION_MAX_BATCH_SIZE = int(os.environ.get(
+    'MAX_BATCH_SIZE', '10'))  # Max listings posted per account in one browser session
+AUTOMATION_PIPELINED_POSTING = os.environ.get(
+    'PIPELINED_POSTING', 'False') == 'True'  # Stage the next listing on a 2nd page while one publishes
+AUTOMATION_PROGRESS_FLUSH_SECONDS = float(os.environ.get(
+    'PROGRESS_FLUSH_SECONDS', '1'))  # PostingJob progress is written at most this often (0 = every change)
+
+# Queue workers (one operation per account at a time, accounts run in parallel)
+AUTOMATION_POST_WORKERS = int(os.environ.get(
+    'POST_WORKERS', '2'))  # Worker threads draining the global POST queue
+AUTOMATION_RENEW_WORKERS = int(os.environ.get(
+    'RENEW_WORKERS', '1'))  # Worker threads draining the global RENEW queue
+AUTOMATION_QUEUE_LEASE_SECONDS = int(os.environ.get(
+    'QUEUE_LEASE_SECONDS', '900'))  # Claimed operation returns to the queue if its worker goes silent this long
+AUTOMATION_QUEUE_MAX_ATTEMPTS = int(os.environ.get(
+    'QUEUE_MAX_ATTEMPTS', '3'))  # Give up on an operation after this many expired leases
+AUTOMATION_QUEUE_POLL_INTERVAL = 5  # seconds - idle workers re-check the database queue
+AUTOMATION_JOB_WORKERS = int(os.environ.get(
+    'JOB_WORKERS', '2'))  # Worker threads running queued posting jobs (one account each)
+AUTOMATION_EMBEDDED_WORKERS = os.environ.get(
+    'EMBEDDED_WORKERS', 'False') == 'True'  # True: web process runs workers + scheduler (single-process dev)
+
+# Fair scheduling across users (weighted fair queuing over the global queues)
+AUTOMATION_PRIORITY_WEIGHTS = {
+    'interactive': 8,  # single listings / small jobs a user is waiting for
+    'normal': 4,
+    'bulk': 1,  # large backlogs
+}
+AUTOMATION_USER_WEIGHTS = {}  # username -> weight (default 1), e.g. {'agency': 3}
+AUTOMATION_INTERACTIVE_MAX_POSTS = int(os.environ.get(
+    'INTERACTIVE_MAX_POSTS', '3'))  # Jobs up to this size are scheduled as interactive
+AUTOMATION_ESTIMATED_SECONDS_PER_LISTING = 60  # Wait estimate until real run times exist
+AUTOMATION_PLANNER_SAMPLE_LISTINGS = 200  # Recent listings whose step timings feed job duration estimates
+
+# Admission control (work refused with HTTP 429 + Retry-After when a queue is full)
+AUTOMATION_QUEUE_MAX_BACKLOG = int(os.environ.get(
+    'QUEUE_MAX_BACKLOG', '1000'))  # Queued + running listings per queue (0 = unlimited)
+AUTOMATION_QUEUE_MAX_BACKLOG_PER_USER = int(os.environ.get(
+    'QUEUE_MAX_BACKLOG_PER_USER', '200'))  # Same, per user (0 = unlimited)
+
+# Scheduled posts (heap scheduler queues posts when scheduled_time arrives)
+AUTOMATION_POST_SCHEDULER = os.environ.get(
+    'POST_SCHEDULER', 'True') == 'True'  # Run it in the worker daemon / embedded web process
+AUTOMATION_SCHEDULER_HORIZON_SECONDS = 86400  # Posts due within this window are kept in memory
+AUTOMATION_SCHEDULER_RELOAD_SECONDS = int(os.environ.get(
+    'SCHEDULER_RELOAD_SECONDS', '60'))  # Window reload - picks up posts saved by other processes
+
+# Page automation (network filter, waits, learned selectors)
+AUTOMATION_NETWORK_FILTER_ENABLED = os.environ.get(
+    'NETWORK_FILTER', 'True') == 'True'  # Skip video/fonts/trackers on automation pages
+AUTOMATION_NETWORK_PROFILE = {}  # Overrides merged over network_filter.DEFAULT_PROFILE
+AUTOMATION_WAIT_TIMEOUTS = {}  # Overrides merged over waits.DEFAULT_TIMEOUTS (ms)
+AUTOMATION_SELECTOR_PACKS_FILE = os.environ.get(
+    'SELECTOR_PACKS_FILE', os.path.join(BASE_DIR, 'automation', 'selector_packs.json'))
+AUTOMATION_SELECTOR_CACHE_FILE = os.environ.get(
+    'SELECTOR_CACHE_FILE', os.path.join(BASE_DIR, 'selector_cache.json'))
+AUTOMATION_SELECTOR_STALE_DAYS = int(os.environ.get(
+    'SELECTOR_STALE_DAYS', '14'))  # Demote selector winners not seen for this long
+AUTOMATION_SELECTOR_MAX_MISSES = int(os.environ.get(
+    'SELECTOR_MAX_MISSES', '3'))  # Demote a selector after this many misses in a row
+AUTOMATION_SELECTOR_SAVE_SECONDS = int(os.environ.get(
+    'SELECTOR_SAVE_SECONDS', '30'))  # Write learned selector stats this often (and after each batch)
+
+# Image preparation before upload (auto-orient, strip metadata, resize, JPEG)
+AUTOMATION_IMAGE_CACHE_DIR = os.path.join(MEDIA_ROOT, 'prepared_images')
+AUTOMATION_IMAGE_MAX_SIDE = int(os.environ.get(
+    'IMAGE_MAX_SIDE', '2048'))  # Longest side in px (Marketplace shows no more)
+AUTOMATION_IMAGE_JPEG_QUALITY = int(os.environ.get(
+    'IMAGE_JPEG_QUALITY', '85'))
+
+# Failure screenshots (viewport JPEG, written in the background to ErrorLog.screenshot)
+AUTOMATION_SCREENSHOT_FULL_PAGE = os.environ.get(
+    'SCREENSHOT_FULL_PAGE', 'False') == 'True'
+AUTOMATION_SCREENSHOT_QUALITY = int(os.environ.get(
+    'SCREENSHOT_QUALITY', '60'))
+AUTOMATION_SCREENSHOT_MAX_KB = int(os.environ.get(
+    'SCREENSHOT_MAX_KB', '250'))  # Re-encoded / downscaled above this size
+AUTOMATION_SCREENSHOT_TIMEOUT = 3000  # ms - give up rather than stall a failing run
+
+# Step timing profiler (StepTiming rows, /api/analytics/step-timings/)
+AUTOMATION_STEP_TIMING_ENABLED = os.environ.get(
+    'STEP_TIMING', 'True') == 'True'
+
+# Threaded account runner (python manage.py post_to_marketplace --engine threaded)
+AUTOMATION_ACCOUNT_CONCURRENCY = int(os.environ.get(
+    'ACCOUNT_CONCURRENCY', '3'))  # Accounts run at the same time by the threaded runner
 
 # SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
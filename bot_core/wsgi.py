@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bot_core.settings')
 
 application = get_wsgi_application()
+
+# Single-process development (EMBEDDED_WORKERS=True): queue scheduled
+# posts from this process - otherwise the worker daemon does it
+from django.conf import settings  # noqa: E402
+
+if settings.AUTOMATION_EMBEDDED_WORKERS and settings.AUTOMATION_POST_SCHEDULER:
+    from automation.post_scheduler import post_scheduler
+    post_scheduler.start()
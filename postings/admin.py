@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MarketplacePost, PostAnalytics, PostingJob, ErrorLog
+from .models import MarketplacePost, PostAnalytics, PostingJob, ErrorLog, StepTiming
 from django.urls import reverse
 
 # admin.site.register(MarketplacePost)
@@ -78,3 +78,25 @@ class ErrorLogAdmin(admin.ModelAdmin):
         if request.user.is_superuser:
             return qs
         return qs.filter(post__account__user=request.user)
+
+
+@admin.register(StepTiming)
+class StepTimingAdmin(admin.ModelAdmin):
+    list_display = ['step', 'operation', 'account_email',
+                    'duration_ms', 'outcome', 'created_at']
+    list_filter = ['operation', 'step', 'outcome', 'created_at']
+    search_fields = ['account_email', 'step']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['job', 'post', 'account_email', 'operation',
+                       'step', 'duration_ms', 'outcome', 'created_at']
+
+    def get_queryset(self, request):
+        """Filter step timings by user - superusers see all, staff see only their own"""
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(job__user=request.user)
+
+    def has_add_permission(self, request):
+        # Timings are only written by the automation
+        return False
@@ -24,6 +24,16 @@ urlpatterns = [
          realtime_views.posting_status_stream, name='status_stream'),
     path('posts/job-status/<str:job_id>/',
          realtime_views.get_posting_job_status, name='job_status'),
+    # Job control - pause / cancel / resume (from the first unposted listing)
+    path('posts/jobs/<str:job_id>/pause/',
+         realtime_views.pause_posting_job, name='pause_job'),
+    path('posts/jobs/<str:job_id>/cancel/',
+         realtime_views.cancel_posting_job, name='cancel_job'),
+    path('posts/jobs/<str:job_id>/resume/',
+         realtime_views.resume_posting_job, name='resume_job'),
+    # Fair queue position / estimated wait of the current user
+    path('posts/queue-status/',
+         realtime_views.get_queue_status, name='queue_status'),
 
     # Error logging
     path('posts/error-logs/',
@@ -31,4 +41,8 @@ urlpatterns = [
 
     # Analytics
     path('analytics/', api_views.AnalyticsView.as_view(), name='analytics'),
+
+    # Step timing profiler (percentiles per step / account)
+    path('analytics/step-timings/', api_views.StepTimingStatsView.as_view(),
+         name='step_timings'),
 ]
@@ -16,6 +16,18 @@ import io
 from django.utils import timezone
 
 
+def queue_full_response(error):
+    """
+    429 + Retry-After for work refused by queue admission control
+
+    Work larger than the limit itself can never be admitted - 413 instead.
+    """
+    if error.retry_after is None:
+        return Response(error.describe(), status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return Response(error.describe(), status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': str(error.retry_after)})
+
+
 class MarketplacePostListCreateView(generics.ListCreateAPIView):
     """List all marketplace posts or create a new one"""
     serializer_class = MarketplacePostSerializer
@@ -347,10 +359,11 @@ class StartPostingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        """Trigger posting process for selected post IDs"""
-        import subprocess
-        import sys
-        import uuid
+        """Queue a posting job for selected post IDs (run by the automation workers)"""
+        from .job_planner import plan_posting_job
+        from .job_runner import enqueue_posting_job
+        from automation.sequential_browser_manager import sequential_manager
+        from automation.operation_queue import QueueFullError
 
         post_ids = request.data.get('post_ids', [])
 
@@ -361,104 +374,52 @@ class StartPostingView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Filter only pending posts from user's accounts - optimized with select_related
+        # Filter only pending posts from user's accounts
         try:
-            pending_posts = MarketplacePost.objects.select_related('account').filter(
+            pending_posts = MarketplacePost.objects.filter(
                 id__in=post_ids,
                 posted=False,
                 account__user=request.user  # Only allow posting from user's own accounts
             )
 
-            if not pending_posts.exists():
+            # One read of the selection: per-account plan + duration estimate
+            # (accounts run in parallel on the job workers)
+            plan = plan_posting_job(
+                pending_posts, parallel=sequential_manager.max_workers['post_job'])
+
+            if not plan.total_posts:
                 return Response(
                     {'error': 'No pending posts found with the provided IDs'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            pending_count = pending_posts.count()
-
-            # Generate unique job ID for tracking
-            job_id = str(uuid.uuid4())
-
-            # Start the posting script in background
-            # This runs the Django management command asynchronously
-            python_executable = sys.executable
-
-            # Get the project root directory (where manage.py is)
-            # __file__ is in postings/api_views.py
-            # Go up 2 levels: postings/ -> fb_marketplace_bot/
-            project_root = os.path.dirname(os.path.dirname(__file__))
-            manage_py_path = os.path.join(project_root, 'manage.py')
-
-            # Build command to run the management command
-            # Passing post IDs, job ID, and user ID as comma-separated string
-            post_ids_str = ','.join(map(str, post_ids))
-            command = [
-                python_executable,
-                manage_py_path,
-                'post_to_marketplace',
-                '--post-ids',
-                post_ids_str,
-                '--job-id',
-                job_id,
-                '--user-id',
-                str(request.user.id)
-            ]
-
-            # Create log files for debugging
-            log_dir = os.path.join(project_root, 'logs')
-            os.makedirs(log_dir, exist_ok=True)
-            log_file = os.path.join(log_dir, 'posting_process.log')
-
-            # Write initial log entry
-            try:
-                with open(log_file, 'a', encoding='utf-8') as log:
-                    log.write(
-                        f"\n\n=== Starting posting process at {timezone.now()} ===\n")
-                    log.write(f"Project root: {project_root}\n")
-                    log.write(f"manage.py path: {manage_py_path}\n")
-                    log.write(f"Command: {' '.join(command)}\n")
-                    log.write(f"Post IDs: {post_ids_str}\n\n")
-            except Exception as e:
-                print(f"Error writing to log file: {e}")
-
-            # Start subprocess in background with output logging
-            # Open log file separately to avoid context manager closing it
-            log_handle = open(log_file, 'a', encoding='utf-8')
-
-            # Set environment variables for UTF-8 encoding (fixes emoji/unicode issues on Windows)
-            env = os.environ.copy()
-            env['PYTHONIOENCODING'] = 'utf-8'
-
-            # In production (headless), don't create console window
-            # In development, show console for debugging
-            creation_flags = 0
-            if os.name == 'nt':  # Windows
-                # Only show console window if not in headless mode
-                headless = os.getenv('PLAYWRIGHT_HEADLESS',
-                                     'true').lower() == 'true'
-                if not headless:
-                    creation_flags = subprocess.CREATE_NEW_CONSOLE
-
-            subprocess.Popen(
-                command,
-                stdout=log_handle,
-                stderr=log_handle,
-                cwd=project_root,
-                env=env,
-                creationflags=creation_flags
-            )
+            # Refuse the job while the queue / the user's backlog is full
+            with sequential_manager.admission('post_job', request.user, plan.total_posts):
+                # Queued per account (fair-scheduled against other users' work); run_automation_workers
+                # (or this process's embedded workers) picks them up
+                posting_job = enqueue_posting_job(pending_posts, user=request.user, plan=plan)
+            sequential_manager.notify_queued('post_job')
+
+            queue = sequential_manager.get_queue_position(request.user).get('post_job')
+            queue_wait = queue['estimated_wait_seconds'] if queue else 0
 
             return Response({
                 'success': True,
-                'message': f'Started posting process for {pending_count} pending post(s)',
-                'job_id': job_id,
-                'pending_count': pending_count,
+                'message': f'Queued posting job for {posting_job.total_posts} pending post(s)',
+                'job_id': posting_job.job_id,
+                'pending_count': posting_job.total_posts,
                 'total_selected': len(post_ids),
-                'log_file': log_file,
-                'status_stream_url': f'/api/posts/status-stream/{job_id}/'
+                'status_stream_url': f'/api/posts/status-stream/{posting_job.job_id}/',
+                'queue': queue,
+                # ETA = wait for the work ahead in the queue + the job's own duration
+                'estimated_duration_seconds': round(plan.estimated_seconds),
+                'eta': plan.eta(wait=queue_wait).isoformat(),
+                'plan': plan.describe(),
             }, status=status.HTTP_200_OK)
 
+        except QueueFullError as e:
+            return queue_full_response(e)
+
         except Exception as e:
             return Response(
                 {'error': f'Error starting posting process: {str(e)}'},
@@ -559,3 +520,44 @@ class AnalyticsView(APIView):
             'by_account': list(account_stats),
             'daily_breakdown': daily_stats,
         })
+
+
+class StepTimingStatsView(APIView):
+    """Per-step duration percentiles of automation runs (overall and per account)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .models import StepTiming
+        from .profiling import summarize_step_timings
+        from datetime import timedelta
+
+        operation = request.query_params.get('operation', 'post')  # post, renew
+        account_email = request.query_params.get('account', None)
+        job_id = request.query_params.get('job_id', None)
+
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response({'error': 'days must be an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Only this user's accounts
+        user_emails = FacebookAccount.objects.filter(
+            user=request.user).values_list('email', flat=True)
+
+        timings = StepTiming.objects.filter(
+            operation=operation,
+            account_email__in=list(user_emails),
+            created_at__gte=timezone.now() - timedelta(days=days),
+        )
+
+        if account_email:
+            timings = timings.filter(account_email=account_email)
+        if job_id:
+            timings = timings.filter(job__job_id=job_id)
+
+        return Response({
+            'operation': operation,
+            'days': days,
+            **summarize_step_timings(timings),
+        })
@@ -0,0 +1,205 @@
+"""
+Posting job planner
+===================
+
+Plans a posting job before anything runs:
+
+- streams the selected posts once (iterator()) into an execution plan:
+  each account's listings in posting order, and the accounts each product
+  (title) goes to
+- estimates how long each account needs from historical per-listing
+  durations (summed StepTiming rows of recent listings - the account's
+  own when it has enough history) and the account's rate limits (current
+  wait, minimum gap, hourly / daily caps)
+- estimates the job's duration with the accounts spread over the workers
+  that run them in parallel
+
+post_to_marketplace --dry-run prints the plan without opening a browser;
+StartPostingView returns the ETA with the queued job.
+
+USAGE:
+    plan = plan_posting_job(posts, parallel=2)
+    plan.posts_by_account   -> FacebookAccount -> [MarketplacePost]
+    plan.estimated_seconds  -> job duration once it starts
+    plan.describe()         -> dict for the API / dry run
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from automation.operation_queue import operation_queue
+from automation.rate_limiter import rate_limiter, HOUR, DAY
+from .models import StepTiming
+
+# Listings an account needs in its history before its own average is used
+MIN_ACCOUNT_SAMPLES = 3
+
+
+class PostingPlan:
+    """
+    Execution plan and duration estimate of a posting job
+    """
+
+    def __init__(self, parallel=1):
+        # Accounts running at the same time (workers / threaded runner concurrency)
+        self.parallel = max(parallel or 1, 1)
+        # FacebookAccount -> posts in posting order (like group_posts_by_account)
+        self.posts_by_account = defaultdict(list)
+        # Product title -> emails of the accounts it is posted to
+        self.accounts_by_product = defaultdict(list)
+        # email -> estimated seconds per listing / for all its listings
+        self.seconds_per_listing = {}
+        self.account_seconds = {}
+        self.estimated_seconds = 0
+
+    @property
+    def total_posts(self):
+        return sum(len(posts) for posts in self.posts_by_account.values())
+
+    @property
+    def post_ids(self):
+        return [post.id for posts in self.posts_by_account.values() for post in posts]
+
+    def add(self, post):
+        """Add one post (posts arrive in posting order)"""
+        self.posts_by_account[post.account].append(post)
+        if post.account.email not in self.accounts_by_product[post.title]:
+            self.accounts_by_product[post.title].append(post.account.email)
+
+    def eta(self, wait=0):
+        """Expected completion time if the job starts after `wait` seconds"""
+        return timezone.now() + timedelta(seconds=wait + self.estimated_seconds)
+
+    def describe(self):
+        """Plan summary for the API / dry run"""
+        return {
+            'total_posts': self.total_posts,
+            'total_accounts': len(self.posts_by_account),
+            'total_products': len(self.accounts_by_product),
+            'parallel': self.parallel,
+            'estimated_seconds': round(self.estimated_seconds),
+            'accounts': [{
+                'email': account.email,
+                'posts': len(posts),
+                'seconds_per_listing': round(self.seconds_per_listing[account.email]),
+                'estimated_seconds': round(self.account_seconds[account.email]),
+                'rate_limit_wait_seconds': round(rate_limiter.wait_seconds(account.email)),
+            } for account, posts in self.posts_by_account.items()],
+            'products': {title: emails for title, emails in self.accounts_by_product.items()},
+        }
+
+    def print_summary(self, show_posts=False):
+        """Print the plan the way post_to_marketplace reports progress"""
+        print(f"\n{'='*60}")
+        print(f"🗺️ PLAN: {self.total_posts} post(s), {len(self.accounts_by_product)} product(s), "
+              f"{len(self.posts_by_account)} account(s), {self.parallel} at a time")
+        print(f"{'='*60}")
+        for account, posts in self.posts_by_account.items():
+            email = account.email
+            print(f"📧 {email}: {len(posts)} post(s) x ~{self.seconds_per_listing[email]:.0f}s "
+                  f"-> ~{self.account_seconds[email] / 60:.1f} min")
+            if show_posts:
+                for post in posts:
+                    print(f"      • #{post.id} {post.title}")
+        print(f"⏱️ Estimated duration: ~{self.estimated_seconds / 60:.1f} min "
+              f"(done around {self.eta():%Y-%m-%d %H:%M} UTC)")
+        print(f"{'='*60}\n")
+
+
+def listing_durations(sample=None):
+    """
+    Average seconds per listing from the step timings of recent listings
+
+    Args:
+        sample: Number of recent listings used (default AUTOMATION_PLANNER_SAMPLE_LISTINGS)
+
+    Returns:
+        tuple: (email -> average for accounts with enough history,
+                overall average or None without history)
+    """
+    sample = sample or getattr(settings, 'AUTOMATION_PLANNER_SAMPLE_LISTINGS', 200)
+    rows = StepTiming.objects.filter(operation='post', post__isnull=False).values(
+        'post_id', 'account_email'
+    ).annotate(ms=Sum('duration_ms'), last=Max('created_at')).order_by('-last')[:sample]
+
+    by_account = defaultdict(list)
+    for row in rows:
+        by_account[row['account_email']].append(row['ms'] / 1000)
+
+    durations = [seconds for values in by_account.values() for seconds in values]
+    overall = sum(durations) / len(durations) if durations else None
+    return ({email: sum(values) / len(values) for email, values in by_account.items()
+             if len(values) >= MIN_ACCOUNT_SAMPLES}, overall)
+
+
+def estimate_account_seconds(email, listings, per_listing):
+    """
+    Seconds an account needs for `listings` under its rate limits
+
+    Listings start back to back (minimum gap apart) while the account's
+    token bucket lasts, then at the hourly rate; each daily cap adds a day.
+    """
+    if not listings:
+        return 0.0
+    if not rate_limiter.enabled:
+        return listings * per_listing
+
+    wait = rate_limiter.wait_seconds(email)
+    burst = min(max(rate_limiter.available(email), 1), listings)
+    spacing = max(rate_limiter.min_gap, per_listing)
+    paced = max(spacing, HOUR / rate_limiter.hourly_cap) if rate_limiter.hourly_cap > 0 else spacing
+
+    seconds = wait + (burst - 1) * spacing + (listings - burst) * paced + per_listing
+    if rate_limiter.daily_cap > 0:
+        seconds += (listings - 1) // rate_limiter.daily_cap * DAY
+    return seconds
+
+
+def spread_seconds(durations, parallel):
+    """Duration of independent account runs on `parallel` slots (longest first)"""
+    slots = [0.0] * max(parallel, 1)
+    for seconds in sorted(durations, reverse=True):
+        slots[slots.index(min(slots))] += seconds
+    return max(slots)
+
+
+def plan_posting_job(posts, parallel=1):
+    """
+    Build the execution plan of a posting job
+
+    Reads the selection once (iterator()) - nothing is launched.
+
+    Args:
+        posts: MarketplacePost queryset (unposted listings)
+        parallel: Accounts run at the same time (1 for the sync command,
+                  the threaded runner concurrency or the number of job workers)
+
+    Returns:
+        PostingPlan
+    """
+    plan = PostingPlan(parallel)
+    # Spacing between an account's listings is the rate limiter's job
+    for post in posts.select_related('account').order_by('scheduled_time', 'id').iterator(
+            chunk_size=500):
+        plan.add(post)
+
+    if not plan.posts_by_account:
+        return plan
+
+    by_account, overall = listing_durations()
+    if overall is None:
+        # No step timings yet - run times of queued jobs or the settings default
+        overall = operation_queue.seconds_per_unit('post_job')
+
+    for account, account_posts in plan.posts_by_account.items():
+        email = account.email
+        per_listing = by_account.get(email, overall)
+        plan.seconds_per_listing[email] = per_listing
+        plan.account_seconds[email] = estimate_account_seconds(
+            email, len(account_posts), per_listing)
+
+    plan.estimated_seconds = spread_seconds(plan.account_seconds.values(), plan.parallel)
+    return plan
@@ -0,0 +1,117 @@
+"""
+PostingJob progress tracker
+===========================
+
+Keeps a job's progress (completed / failed counters, current listing) in
+memory and writes it to the PostingJob row at most once per
+AUTOMATION_PROGRESS_FLUSH_SECONDS instead of on every change:
+
+- one UPDATE with only the fields that changed
+- counters are written as F() increments of the unflushed delta, so
+  several workers (threads / processes) running chunks of the same job
+  never overwrite each other's progress
+- a change the throttle held back is written by a timer when the interval
+  ends, so the status stream sees it within about a second even if no
+  other listing finishes meanwhile
+- flush() writes everything now - called on state transitions (pause /
+  cancel, end of a queue operation, finish)
+
+USAGE:
+    progress = JobProgress(posting_job)
+    progress.add(completed=1)
+    progress.set_current(post)
+    progress.flush()
+"""
+
+import threading
+import time
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+import logging
+
+from .models import PostingJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """
+    Throttled, delta-based progress writes for one PostingJob
+    """
+
+    def __init__(self, posting_job, interval=None):
+        self.job_pk = posting_job.pk
+        self.interval = interval if interval is not None else getattr(
+            settings, 'AUTOMATION_PROGRESS_FLUSH_SECONDS', 1.0)
+
+        # Changes not written yet
+        self._completed = 0
+        self._failed = 0
+        self._current = None  # (post id, title)
+
+        self._last_flush = 0.0
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def add(self, completed=0, failed=0):
+        """Count listing outcomes"""
+        with self._lock:
+            self._completed += completed
+            self._failed += failed
+        self._changed()
+
+    def set_current(self, post):
+        """Point the job at the listing being posted"""
+        with self._lock:
+            self._current = (post.id, post.title)
+        self._changed()
+
+    def _changed(self):
+        with self._lock:
+            wait = self._last_flush + self.interval - time.monotonic()
+            if wait <= 0:
+                self.flush()
+            elif self._timer is None:
+                # Write the held-back change when the interval ends
+                self._timer = threading.Timer(wait, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning("Could not write progress of PostingJob %s: %s", self.job_pk, e)
+        finally:
+            # The timer thread opened its own database connection
+            connections.close_all()
+
+    def flush(self):
+        """
+        Write the pending changes now
+
+        Returns:
+            bool: True if anything was written
+        """
+        with self._lock:
+            if self._timer is not None:
+                if self._timer is not threading.current_thread():
+                    self._timer.cancel()
+                self._timer = None
+
+            fields = {}
+            if self._completed:
+                fields['completed_posts'] = F('completed_posts') + self._completed
+            if self._failed:
+                fields['failed_posts'] = F('failed_posts') + self._failed
+            if self._current is not None:
+                fields['current_post_id'], fields['current_post_title'] = self._current
+
+            if fields:
+                # Cleared only once written - a failed write is retried with the next flush
+                PostingJob.objects.filter(pk=self.job_pk).update(**fields)
+                self._completed = self._failed = 0
+                self._current = None
+            self._last_flush = time.monotonic()
+            return bool(fields)
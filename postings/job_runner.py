@@ -0,0 +1,678 @@
+"""
+Posting job runner
+==================
+
+Runs the listings of a PostingJob and records the outcome of each one
+(MarketplacePost.posted, ErrorLog + screenshot, step timings, job
+counters). Used by:
+
+- run_automation_workers - StartPostingView enqueues 'post_job'
+  operations per account (enqueue_posting_job) and the long-running
+  workers run them with run_job_operation()
+- post_to_marketplace - the one-shot command runs a whole job in-process
+
+Job progress (counters, current listing) goes through JobProgress
+(job_progress): written at most once per AUTOMATION_PROGRESS_FLUSH_SECONDS
+as F() increments, since several workers may post different accounts of
+the same job at the same time.
+
+Every listing asks the account rate limiter first; listings it holds back
+are collected in runner.deferred (requeued by the workers, retried later
+by post_to_marketplace) instead of making the process sleep.
+
+Failures are classified by exception type (automation.exceptions). When
+the runner works for the queue (retry=True), retry_policy decides per
+type: transient failures are held in runner.held for an automatic retry
+or park instead of being counted as failed.
+
+Outcomes feed the account circuit breaker: an account whose breaker is
+open is skipped without a browser (deferred for the queue, fast-failed by
+post_to_marketplace), and a batch stops as soon as its breaker trips.
+
+Jobs can be paused / cancelled (pause_job / cancel_job): queued chunks are
+cancelled right away and running ones stop before their next listing.
+resume_job() queues the job's still unposted listings again.
+
+Parked chunks wait for their account to be fixed. Once nothing else of the
+job is queued / running, finish_parked_job() counts their listings as failed
+so the job finishes; resuming it tries them again.
+"""
+
+import os
+import traceback
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+from automation import retry_policy
+from automation.circuit_breaker import CircuitOpenError, circuit_breaker
+from automation.exceptions import ACCOUNT_ERRORS, classify_exception
+from automation.failure_screenshots import screenshot_writer
+from automation.operation_queue import operation_queue
+from automation.post_to_facebook import post_batch
+from automation.rate_limiter import rate_limiter
+from .job_progress import JobProgress
+from .models import MarketplacePost, PostingJob, ErrorLog
+from .profiling import record_step_timings
+
+logger = logging.getLogger(__name__)
+
+
+def classify_error(error):
+    """Map an exception (or error message) to an ErrorLog.error_type"""
+    return classify_exception(error)
+
+
+def group_posts_by_account(posts):
+    """
+    Group posts so each account posts all its listings in ONE browser session
+
+    Returns:
+        dict: FacebookAccount -> list of MarketplacePost
+    """
+    posts_by_account = defaultdict(list)
+    # Spacing between an account's listings is the rate limiter's job
+    for post in posts.select_related('account').order_by('scheduled_time', 'id').iterator():
+        posts_by_account[post.account].append(post)
+    return posts_by_account
+
+
+def job_priority(total_posts):
+    """Small jobs are interactive, large ones a bulk backlog"""
+    interactive_max = getattr(settings, 'AUTOMATION_INTERACTIVE_MAX_POSTS', 3)
+    return 'interactive' if total_posts <= interactive_max else 'bulk'
+
+
+def enqueue_posting_job(posts, user=None, job_id=None, priority=None, plan=None):
+    """
+    Create a PostingJob and queue its 'post_job' operations
+
+    Each account's listings are split into chunks of AUTOMATION_MAX_BATCH_SIZE
+    so a large job gives way to other users' work between chunks. Posts
+    already due are marked queued for their scheduled_time, so the post
+    scheduler doesn't queue them again.
+
+    Args:
+        posts: MarketplacePost queryset (unposted listings)
+        user: User who started the job
+        job_id: Optional job id (default: new uuid4)
+        priority: Scheduling class (default: job_priority() of the job size)
+        plan: PostingPlan of `posts` already built by the caller (job_planner)
+
+    Returns:
+        PostingJob
+    """
+    posts_by_account = plan.posts_by_account if plan else group_posts_by_account(posts)
+    total_posts = sum(len(account_posts) for account_posts in posts_by_account.values())
+    priority = priority or job_priority(total_posts)
+
+    posting_job = PostingJob.objects.create(
+        job_id=job_id or str(uuid.uuid4()),
+        user=user,
+        status='queued',
+        total_posts=total_posts,
+        post_ids=[post.id for account_posts in posts_by_account.values()
+                  for post in account_posts],
+    )
+
+    MarketplacePost.objects.filter(
+        id__in=posting_job.post_ids, scheduled_time__lte=timezone.now()
+    ).update(queued_for=F('scheduled_time'))
+
+    operations = _enqueue_chunks(posting_job, posts_by_account, priority)
+    print(f"📥 Queued job {posting_job.job_id}: {posting_job.total_posts} post(s) "
+          f"across {len(posts_by_account)} account(s) in {operations} operation(s) [{priority}]")
+    return posting_job
+
+
+def _enqueue_chunks(posting_job, posts_by_account, priority):
+    """Queue one 'post_job' operation per AUTOMATION_MAX_BATCH_SIZE listings of an account"""
+    chunk_size = max(getattr(settings, 'AUTOMATION_MAX_BATCH_SIZE', 10), 1)
+    operations = 0
+    for account, account_posts in posts_by_account.items():
+        for start in range(0, len(account_posts), chunk_size):
+            chunk = account_posts[start:start + chunk_size]
+            operation_queue.enqueue('post_job', account.email, {
+                'job_id': posting_job.job_id,
+                'post_ids': [post.id for post in chunk],
+            }, user=posting_job.user or account.user, priority=priority, cost=len(chunk))
+            operations += 1
+    return operations
+
+
+def pause_job(posting_job):
+    """
+    Pause a queued / running job
+
+    Its queued chunks are cancelled; running chunks stop before their next
+    listing. resume_job() continues with the listings not posted yet.
+
+    Returns:
+        bool: True if the job was paused
+    """
+    paused = PostingJob.objects.filter(
+        pk=posting_job.pk, status__in=['queued', 'running']
+    ).update(status='paused')
+    if paused:
+        cancelled = operation_queue.cancel_job_operations(posting_job.job_id)
+        print(f"⏸️ Paused job {posting_job.job_id} ({cancelled} queued operation(s) withdrawn)")
+    posting_job.refresh_from_db()
+    return bool(paused)
+
+
+def cancel_job(posting_job):
+    """
+    Cancel a job for good (queued, running or paused)
+
+    Returns:
+        bool: True if the job was cancelled
+    """
+    cancelled = PostingJob.objects.filter(
+        pk=posting_job.pk, status__in=['queued', 'running', 'paused']
+    ).update(status='cancelled', completed_at=timezone.now(),
+             error_message='Cancelled by user')
+    if cancelled:
+        withdrawn = operation_queue.cancel_job_operations(posting_job.job_id)
+        print(f"🛑 Cancelled job {posting_job.job_id} ({withdrawn} queued operation(s) withdrawn)")
+    posting_job.refresh_from_db()
+    return bool(cancelled)
+
+
+def is_resumable(posting_job):
+    """
+    Paused / failed jobs, and queued / running jobs whose work disappeared
+    (e.g. the post_to_marketplace process was killed) or is all parked
+
+    A chunk still queued or finishing its current listing blocks the
+    resume, so no listing is queued twice.
+    """
+    return (posting_job.status in ('paused', 'failed', 'queued', 'running')
+            and not operation_queue.job_has_active_operations(posting_job.job_id))
+
+
+def resume_job(posting_job, priority=None):
+    """
+    Queue the job's listings that are not posted yet (same job id)
+
+    Progress restarts from the listings already posted; listings that
+    failed before are tried again. Parked chunks of the job are withdrawn,
+    their listings are queued with the rest.
+
+    Args:
+        posting_job: Resumable PostingJob (is_resumable())
+        priority: Scheduling class (default: job_priority() of what is left)
+
+    Returns:
+        int: Number of listings queued (0 if the job had nothing left and
+             was finished)
+    """
+    operation_queue.cancel_job_operations(posting_job.job_id)
+
+    selection = MarketplacePost.objects.filter(id__in=posting_job.post_ids)
+    posted = selection.filter(posted=True).count()
+    posts_by_account = group_posts_by_account(selection.filter(posted=False))
+    remaining = sum(len(account_posts) for account_posts in posts_by_account.values())
+
+    PostingJob.objects.filter(pk=posting_job.pk).update(
+        status='queued' if remaining else 'completed',
+        total_posts=posted + remaining, completed_posts=posted, failed_posts=0,
+        error_message=None, completed_at=None if remaining else timezone.now())
+
+    if remaining:
+        operations = _enqueue_chunks(posting_job, posts_by_account,
+                                     priority or job_priority(remaining))
+        print(f"▶️ Resumed job {posting_job.job_id}: {remaining} post(s) left "
+              f"({posted} already posted) in {operations} operation(s)")
+    posting_job.refresh_from_db()
+    return remaining
+
+
+def finish_parked_job(job_id):
+    """
+    Finish a job whose chunks left are all parked
+
+    Called after each of the job's chunks is settled. The parked listings
+    count as failed (resume_job() tries them again).
+
+    Args:
+        job_id: PostingJob.job_id
+
+    Returns:
+        bool: True if this call finished the job
+    """
+    post_ids = operation_queue.fail_parked_job_operations(job_id)
+    posting_job = PostingJob.objects.filter(job_id=job_id).first()
+    if not post_ids or not posting_job:
+        return False
+
+    print(f"🅿️ Job {job_id}: {len(post_ids)} parked post(s) counted as failed - "
+          f"resume the job once the account is fixed")
+    runner = PostingJobRunner(posting_job)
+    runner.count(failed=len(post_ids))
+    return runner.finish()
+
+
+def run_job_operation(operation, pool=None, heartbeat=None):
+    """
+    Run one queued 'post_job' operation (a chunk of one account's listings)
+
+    Args:
+        operation: AutomationOperation with payload {'job_id', 'post_ids'}
+        pool: BrowserPool of the calling worker thread
+        heartbeat: Optional callable run after each listing (lease renewal)
+
+    Returns:
+        dict: posted (number of listings posted), deferred (post ids the
+              rate limiter held back), held ([{'post_ids', 'decision',
+              'error'}] to retry / park), halted (job paused / cancelled) -
+              settled by OperationQueue.settle_post_job()
+    """
+    posting_job = PostingJob.objects.get(job_id=operation.payload['job_id'])
+    PostingJob.objects.filter(pk=posting_job.pk, status='queued').update(status='running')
+
+    post_ids = operation.payload['post_ids']
+    posts = MarketplacePost.objects.filter(id__in=post_ids, account__email=operation.account_email)
+
+    runner = PostingJobRunner(posting_job, pool=pool, heartbeat=heartbeat,
+                              retry=True, retries=operation.retries)
+    if runner.check_control():
+        # Paused / cancelled after this chunk was claimed
+        runner.progress.flush()
+        return {'posted': 0, 'deferred': [], 'held': [], 'halted': True}
+
+    # Posts deleted since the job was queued can't run - count them as failed.
+    # Posts already posted (an earlier attempt of this operation) were counted then.
+    missing = len(set(post_ids) - set(posts.values_list('id', flat=True)))
+    if missing:
+        runner.count(failed=missing)
+
+    for account, account_posts in group_posts_by_account(posts.filter(posted=False)).items():
+        batch = runner.build_batch(account_posts)
+        if batch:
+            runner.run_account_batch(account, account_posts, batch)
+
+    # The operation is settled next - its progress must be visible first
+    runner.progress.flush()
+    if runner.halted:
+        return {'posted': runner.completed, 'deferred': [], 'held': [], 'halted': True}
+
+    deferred = [post.id for account_posts in runner.deferred.values() for post in account_posts]
+    held = runner.take_held()
+    if not deferred and not held:
+        runner.finish()
+    return {'posted': runner.completed, 'deferred': deferred, 'held': held}
+
+
+class PostingJobRunner:
+    """
+    Posts listings for a PostingJob and records every outcome
+    """
+
+    def __init__(self, posting_job, pool=None, heartbeat=None, retry=False, retries=0,
+                 pipelined=None):
+        self.posting_job = posting_job
+        self.pool = pool
+        self.heartbeat = heartbeat
+        # Stage the next listing while one publishes (None: AUTOMATION_PIPELINED_POSTING)
+        self.pipelined = pipelined
+        # Apply retry_policy (queue runs) and how often these listings were retried
+        self.retry = retry
+        self.retries = retries
+        # Outcomes recorded by this runner (the job row holds the totals)
+        self.completed = 0
+        self.failed = 0
+        # Throttled writes of the job's counters / current listing
+        self.progress = JobProgress(posting_job)
+        # Account -> posts the rate limiter held back
+        self.deferred = {}
+        # (post, decision, error) waiting for a retry / park, and the
+        # decision of an account error that stopped an account's batch
+        self.held = []
+        self.stopped = {}
+        # Accounts whose breaker tripped during this run
+        self.tripped = set()
+        # The job was paused / cancelled - stop before the next listing
+        self.halted = False
+
+    def count(self, completed=0, failed=0):
+        """Add to the job's progress counters"""
+        self.completed += completed
+        self.failed += failed
+        self.progress.add(completed=completed, failed=failed)
+
+    def check_control(self):
+        """
+        Re-read the job status; True if it was paused / cancelled
+
+        Checked before each account and after each listing (acquire() then
+        stops the batch without touching the ORM).
+        """
+        if not self.halted:
+            status = PostingJob.objects.filter(
+                pk=self.posting_job.pk).values_list('status', flat=True).first()
+            if status in ('paused', 'cancelled', None):
+                self.halted = True
+                self.progress.flush()
+                print(f"⏹️ Job {self.posting_job.job_id} {status or 'deleted'} - "
+                      f"stopping before the next listing")
+        return self.halted
+
+    def set_current(self, post):
+        """Point the job at the listing being posted"""
+        self.progress.set_current(post)
+
+    def build_batch(self, account_posts):
+        """Turn an account's posts into post_batch() dicts (drops posts without image)"""
+        batch = []
+        for post in list(account_posts):
+            if not post.image:
+                self.record_failure(post, 'Post has no image to upload', None, attempted=False)
+                account_posts.remove(post)
+                continue
+            batch.append({
+                'post_id': post.id,
+                'title': post.title,
+                'description': post.description,
+                'price': float(post.price),
+                'image_path': os.path.abspath(post.image.path),
+            })
+        return batch
+
+    def make_result_handler(self, account_posts, processed_ids):
+        """Build the per-listing callback that records progress for one account"""
+        posts_by_id = {post.id: post for post in account_posts}
+
+        def on_result(result):
+            post = posts_by_id[result['post_id']]
+            processed_ids.add(post.id)
+            if result['success']:
+                self.record_success(post)
+            else:
+                self.record_failure(
+                    post, result['error'], result['traceback'],
+                    screenshot=result.get('screenshot'),
+                    exception=result.get('exception'))
+
+            record_step_timings(result.get('steps'), 'post', post.account.email,
+                                job=self.posting_job, post=post)
+
+            # Point the job at the next listing of this account
+            next_posts = account_posts[account_posts.index(post) + 1:]
+            if next_posts:
+                self.set_current(next_posts[0])
+
+            if self.heartbeat:
+                self.heartbeat()
+            self.check_control()
+
+        return on_result
+
+    def defer(self, account, posts):
+        """Keep listings the rate limiter held back for a later run"""
+        if posts:
+            self.deferred.setdefault(account, []).extend(posts)
+
+    def hold(self, post, decision, error):
+        """Keep a failed listing for an automatic retry / park"""
+        self.held.append((post, decision, error))
+
+    def take_held(self):
+        """
+        Held listings grouped by decision, then cleared
+
+        Returns:
+            list: [{'post_ids', 'decision', 'error'}]
+        """
+        groups = {}
+        for post, decision, error in self.held:
+            key = (decision['action'], decision['error_type'], decision['delay'])
+            group = groups.setdefault(key, {'post_ids': [], 'decision': decision, 'error': error})
+            group['post_ids'].append(post.id)
+        self.held = []
+        return list(groups.values())
+
+    def settle_unprocessed(self, account, posts):
+        """
+        Listings a batch never got to: they follow the account error that
+        stopped it (park / cool-down, or fail outside the queue), otherwise
+        the rate limiter held them. A paused / cancelled job leaves them
+        for resume_job().
+        """
+        if self.halted:
+            return
+        stopped = self.stopped.pop(account.email, None)
+        if stopped and posts:
+            decision, error = stopped
+            for post in posts:
+                if self.retry and decision['action'] != retry_policy.GIVE_UP:
+                    self.hold(post, decision, error)
+                else:
+                    self.record_failure(post, error, None, attempted=False, exception=CircuitOpenError(
+                        error, error_type=decision['error_type']))
+        else:
+            self.defer(account, posts)
+
+    def acquire(self, email):
+        """
+        post_batch() acquire hook: stop an account whose breaker tripped,
+        otherwise ask the rate limiter
+        """
+        return (not self.halted and email not in self.tripped
+                and rate_limiter.try_acquire(email))
+
+    def circuit_open(self, account, account_posts):
+        """
+        True if the account's circuit breaker keeps it from running
+
+        Its posts are deferred for the queue or fast-failed (one-shot run)
+        without opening a browser.
+        """
+        if circuit_breaker.allow(account.email):
+            return False
+        if self.retry:
+            self.defer(account, account_posts)
+        else:
+            error = circuit_breaker.open_error(account.email)
+            print(f"🔌 Skipping {len(account_posts)} post(s) for {account.email}: {error}")
+            for post in account_posts:
+                self.record_failure(post, str(error), None, exception=error, attempted=False)
+        return True
+
+    def take_deferred(self):
+        """
+        Rebuild batches for the held-back listings and clear the list
+
+        Returns:
+            list: (account, account_posts, batch) tuples
+        """
+        deferred, self.deferred = self.deferred, {}
+        account_batches = []
+        for account, account_posts in deferred.items():
+            batch = self.build_batch(account_posts)
+            if batch:
+                account_batches.append((account, account_posts, batch))
+        return account_batches
+
+    def run_account_batch(self, account, account_posts, batch):
+        """Post all listings of one account in a single browser session"""
+        processed_ids = set()
+
+        if self.check_control() or self.circuit_open(account, account_posts):
+            return
+        if not rate_limiter.allows(account.email):
+            # Don't open a browser for an account that has to wait
+            self.defer(account, account_posts)
+            return
+
+        # Show the first listing as current before the browser opens
+        self.set_current(account_posts[0])
+
+        try:
+            post_batch(
+                email=account.email,
+                posts=batch,
+                pool=self.pool,
+                on_result=self.make_result_handler(
+                    account_posts, processed_ids),
+                acquire=self.acquire,
+                pipelined=self.pipelined
+            )
+        except Exception as e:
+            # Batch aborted (e.g. missing session or browser crash) -
+            # every listing that did not run yet counts as failed
+            stack_trace = traceback.format_exc()
+            for post in account_posts:
+                if post.id not in processed_ids:
+                    self.record_failure(post, str(e), stack_trace, exception=e)
+        else:
+            # Stopped early by the rate limiter or an account error
+            self.settle_unprocessed(account, [post for post in account_posts
+                                              if post.id not in processed_ids])
+
+    def run_threaded(self, account_batches, concurrency):
+        """Post for all accounts concurrently with the threaded account runner"""
+        from automation.account_runner import ThreadedAccountRunner
+
+        if self.check_control():
+            return
+
+        account_runner = ThreadedAccountRunner(concurrency=concurrency, pipelined=self.pipelined)
+        processed_ids = set()
+        handlers = {}
+        batches = {}
+        ready = []
+        for account, account_posts, batch in account_batches:
+            if self.circuit_open(account, account_posts):
+                continue
+            if not rate_limiter.allows(account.email):
+                # Don't take a worker for an account that has to wait
+                self.defer(account, account_posts)
+                continue
+            handler = self.make_result_handler(account_posts, processed_ids)
+            handlers.update({post.id: handler for post in account_posts})
+            batches[account.email] = batch
+            ready.append((account, account_posts))
+
+        if not batches:
+            return
+
+        def on_result(result):
+            handlers[result['post_id']](result)
+
+        print(
+            f"⚡ Account runner: {len(batches)} account(s), {account_runner.concurrency} at a time")
+        try:
+            account_runner.run_post_batches(batches, on_result=on_result,
+                                            acquire=self.acquire)
+        except Exception as e:
+            # Runner failed (e.g. its worker threads could not start)
+            stack_trace = traceback.format_exc()
+            for account, account_posts in ready:
+                for post in account_posts:
+                    if post.id not in processed_ids:
+                        self.record_failure(post, str(e), stack_trace, exception=e)
+        else:
+            for account, account_posts in ready:
+                self.settle_unprocessed(account, [post for post in account_posts
+                                                  if post.id not in processed_ids])
+
+    def record_success(self, post):
+        """Mark a post as published and update job progress"""
+        # save() (not update()) - the signals record the 'posted' analytics
+        # event the rate limiter counts and drop the post from the scheduler
+        post.posted = True
+        post.save(update_fields=['posted', 'updated_at'])
+
+        self.count(completed=1)
+        circuit_breaker.record_success(post.account.email)
+
+        print(
+            f'      ✅ Successfully posted "{post.title}" to {post.account.email}')
+
+    def record_failure(self, post, error_message, stack_trace, screenshot=None, exception=None,
+                       attempted=True):
+        """
+        Log a failed post and update job progress
+
+        Queue runs hold the listing for a retry / park when retry_policy
+        allows one; only a final failure counts as failed.
+
+        Args:
+            post: MarketplacePost that failed
+            error_message: Error text
+            stack_trace: Formatted traceback (or None)
+            screenshot: PNG bytes of the page when it failed
+            exception: The exception raised, used to classify the failure
+            attempted: False if the listing never ran (skipped / held back) -
+                       it then does not count against the circuit breaker
+        """
+        error_type = classify_error(exception if exception is not None else error_message)
+        print(
+            f'      ❌ Failed to post "{post.title}" to {post.account.email} '
+            f'({error_type}): {error_message}')
+
+        # Update post status (listings that ran were not posted yet)
+        if post.posted:
+            post.posted = False
+            post.save(update_fields=['posted', 'updated_at'])
+
+        # Log detailed error
+        error_log = ErrorLog.objects.create(
+            post=post,
+            error_type=error_type,
+            error_message=str(error_message),
+            stack_trace=stack_trace
+        )
+
+        # Screenshot is written and attached to the log in the background
+        screenshot_writer.submit(screenshot, job_id=self.posting_job.job_id,
+                                 post_id=post.id, error_log_id=error_log.id)
+
+        decision = retry_policy.decide(error_type, self.retries)
+        email = post.account.email
+        if isinstance(exception, ACCOUNT_ERRORS):
+            # The rest of the account's batch follows the same decision
+            self.stopped[email] = (decision, str(error_message))
+        if attempted and circuit_breaker.record_failure(email, error_type, error_message):
+            # Breaker tripped - acquire() stops the batch before the next listing
+            self.tripped.add(email)
+            self.stopped.setdefault(email, (decision, str(error_message)))
+
+        if self.retry and decision['action'] != retry_policy.GIVE_UP:
+            print(f'      🔁 {decision["action"]} ({error_type}) - '
+                  f'"{post.title}" stays queued')
+            self.hold(post, decision, str(error_message))
+        else:
+            self.count(failed=1)
+
+    def finish(self, force=False):
+        """
+        Mark the job completed / failed once every listing has an outcome
+
+        Args:
+            force: Finish even if some listings never reported (one-shot command)
+
+        Returns:
+            bool: True if this call finished the job
+        """
+        self.progress.flush()
+        job = PostingJob.objects.get(pk=self.posting_job.pk)
+        if not force and job.completed_posts + job.failed_posts < job.total_posts:
+            # Other accounts of this job are still queued / running
+            return False
+
+        failed = job.failed_posts
+        finished = PostingJob.objects.filter(
+            pk=job.pk, status__in=['queued', 'running']
+        ).update(
+            status='completed' if failed == 0 else 'failed',
+            completed_at=timezone.now(),
+            error_message=f"{failed} posts failed" if failed > 0 else None,
+        )
+        self.posting_job.refresh_from_db()
+        if finished:
+            print(f"🏁 Job {job.job_id} finished: {job.completed_posts} posted, {failed} failed")
+        return bool(finished)
@@ -1,12 +1,14 @@
 from django.core.management.base import BaseCommand
-from postings.models import MarketplacePost, PostingJob, ErrorLog
-from automation.post_to_facebook import login_and_post
+from postings.models import MarketplacePost, PostingJob
+from postings.job_runner import PostingJobRunner
+from postings.job_planner import plan_posting_job
+from automation.browser_pool import browser_pool
+from automation.rate_limiter import rate_limiter
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import QuerySet, Manager
-from django.core.files.base import ContentFile
-import os
+from django.db.models import F, QuerySet, Manager
+import time
 import uuid
-import traceback
 
 
 class Command(BaseCommand):
@@ -32,6 +34,33 @@ class Command(BaseCommand):
             help='User ID who initiated the posting job',
             dest='user_id'
         )
+        parser.add_argument(
+            '--engine',
+            choices=['sync', 'threaded'],
+            default='sync',
+            help='sync: one account at a time, threaded: several accounts concurrently',
+            dest='engine'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Accounts driven at the same time by the threaded runner',
+            dest='concurrency'
+        )
+        parser.add_argument(
+            '--pipelined',
+            action='store_true',
+            default=None,
+            help='Stage the next listing on a second page while the current one publishes '
+                 '(default: AUTOMATION_PIPELINED_POSTING)',
+            dest='pipelined'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the execution plan and estimated duration without posting',
+            dest='dry_run'
+        )
 
     def handle(self, *args, **options):
         print("Checking for posts to publish...")
@@ -62,7 +91,13 @@ class Command(BaseCommand):
                 posted=False
             )
 
-        total_posts = posts.count()
+        # Read the selection once into a per-account plan with a duration estimate
+        parallel = 1
+        if options.get('engine') == 'threaded':
+            parallel = options.get('concurrency') or getattr(settings, 'AUTOMATION_ACCOUNT_CONCURRENCY', 3)
+        plan = plan_posting_job(posts, parallel=parallel)
+
+        total_posts = plan.total_posts
         print(f"Found {total_posts} posts to publish")
 
         if total_posts == 0:
@@ -72,13 +107,20 @@ class Command(BaseCommand):
             print("3. Set posted=False")
             return
 
-        # Create posting job for tracking
+        if options.get('dry_run'):
+            plan.print_summary(show_posts=True)
+            print("Dry run - nothing was posted")
+            return
+
+        # Create posting job for tracking (post_ids lets resume_job() pick
+        # up the unposted listings if this run is paused or killed)
         posting_job_data = {
             'job_id': job_id,
             'status': 'running',
             'total_posts': total_posts,
             'completed_posts': 0,
-            'failed_posts': 0
+            'failed_posts': 0,
+            'post_ids': plan.post_ids,
         }
 
         # Add user if provided
@@ -91,126 +133,93 @@ class Command(BaseCommand):
                 print(f"Warning: User with ID {user_id} not found")
 
         posting_job = PostingJob.objects.create(**posting_job_data)
+        # The post scheduler leaves the due posts of this run alone
+        MarketplacePost.objects.filter(
+            id__in=plan.post_ids, scheduled_time__lte=timezone.now()
+        ).update(queued_for=F('scheduled_time'))
 
-        completed = 0
-        failed = 0
+        runner = PostingJobRunner(posting_job, pipelined=options.get('pipelined'))
 
-        # Group posts by title (product) to post same product across all accounts
-        from collections import defaultdict
-        posts_by_title = defaultdict(list)
-        for post in posts.select_related('account'):
-            posts_by_title[post.title].append(post)
+        # Posts are grouped by account so each account posts all its listings
+        # in ONE browser session (post_batch) instead of one launch per post
+        posts_by_account = plan.posts_by_account
 
-        total_products = len(posts_by_title)
-        total_accounts = len(set(post.account for post in posts))
-        current_product_num = 0
+        total_accounts = len(posts_by_account)
+        total_products = len(plan.accounts_by_product)
 
         print(f"\n{'='*60}")
         print(
             f"Starting posting process for {total_products} product(s) across {total_accounts} account(s)")
-        print(f"Strategy: Post each product to all accounts before moving to next product")
-        print(f"This creates natural delays between posts to the same account")
+        print(f"Strategy: Post all listings of an account in a single browser session")
         print(f"{'='*60}\n")
-
-        # Process posts grouped by product (title)
-        for product_title, product_posts in posts_by_title.items():
-            current_product_num += 1
-            product_accounts_count = len(product_posts)
-
-            print(f"\n{'='*60}")
-            print(
-                f"📦 PRODUCT {current_product_num}/{total_products}: {product_title}")
-            print(f"{'='*60}")
-            print(
-                f"Posting '{product_title}' to {product_accounts_count} account(s)")
-            print(f"{'='*60}\n")
-
-            product_completed = 0
-            product_failed = 0
-
-            for idx, post in enumerate(product_posts, 1):
-                try:
+        plan.print_summary()
+
+        # Build one batch per account (posts without images fail up front)
+        account_batches = []
+        for account, account_posts in posts_by_account.items():
+            batch = runner.build_batch(account_posts)
+            if batch:
+                account_batches.append((account, account_posts, batch))
+
+        max_wait = getattr(settings, 'AUTOMATION_RATE_LIMIT_MAX_WAIT', 900)
+
+        # Accounts the rate limiter holds back are skipped (never slept on)
+        # and retried once every eligible account had its turn
+        while account_batches:
+            if options.get('engine') == 'threaded':
+                runner.run_threaded(account_batches, options.get('concurrency'))
+            else:
+                for current_account_num, (account, account_posts, batch) in enumerate(account_batches, 1):
+                    if runner.check_control():
+                        break
+
+                    print(f"\n{'='*60}")
                     print(
-                        f"\n   └─ Account {idx}/{product_accounts_count}: {post.account.email}")
-
-                    # Update job status
-                    posting_job.current_post_id = post.id
-                    posting_job.current_post_title = post.title
-                    posting_job.save()
-
-                    # Get the absolute path of the image
-                    image_path = os.path.abspath(post.image.path)
-                    print(f"      Image: {image_path}")
-
-                    # Post to Facebook (direct call with job tracking)
-                    login_and_post(
-                        email=post.account.email,
-                        title=post.title,
-                        description=post.description,
-                        price=float(post.price),
-                        image_path=image_path
-                    )
-
-                    # Mark as posted
-                    post.posted = True
-                    post.save()
-
-                    completed += 1
-                    product_completed += 1
-                    posting_job.completed_posts = completed
-                    posting_job.save()
-
-                    print(
-                        f'      ✅ Successfully posted "{post.title}" to {post.account.email}')
-
-                except Exception as e:
-                    print(
-                        f'      ❌ Failed to post "{post.title}" to {post.account.email}: {str(e)}')
-
-                    # Update post status
-                    post.posted = False
-                    post.save()
-
-                    # Determine error type
-                    error_type = 'unknown'
-                    error_str = str(e).lower()
-                    if 'session' in error_str or 'cookie' in error_str or 'login' in error_str:
-                        error_type = 'session_expired'
-                    elif 'network' in error_str or 'connection' in error_str:
-                        error_type = 'network_error'
-                    elif 'captcha' in error_str:
-                        error_type = 'captcha'
-                    elif 'rate' in error_str or 'limit' in error_str:
-                        error_type = 'rate_limit'
-
-                    # Log detailed error
-                    ErrorLog.objects.create(
-                        post=post,
-                        error_type=error_type,
-                        error_message=str(e),
-                        stack_trace=traceback.format_exc()
-                    )
-
-                    failed += 1
-                    product_failed += 1
-                    posting_job.failed_posts = failed
-                    posting_job.save()
-
-            # Print product completion summary
-            print(f"\n{'='*60}")
-            print(f"✅ Completed product: {product_title}")
-            print(
-                f"Product Summary: {product_completed} successful, {product_failed} failed")
-            print(f"{'='*60}\n")
-
-        # Mark job as complete
-        posting_job.status = 'completed' if failed == 0 else 'failed'
-        posting_job.completed_at = timezone.now()
-        posting_job.error_message = f"{failed} posts failed" if failed > 0 else None
-        posting_job.save()
+                        f"📧 ACCOUNT {current_account_num}/{len(account_batches)}: {account.email}")
+                    print(f"{'='*60}")
+                    print(f"Posts to publish: {len(account_posts)}")
+                    print(f"{'='*60}\n")
+
+                    runner.run_account_batch(account, account_posts, batch)
+
+                    print(f"\n{'='*60}")
+                    print(f"✅ Posting completed for account: {account.email}")
+                    print(f"{'='*60}\n")
+
+            account_batches = runner.take_deferred()
+            if not account_batches or runner.halted:
+                break
+
+            wait = min(rate_limiter.wait_seconds(account.email)
+                       for account, _, _ in account_batches)
+            if wait > max_wait:
+                # Leave them unposted for a later run
+                for account, account_posts, _ in account_batches:
+                    next_slot = rate_limiter.wait_seconds(account.email)
+                    for post in account_posts:
+                        runner.record_failure(
+                            post, f"Rate limit reached for {account.email} - "
+                                  f"next slot in {next_slot / 60:.0f} min", None,
+                            attempted=False)
+                break
+
+            print(f"⏳ All remaining accounts are rate limited - next slot in {wait:.0f}s")
+            time.sleep(wait)
+
+        completed = runner.completed
+        failed = runner.failed
+
+        # Close the pooled browser used by this command
+        browser_pool.release()
+
+        # Mark job as complete (a paused / cancelled job keeps its status)
+        runner.finish(force=True)
 
         print(f"\n{'='*60}")
-        print(f"🎉 ALL POSTING COMPLETED!")
+        if runner.halted:
+            print(f"⏹️ POSTING STOPPED - job {runner.posting_job.status}")
+        else:
+            print(f"🎉 ALL POSTING COMPLETED!")
         print(f"{'='*60}")
         print(f"Total Products Processed: {total_products}")
         print(f"Total Accounts: {total_accounts}")
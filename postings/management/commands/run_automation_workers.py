@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from automation.post_scheduler import post_scheduler
+from automation.sequential_browser_manager import sequential_manager
+import signal
+import threading
+
+
+class Command(BaseCommand):
+    help = 'Long-running worker that drains the posting / renewal queues with warm browsers'
+
+    def add_arguments(self, parser):
+        """Add command line arguments"""
+        parser.add_argument(
+            '--post-workers',
+            type=int,
+            help='Worker threads for single queued listings (default: AUTOMATION_POST_WORKERS)',
+            dest='post_workers'
+        )
+        parser.add_argument(
+            '--renew-workers',
+            type=int,
+            help='Worker threads for renewals (default: AUTOMATION_RENEW_WORKERS)',
+            dest='renew_workers'
+        )
+        parser.add_argument(
+            '--job-workers',
+            type=int,
+            help='Worker threads for posting jobs (default: AUTOMATION_JOB_WORKERS)',
+            dest='job_workers'
+        )
+        parser.add_argument(
+            '--no-scheduler',
+            action='store_true',
+            help='Do not queue scheduled posts from this process',
+            dest='no_scheduler'
+        )
+
+    def handle(self, *args, **options):
+        for queue_type, option in (('post', 'post_workers'),
+                                   ('renew', 'renew_workers'),
+                                   ('post_job', 'job_workers')):
+            if options.get(option):
+                sequential_manager.max_workers[queue_type] = options[option]
+
+        stop_event = threading.Event()
+
+        def request_stop(signum, frame):
+            print(f"\n🛑 Received signal {signum} - finishing current operations...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        scheduler = (not options.get('no_scheduler') and
+                     getattr(settings, 'AUTOMATION_POST_SCHEDULER', True))
+
+        workers = sequential_manager.max_workers
+        print(f"\n{'='*60}")
+        print("🧵 Automation workers running")
+        print(f"   POST: {workers['post']} | RENEW: {workers['renew']} | JOBS: {workers['post_job']}")
+        print(f"   Scheduled posts: {'queued by this process' if scheduler else 'off'}")
+        print("   Press Ctrl+C to stop (queued work stays in the database)")
+        print(f"{'='*60}\n")
+
+        if scheduler:
+            post_scheduler.start()
+
+        # Blocks until a stop signal; returns after busy workers finished
+        sequential_manager.serve(stop_event)
+
+        if scheduler:
+            post_scheduler.stop()
+
+        print("👋 Automation workers stopped")
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postings', '0004_postingjob_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StepTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_email', models.EmailField(max_length=254)),
+                ('operation', models.CharField(choices=[('post', 'Post Listing'), ('renew', 'Renew Listings')], max_length=20)),
+                ('step', models.CharField(max_length=50)),
+                ('duration_ms', models.PositiveIntegerField()),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('fallback', 'Wait Fell Back'), ('error', 'Error')], default='ok', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='step_timings', to='postings.postingjob')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='step_timings', to='postings.marketplacepost')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['operation', 'created_at'], name='timing_op_time_idx'), models.Index(fields=['account_email', 'created_at'], name='timing_account_time_idx')],
+            },
+        ),
+    ]
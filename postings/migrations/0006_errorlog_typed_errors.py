@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postings', '0005_steptiming'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='errorlog',
+            name='error_type',
+            field=models.CharField(choices=[('session_expired', 'Session Expired'), ('network_error', 'Network Error'), ('captcha', 'CAPTCHA Required'), ('rate_limit', 'Rate Limited'), ('selector_not_found', 'Selector Not Found'), ('publish_unconfirmed', 'Publish Unconfirmed'), ('validation_error', 'Validation Error'), ('unknown', 'Unknown Error')], default='unknown', max_length=50),
+        ),
+    ]
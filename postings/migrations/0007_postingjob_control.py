@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postings', '0006_errorlog_typed_errors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postingjob',
+            name='post_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='postingjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20),
+        ),
+    ]
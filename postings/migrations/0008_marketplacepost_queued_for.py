@@ -0,0 +1,44 @@
+# Generated by Django 5.2.2 on 2026-10-17 05:20
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def mark_queued_posts(apps, schema_editor):
+    """
+    Posts the scheduler already handled keep being skipped: due posts in
+    active posting jobs and posts that failed after they were due.
+    """
+    MarketplacePost = apps.get_model('postings', 'MarketplacePost')
+    AutomationOperation = apps.get_model('automation', 'AutomationOperation')
+
+    post_ids = set()
+    for payload in AutomationOperation.objects.filter(
+            operation_type='post_job', status__in=('queued', 'running', 'parked')
+    ).values_list('payload', flat=True):
+        post_ids.update(payload.get('post_ids', []))
+
+    MarketplacePost.objects.filter(
+        id__in=post_ids, posted=False, scheduled_time__lte=timezone.now()
+    ).update(queued_for=F('scheduled_time'))
+    MarketplacePost.objects.filter(
+        posted=False, error_logs__created_at__gte=F('scheduled_time')
+    ).update(queued_for=F('scheduled_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postings', '0007_postingjob_control'),
+        ('automation', '0006_operation_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketplacepost',
+            name='queued_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_queued_posts, migrations.RunPython.noop),
+    ]
@@ -54,6 +54,9 @@ class MarketplacePost(models.Model):
     image = models.ImageField(upload_to='posts/', blank=True)
     scheduled_time = models.DateTimeField()
     posted = models.BooleanField(default=False)
+    # scheduled_time the post was queued for once due (claimed with a
+    # conditional UPDATE - a due post is queued once per scheduled_time)
+    queued_for = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -73,12 +76,20 @@ class MarketplacePost(models.Model):
 
 
 class PostingJob(models.Model):
-    """Track posting job progress for real-time updates"""
+    """
+    Track posting job progress for real-time updates
+
+    A job can be paused / cancelled while it runs (workers stop between
+    listings) and a paused or interrupted job resumed from its unposted
+    listings (postings.job_runner.pause_job / cancel_job / resume_job).
+    """
     STATUS_CHOICES = [
         ('queued', 'Queued'),
         ('running', 'Running'),
+        ('paused', 'Paused'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     ]
 
     job_id = models.CharField(max_length=100, unique=True)
@@ -93,6 +104,8 @@ class PostingJob(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default='queued')
     total_posts = models.IntegerField()
+    # Selected MarketplacePost ids (resume picks the unposted ones)
+    post_ids = models.JSONField(default=list, blank=True)
     completed_posts = models.IntegerField(default=0)
     failed_posts = models.IntegerField(default=0)
     current_post_id = models.IntegerField(null=True, blank=True)
@@ -115,6 +128,8 @@ class ErrorLog(models.Model):
         ('network_error', 'Network Error'),
         ('captcha', 'CAPTCHA Required'),
         ('rate_limit', 'Rate Limited'),
+        ('selector_not_found', 'Selector Not Found'),
+        ('publish_unconfirmed', 'Publish Unconfirmed'),
         ('validation_error', 'Validation Error'),
         ('unknown', 'Unknown Error'),
     ]
@@ -134,3 +149,42 @@ class ErrorLog(models.Model):
 
     def __str__(self):
         return f"Error for {self.post.title} - {self.error_type}"
+
+
+class StepTiming(models.Model):
+    """Wall-clock duration of one automation step (where the time goes)"""
+    OPERATION_CHOICES = [
+        ('post', 'Post Listing'),
+        ('renew', 'Renew Listings'),
+    ]
+    OUTCOME_CHOICES = [
+        ('ok', 'OK'),
+        ('fallback', 'Wait Fell Back'),
+        ('error', 'Error'),
+    ]
+
+    job = models.ForeignKey(
+        PostingJob, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='step_timings')
+    post = models.ForeignKey(
+        MarketplacePost, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='step_timings')
+    account_email = models.EmailField()
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    step = models.CharField(max_length=50)
+    duration_ms = models.PositiveIntegerField()
+    outcome = models.CharField(
+        max_length=20, choices=OUTCOME_CHOICES, default='ok')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['operation', 'created_at'],
+                         name='timing_op_time_idx'),
+            models.Index(fields=['account_email', 'created_at'],
+                         name='timing_account_time_idx'),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.operation}:{self.step} {self.duration_ms}ms ({self.account_email})"
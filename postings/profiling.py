@@ -0,0 +1,118 @@
+"""
+Step timing sink and percentile summaries
+
+The automation flows return StepTimer entries ({step, duration_ms,
+outcome}) with every result; record_step_timings() stores them as
+StepTiming rows linked to the job / post, and summarize_step_timings()
+turns rows into per-step percentiles for the API.
+"""
+
+import math
+from collections import defaultdict
+from django.conf import settings
+import logging
+
+from .models import StepTiming
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def record_step_timings(steps, operation, account_email, job=None, post=None):
+    """
+    Store the step timings of one listing / renewal run
+
+    Never raises - profiling must not break posting.
+
+    Args:
+        steps: List of StepTimer entries
+        operation: 'post' or 'renew'
+        account_email: Facebook account email
+        job: Optional PostingJob
+        post: Optional MarketplacePost
+    """
+    if not steps or not getattr(settings, 'AUTOMATION_STEP_TIMING_ENABLED', True):
+        return
+
+    try:
+        StepTiming.objects.bulk_create([
+            StepTiming(
+                job=job,
+                post=post,
+                account_email=account_email,
+                operation=operation,
+                step=entry['step'][:50],
+                duration_ms=max(int(entry['duration_ms']), 0),
+                outcome=entry.get('outcome', 'ok'),
+            )
+            for entry in steps
+        ])
+    except Exception as e:
+        logger.warning(f"Could not record step timings for {account_email}: {e}")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def _summarize(rows):
+    """rows: iterable of (step, duration_ms, outcome) -> list of step stats"""
+    durations = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    for step, duration_ms, outcome in rows:
+        durations[step].append(duration_ms)
+        outcomes[step][outcome] += 1
+
+    grand_total = sum(sum(values) for values in durations.values()) or 1
+
+    summary = []
+    for step, values in durations.items():
+        values.sort()
+        total = sum(values)
+        stats = {
+            'step': step,
+            'count': len(values),
+            'avg_ms': round(total / len(values)),
+            'max_ms': values[-1],
+            'share_pct': round(100 * total / grand_total, 1),
+            'fallbacks': outcomes[step]['fallback'],
+            'errors': outcomes[step]['error'],
+        }
+        for pct in PERCENTILES:
+            stats[f'p{pct}_ms'] = percentile(values, pct)
+        summary.append(stats)
+
+    # Biggest time sinks first
+    summary.sort(key=lambda stats: stats['share_pct'], reverse=True)
+    return summary
+
+
+def summarize_step_timings(queryset, max_rows=20000):
+    """
+    Percentiles per step, overall and per account
+
+    Args:
+        queryset: StepTiming queryset (already filtered)
+        max_rows: Only the newest max_rows rows are used
+
+    Returns:
+        dict: {'sample_size', 'steps': [...], 'by_account': {email: [...]}}
+    """
+    rows = list(queryset.order_by('-created_at').values_list(
+        'account_email', 'step', 'duration_ms', 'outcome')[:max_rows])
+
+    by_account = defaultdict(list)
+    for email, step, duration_ms, outcome in rows:
+        by_account[email].append((step, duration_ms, outcome))
+
+    return {
+        'sample_size': len(rows),
+        'steps': _summarize(row[1:] for row in rows),
+        'by_account': {email: _summarize(account_rows)
+                       for email, account_rows in by_account.items()},
+    }
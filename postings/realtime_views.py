@@ -6,14 +6,23 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import PostingJob, ErrorLog
+from .models import MarketplacePost, PostingJob, ErrorLog
 from .serializers import PostingJobSerializer, ErrorLogSerializer
 from accounts.models import FacebookAccount
+from automation.session_probe import validate_session
 import json
 import time
 import os
 
 
+def _wants_probe(request):
+    """?probe=1 forces the HTTP session probe, ?probe=0 skips it"""
+    value = request.query_params.get('probe')
+    if value is None:
+        return None  # settings default
+    return value.lower() in ('1', 'true', 'yes')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def posting_status_stream(request, job_id):
@@ -47,8 +56,8 @@ def posting_status_stream(request, job_id):
                     yield f"data: {json.dumps(data)}\n\n"
                     last_completed = job.completed_posts
 
-                # Check if job is complete
-                if job.status in ['completed', 'failed']:
+                # Check if job is complete (a paused job gets a new stream on resume)
+                if job.status in ['completed', 'failed', 'paused', 'cancelled']:
                     yield f"data: {json.dumps({'status': 'complete', 'final': True})}\n\n"
                     break
 
@@ -91,6 +100,92 @@ def get_posting_job_status(request, job_id):
         )
 
 
+def _control_job(request, job_id, action):
+    """Pause / cancel / resume one of the user's posting jobs"""
+    from .api_views import queue_full_response
+    from .job_runner import pause_job, cancel_job, resume_job, is_resumable
+    from automation.operation_queue import QueueFullError
+    from automation.sequential_browser_manager import sequential_manager
+
+    job = PostingJob.objects.filter(job_id=job_id, user=request.user).first()
+    if not job:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if action == 'pause':
+        done = pause_job(job)
+    elif action == 'cancel':
+        done = cancel_job(job)
+    else:
+        done = is_resumable(job)
+        if done:
+            remaining = MarketplacePost.objects.filter(
+                id__in=job.post_ids, posted=False).count()
+            try:
+                with sequential_manager.admission('post_job', request.user, remaining):
+                    resumed = resume_job(job)
+            except QueueFullError as e:
+                return queue_full_response(e)
+            if resumed:
+                sequential_manager.notify_queued('post_job')
+
+    if not done:
+        return Response(
+            {'error': f'Cannot {action} a job that is {job.status}'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response({'success': True, **PostingJobSerializer(job).data})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def pause_posting_job(request, job_id):
+    """
+    Pause a queued / running job - running listings finish first
+    Usage: POST /api/posts/jobs/<job_id>/pause/
+    """
+    return _control_job(request, job_id, 'pause')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_posting_job(request, job_id):
+    """
+    Cancel a queued / running / paused job
+    Usage: POST /api/posts/jobs/<job_id>/cancel/
+    """
+    return _control_job(request, job_id, 'cancel')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def resume_posting_job(request, job_id):
+    """
+    Queue the listings of a paused / interrupted job that are not posted yet
+    Usage: POST /api/posts/jobs/<job_id>/resume/
+    """
+    return _control_job(request, job_id, 'resume')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_queue_status(request):
+    """
+    Position and estimated wait of the current user's queued work, and how
+    full the queues are (admission control refuses work at saturation 1.0)
+    Usage: GET /api/posts/queue-status/
+    """
+    from automation.sequential_browser_manager import get_queue_position, sequential_manager
+
+    queues = get_queue_position(request.user)
+    return Response({
+        'admission': sequential_manager.get_admission_status(request.user),
+        'queues': queues,
+        'queued_operations': sum(q['queued_operations'] for q in queues.values()),
+        'estimated_wait_seconds': max(
+            (q['estimated_wait_seconds'] for q in queues.values()), default=0),
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_error_logs(request):
@@ -133,47 +228,50 @@ def get_error_logs(request):
 def health_check_accounts(request):
     """
     Health check endpoint to verify account sessions are valid
-    Usage: GET /api/accounts/health-check/
+    Usage: GET /api/accounts/health-check/?probe=1
     Returns status of current user's accounts and their sessions
+    (cookie expiry check, plus a plain-HTTP probe when probe=1 - no browser)
     """
+    from .models import MarketplacePost
+    from django.db.models import Count, Q
+
     # Filter accounts by current user
-    accounts = FacebookAccount.objects.filter(user=request.user)
+    accounts = FacebookAccount.objects.filter(user=request.user).annotate(
+        total_posts=Count('marketplacepost', distinct=True),
+        posted_count=Count('marketplacepost', filter=Q(
+            marketplacepost__posted=True), distinct=True),
+        # Unposted listings that have logged a failure
+        failed_count=Count('marketplacepost', filter=Q(
+            marketplacepost__posted=False,
+            marketplacepost__error_logs__isnull=False), distinct=True),
+    )
+    probe = _wants_probe(request)
     results = []
 
     for account in accounts:
-        # Check if session file exists
         session_file = f"sessions/{account.email.replace('@', '_').replace('.', '_')}.json"
-        session_exists = os.path.exists(session_file)
-
-        # Check if session file is recent (DISABLED - Keep sessions forever)
-        session_valid = session_exists  # Session is always valid if it exists
-        session_age_days = None
-
-        if session_exists:
-            import datetime
-            file_modified = os.path.getmtime(session_file)
-            age_seconds = time.time() - file_modified
-            session_age_days = round(age_seconds / 86400, 1)  # Convert to days
-            # No age limit - session valid forever as long as file exists
-
-        # Get post statistics for this account
-        from .models import MarketplacePost
-        total_posts = MarketplacePost.objects.filter(account=account).count()
-        posted_count = MarketplacePost.objects.filter(
-            account=account, posted=True).count()
-        failed_count = MarketplacePost.objects.filter(
-            account=account, status='failed').count()
+        session = validate_session(session_file, probe=probe)
+
+        if session['status'] == 'valid':
+            health_status = 'healthy'
+        elif session['status'] == 'expiring_soon':
+            health_status = 'warning'
+        else:
+            health_status = 'error'
 
         results.append({
             'account_id': account.id,
             'email': account.email,
-            'session_exists': session_exists,
-            'session_valid': session_valid,
-            'session_age_days': session_age_days,
-            'total_posts': total_posts,
-            'posted_count': posted_count,
-            'failed_count': failed_count,
-            'health_status': 'healthy' if session_valid else ('warning' if session_exists else 'error')
+            'session_exists': session['status'] != 'missing',
+            'session_valid': session['valid'],
+            'session_status': session['status'],
+            'session_expires_in_days': session['expires_in_days'],
+            'session_http_check': session['http_check'],
+            'session_age_days': session['session_age_days'],
+            'total_posts': account.total_posts,
+            'posted_count': account.posted_count,
+            'failed_count': account.failed_count,
+            'health_status': health_status
         })
 
     # Calculate overall health
@@ -182,7 +280,8 @@ def health_check_accounts(request):
     error_count = sum(1 for r in results if r['health_status'] == 'error')
 
     return Response({
-        'overall_health': 'healthy' if error_count == 0 else ('warning' if healthy_count > 0 else 'error'),
+        'overall_health': 'healthy' if error_count == 0 and warning_count == 0 else (
+            'warning' if healthy_count + warning_count > 0 else 'error'),
         'summary': {
             'total_accounts': len(results),
             'healthy': healthy_count,
@@ -197,54 +296,29 @@ def health_check_accounts(request):
 @permission_classes([IsAuthenticated])
 def validate_account_session(request, account_id):
     """
-    Validate a specific account's session
-    Usage: GET /api/accounts/<id>/validate-session/
+    Validate a specific account's session (no browser)
+    Usage: GET /api/accounts/<id>/validate-session/?probe=1
     """
     try:
         # Filter by user for security
         account = FacebookAccount.objects.get(id=account_id, user=request.user)
-
-        # Check session file
-        session_file = f"sessions/{account.email.replace('@', '_').replace('.', '_')}.json"
-        session_exists = os.path.exists(session_file)
-
-        if not session_exists:
-            return Response({
-                'valid': False,
-                'message': 'Session file does not exist',
-                'action_required': 'Please update session for this account'
-            }, status=status.HTTP_200_OK)
-
-        # Check file age
-        import datetime
-        file_modified = os.path.getmtime(session_file)
-        age_seconds = time.time() - file_modified
-        age_days = round(age_seconds / 86400, 1)
-
-        # Read session file to check if it's valid JSON
-        try:
-            with open(session_file, 'r') as f:
-                session_data = json.load(f)
-
-            # Session is valid if file exists and has cookies (no age limit)
-            session_valid = 'cookies' in session_data
-
-            return Response({
-                'valid': session_valid,
-                'session_age_days': age_days,
-                'message': 'Session is valid (kept forever)' if session_valid else 'Session file missing cookies',
-                'action_required': None if session_valid else 'Please update session for this account'
-            })
-
-        except json.JSONDecodeError:
-            return Response({
-                'valid': False,
-                'message': 'Session file is corrupted',
-                'action_required': 'Please update session for this account'
-            }, status=status.HTTP_200_OK)
-
     except FacebookAccount.DoesNotExist:
         return Response(
             {'error': 'Account not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+    session_file = f"sessions/{account.email.replace('@', '_').replace('.', '_')}.json"
+    session = validate_session(session_file, probe=_wants_probe(request))
+
+    if session['status'] == 'valid':
+        action_required = None
+    elif session['status'] == 'expiring_soon':
+        action_required = 'Refresh the session for this account soon'
+    else:
+        action_required = 'Please update session for this account'
+
+    return Response({
+        **session,
+        'action_required': action_required,
+    })
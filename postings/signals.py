@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from .models import MarketplacePost, PostAnalytics
+from automation.post_scheduler import post_scheduler
 
 
 # Store the previous state of the post before saving
@@ -58,3 +59,18 @@ def track_post_analytics(sender, instance, created, **kwargs):
                 account_email=instance.account.email,
                 price=instance.price
             )
+
+
+@receiver(post_save, sender=MarketplacePost)
+def update_post_schedule(sender, instance, **kwargs):
+    """
+    Keep the post scheduler's heap in sync: new / rescheduled posts are
+    added (and wake it if due first), posted ones are dropped.
+    """
+    post_scheduler.schedule(instance)
+
+
+@receiver(post_delete, sender=MarketplacePost)
+def remove_post_schedule(sender, instance, **kwargs):
+    """Drop deleted posts from the post scheduler"""
+    post_scheduler.unschedule(instance.id)
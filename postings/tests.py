@@ -1,3 +1,295 @@
-from django.test import TestCase
+import io
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounts.models import FacebookAccount
+from automation.browser_pool import browser_pool
+from automation.circuit_breaker import circuit_breaker
+from automation.exceptions import SessionExpiredError
+from automation.models import AccountCircuitBreaker, AutomationOperation
+from automation.post_scheduler import PostScheduler
+from automation.rate_limiter import AccountRateLimiter, DAY
+from . import job_planner
+from .job_progress import JobProgress
+from .job_runner import (PostingJobRunner, enqueue_posting_job, finish_parked_job,
+                         is_resumable, resume_job)
+from .models import MarketplacePost, PostingJob
+
+User = get_user_model()
+
+
+class PostingJobRunnerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='owner')
+        self.account = FacebookAccount.objects.create(email='a@example.com', user=user)
+        self.post = MarketplacePost.objects.create(
+            account=self.account, title='Chair', description='Oak chair', price=10,
+            scheduled_time=timezone.now())
+        self.job = PostingJob.objects.create(job_id='job-1', user=user, total_posts=1)
+        self.runner = PostingJobRunner(self.job)
+        self.addCleanup(self.runner.progress.flush)
+
+    def test_listings_that_never_ran_do_not_trip_the_breaker(self):
+        error = SessionExpiredError('Circuit open for a@example.com')
+
+        self.runner.record_failure(self.post, str(error), None, exception=error, attempted=False)
+
+        self.assertFalse(AccountCircuitBreaker.objects.filter(
+            account_email=self.account.email).exists())
+        self.assertNotIn(self.account.email, self.runner.tripped)
+        self.assertTrue(circuit_breaker.allow(self.account.email))
+
+    def test_attempted_account_error_trips_the_breaker(self):
+        error = SessionExpiredError('Redirected to the login page')
+
+        self.runner.record_failure(self.post, str(error), None, exception=error)
+
+        self.assertEqual(circuit_breaker.get_state(self.account.email)['state'], 'open')
+        self.assertIn(self.account.email, self.runner.tripped)
+        self.assertFalse(circuit_breaker.allow(self.account.email))
+
+
+class ParkedJobTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='owner')
+        self.account = FacebookAccount.objects.create(email='a@example.com', user=user)
+        self.posts = [MarketplacePost.objects.create(
+            account=self.account, title=title, description='Oak', price=10,
+            scheduled_time=timezone.now()) for title in ('Chair', 'Table')]
+        self.posts[1].posted = True
+        self.posts[1].save()
+        self.job = PostingJob.objects.create(
+            job_id='job-1', user=user, status='running', total_posts=2, completed_posts=1,
+            post_ids=[post.id for post in self.posts])
+        # The Chair chunk was parked on an expired session, the Table one posted
+        self.parked = self.chunk(self.posts[0], 'parked')
+        self.chunk(self.posts[1], 'completed')
+
+    def chunk(self, post, status):
+        return AutomationOperation.objects.create(
+            operation_type='post_job', account_email=self.account.email, status=status,
+            payload={'job_id': self.job.job_id, 'post_ids': [post.id]})
+
+    def test_job_with_only_parked_chunks_left_finishes(self):
+        self.assertTrue(finish_parked_job(self.job.job_id))
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.completed_posts, self.job.failed_posts),
+                         ('failed', 1, 1))
+        self.parked.refresh_from_db()
+        self.assertEqual(self.parked.status, 'failed')
+        # Counted once
+        self.assertFalse(finish_parked_job(self.job.job_id))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.failed_posts, 1)
+
+    def test_parked_chunks_wait_while_others_run(self):
+        self.chunk(self.posts[0], 'running')
+
+        self.assertFalse(finish_parked_job(self.job.job_id))
+
+        self.parked.refresh_from_db()
+        self.assertEqual(self.parked.status, 'parked')
+        self.assertFalse(is_resumable(self.job))
+
+    def test_resume_requeues_parked_listings(self):
+        self.assertTrue(is_resumable(self.job))
+
+        self.assertEqual(resume_job(self.job), 1)
+
+        self.parked.refresh_from_db()
+        self.assertEqual(self.parked.status, 'cancelled')
+        queued = AutomationOperation.objects.get(status='queued')
+        self.assertEqual(queued.payload['post_ids'], [self.posts[0].id])
+        self.assertEqual(self.job.status, 'queued')
+
+
+class JobProgressTests(TransactionTestCase):
+    """TransactionTestCase: the flush timer writes from its own thread / connection"""
+
+    def setUp(self):
+        self.job = PostingJob.objects.create(job_id='job-1', total_posts=10)
+
+    def job_row(self):
+        return PostingJob.objects.get(pk=self.job.pk)
+
+    def test_counts_are_throttled_until_flushed(self):
+        progress = JobProgress(self.job, interval=60)
+
+        progress.add(completed=1)
+        progress.add(completed=1, failed=1)
+
+        # First change is written at once, the second one waits for the interval
+        self.assertEqual((self.job_row().completed_posts, self.job_row().failed_posts), (1, 0))
+        self.assertTrue(progress.flush())
+        self.assertEqual((self.job_row().completed_posts, self.job_row().failed_posts), (2, 1))
+        self.assertFalse(progress.flush())
+
+    def test_two_trackers_on_one_job_keep_both_counts(self):
+        first = JobProgress(self.job, interval=60)
+        second = JobProgress(self.job, interval=60)
+
+        for _ in range(3):
+            first.add(completed=1)
+            second.add(completed=1)
+        second.add(failed=1)
+        first.flush()
+        second.flush()
+
+        job = self.job_row()
+        self.assertEqual((job.completed_posts, job.failed_posts), (6, 1))
+
+    def test_timer_writes_a_held_back_change(self):
+        progress = JobProgress(self.job, interval=0.2)
+        self.addCleanup(progress.flush)
+        post = MarketplacePost.objects.create(
+            account=FacebookAccount.objects.create(
+                email='a@example.com', user=User.objects.create(username='owner')),
+            title='Chair', description='Oak chair', price=10, scheduled_time=timezone.now())
+
+        progress.add(completed=1)
+        progress.set_current(post)
+        self.assertEqual(self.job_row().current_post_id, None)
+
+        deadline = time.monotonic() + 5
+        while self.job_row().current_post_id is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        job = self.job_row()
+        self.assertEqual((job.current_post_id, job.current_post_title), (post.id, 'Chair'))
+        self.assertEqual(job.completed_posts, 1)
+        self.assertIsNone(progress._timer)
+
+
+class JobPlannerTests(TestCase):
+    def setUp(self):
+        limiter = AccountRateLimiter(enabled=True, min_gap=30, hourly_cap=5, daily_cap=10, burst=3)
+        patcher = mock.patch.object(job_planner, 'rate_limiter', limiter)
+        self.limiter = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def estimate(self, listings, per_listing=60):
+        return job_planner.estimate_account_seconds('a@example.com', listings, per_listing)
+
+    def test_burst_runs_back_to_back(self):
+        # 3 tokens: listings start one listing duration apart
+        self.assertEqual(self.estimate(0), 0)
+        self.assertEqual(self.estimate(1), 60)
+        self.assertEqual(self.estimate(3), 2 * 60 + 60)
+        # The minimum gap spaces them when a listing is faster than the gap
+        self.assertEqual(self.estimate(3, per_listing=10), 2 * 30 + 10)
+
+    def test_listings_past_the_burst_follow_the_hourly_rate(self):
+        # 5 an hour: one every 720s once the 3 tokens are spent
+        self.assertEqual(self.estimate(5), 2 * 60 + 2 * 720 + 60)
+
+    def test_daily_cap_adds_a_day(self):
+        self.assertEqual(self.estimate(10), 2 * 60 + 7 * 720 + 60)
+        self.assertEqual(self.estimate(12), 2 * 60 + 9 * 720 + 60 + DAY)
+
+    def test_current_wait_delays_the_start(self):
+        self.limiter.cool_down('a@example.com', 300)
+
+        self.assertAlmostEqual(self.estimate(1), 300 + 60, delta=1)
+
+    def test_disabled_limiter_only_counts_listing_time(self):
+        self.limiter.enabled = False
+
+        self.assertEqual(self.estimate(12), 12 * 60)
+
+    def test_spread_seconds(self):
+        durations = [40, 100, 50, 60]
+
+        self.assertEqual(job_planner.spread_seconds(durations, 1), 250)
+        # Longest first on the least loaded slot: [100, 40] and [60, 50]
+        self.assertEqual(job_planner.spread_seconds(durations, 2), 140)
+        self.assertEqual(job_planner.spread_seconds(durations, 8), 100)
+        self.assertEqual(job_planner.spread_seconds([], 2), 0)
+
+
+class PostToMarketplaceCommandTests(TestCase):
+    def setUp(self):
+        account = FacebookAccount.objects.create(
+            email='a@example.com', user=User.objects.create(username='owner'))
+        for title in ('Chair', 'Table'):
+            MarketplacePost.objects.create(
+                account=account, title=title, description='Oak', price=10,
+                scheduled_time=timezone.now() - timedelta(minutes=1))
+
+    def test_dry_run_neither_creates_a_job_nor_opens_a_browser(self):
+        output = io.StringIO()
+        with mock.patch.object(browser_pool, '_launch') as launch, redirect_stdout(output):
+            call_command('post_to_marketplace', '--dry-run')
+
+        launch.assert_not_called()
+        self.assertFalse(PostingJob.objects.exists())
+        self.assertFalse(MarketplacePost.objects.filter(posted=True).exists())
+        self.assertIn('PLAN: 2 post(s), 2 product(s), 1 account(s)', output.getvalue())
+        self.assertIn('Dry run - nothing was posted', output.getvalue())
+
+
+class PostSchedulerTests(TestCase):
+    def setUp(self):
+        self.account = FacebookAccount.objects.create(
+            email='a@example.com', user=User.objects.create(username='owner'))
+        self.post = MarketplacePost.objects.create(
+            account=self.account, title='Chair', description='Oak', price=10,
+            scheduled_time=timezone.now() - timedelta(minutes=1))
+
+    def test_due_post_is_queued_once(self):
+        first, second = PostScheduler(), PostScheduler()
+
+        jobs = first.enqueue_posts()
+
+        self.assertEqual([job.post_ids for job in jobs], [[self.post.id]])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.queued_for, self.post.scheduled_time)
+        self.assertEqual(second.enqueue_posts(), [])
+        self.assertEqual(PostingJob.objects.count(), 1)
+
+    def test_scheduler_that_read_the_post_first_loses_the_claim(self):
+        first, second = PostScheduler(), PostScheduler()
+        # Both found the post due before either claimed it
+        stale = MarketplacePost.objects.filter(id=self.post.id)
+
+        with mock.patch.object(second, '_eligible_posts', return_value=stale):
+            first.enqueue_posts()
+            self.assertEqual(second.enqueue_posts(), [])
+
+        self.assertEqual(PostingJob.objects.count(), 1)
+
+    def test_failed_enqueue_releases_the_claim(self):
+        scheduler = PostScheduler()
+
+        with mock.patch('postings.job_runner._enqueue_chunks', side_effect=RuntimeError('db')):
+            with self.assertRaises(RuntimeError):
+                scheduler.enqueue_posts()
+
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.queued_for)
+        self.assertEqual(len(scheduler.enqueue_posts()), 1)
+
+    def test_manual_job_claims_due_posts(self):
+        enqueue_posting_job(MarketplacePost.objects.filter(id=self.post.id), user=self.account.user)
+
+        self.assertEqual(PostScheduler().enqueue_posts(), [])
+
+    def test_new_scheduled_time_queues_the_post_again(self):
+        scheduler = PostScheduler()
+        scheduler.enqueue_posts()
+        # The run failed: the post stays claimed for its old time
+        AutomationOperation.objects.update(status='failed')
+        self.assertEqual(scheduler.enqueue_posts(), [])
+
+        self.post.refresh_from_db()
+        self.post.scheduled_time = timezone.now() - timedelta(seconds=5)
+        self.post.save()
+
+        self.assertEqual(len(scheduler.enqueue_posts()), 1)
@@ -4,11 +4,14 @@
 @REM REM Activate virtual environment
 call C:\Users\Administrator\Documents\fb_marketplace_bot\env\Scripts\activate.bat
 
-REM Run Waitress server
+REM Run Waitress server (queued work is left to the automation workers)
 @REM start "Waitress Server" cmd /k "waitress-serve --listen=127.0.0.1:8000 bot_core.wsgi:application"
 start "Waitress Server" cmd /k "waitress-serve --listen=0.0.0.0:9000 --threads=32 --backlog=4096 --channel-timeout=120 bot_core.wsgi:application
 "
 
+REM Run the automation workers (posting jobs / renewals with warm browsers)
+start "Automation Workers" cmd /k "python manage.py run_automation_workers"
+
 REM Run Cloudflare Tunnel (change your tunnel name)
 start "Cloudflare Tunnel" cmd /k "cloudflared tunnel run django-backend"
 
@@ -6,9 +6,13 @@ VENV_PATH="C:/Users/Administrator/Documents/fb_marketplace_bot/env/Scripts/activ
 # Command for Waitress
 WAITRESS_CMD="cmd.exe /k \"call $VENV_PATH && waitress-serve --listen=0.0.0.0:9000 --threads=32 --backlog=4096 --channel-timeout=120 bot_core.wsgi:application\""
 
+# Command for the automation workers (posting jobs / renewals with warm browsers)
+WORKERS_CMD="cmd.exe /k \"call $VENV_PATH && python manage.py run_automation_workers\""
+
 # Command for Cloudflare Tunnel
 CLOUDFLARE_CMD="cmd.exe /k \"cloudflared tunnel run django-backend\""
 
-# Open 2 separate terminals using Windows Terminal (wt)
+# Open 3 separate terminals using Windows Terminal (wt)
 wt.exe -w 0 nt -d . "$WAITRESS_CMD" ; \
+wt.exe -w 0 nt -d . "$WORKERS_CMD" ; \
 wt.exe -w 0 nt -d . "$CLOUDFLARE_CMD"